@@ -1,60 +1,563 @@
+import time
+from botocore.exceptions import ClientError
+from Paginator import paginate
+
+# Instance requirements shared with AsyncAsg: any instance type with 2 vCPUs and 4 GiB.
+INSTANCE_REQUIREMENTS = {
+    'VCpuCount': {
+        'Min': 2,
+        'Max': 2
+    },
+    'MemoryMiB': {
+        'Min': 4096,
+        'Max': 4096
+    },
+}
+
+# Settings of the autoscaling group, overridden key by key by the 'asg' key of a stack spec.
+ASG_SPEC = {
+    'min_size': 1,
+    'max_size': 1,
+    'desired_capacity': None,
+    # One override per entry: any instance type matching one of them can be launched.
+    'instance_requirements': [INSTANCE_REQUIREMENTS],
+    # With on_demand_percentage None every instance is on-demand. Otherwise that share of the
+    # capacity above on_demand_base_capacity is on-demand, and the rest is spot.
+    'on_demand_base_capacity': 0,
+    'on_demand_percentage': None,
+    'spot_allocation_strategy': 'price-capacity-optimized',
+    # Target tracking: visible messages of the stack's queue per in-service instance, and ALB
+    # requests per target per minute. None leaves out the policy.
+    'backlog_per_instance': None,
+    'requests_per_target': None,
+    'instance_warmup': 300,
+    # Pre-initialized instances kept beside the group so a scale-out doesn't wait for a cold
+    # boot, see WARM_POOL. None for no warm pool. AWS refuses a warm pool on a group with a mixed
+    # instances policy or spot capacity, so a group with one launches its launch template as is,
+    # with instance_type instead of instance_requirements.
+    'warm_pool': None,
+    'instance_type': 't3.medium',
+    # Lifecycle hooks, each a dict with 'name', 'transition', and optionally 'heartbeat_timeout',
+    # 'default_result', 'notification_target_arn' and 'role_arn'. Hook names are prefixed with
+    # the group name.
+    'lifecycle_hooks': [],
+    # How a new launch template is rolled out, see REFRESH_PREFERENCES.
+    'instance_refresh': {},
+}
+
+# Settings of a warm pool, overridden key by key by the 'warm_pool' key of the spec.
+WARM_POOL = {
+    'min_size': 0,
+    'max_prepared_capacity': None,
+    # 'Stopped', 'Hibernated' or 'Running'.
+    'pool_state': 'Stopped',
+    'reuse_on_scale_in': True,
+}
+
+# Preferences of an instance refresh, overridden key by key by the 'instance_refresh' key of the spec.
+REFRESH_PREFERENCES = {
+    'min_healthy_percentage': 90,
+    # Percentages of replaced instances after which the refresh pauses for checkpoint_delay seconds.
+    'checkpoints': [],
+    'checkpoint_delay': 3600,
+    'skip_matching': False,
+}
+
+# Suffixes of the names of the scaling policies the project manages.
+BACKLOG_POLICY = 'BacklogPerInstance'
+REQUESTS_POLICY = 'RequestsPerTarget'
+
+
+def asg_spec(spec: dict = None) -> dict:
+    """This function fills in the settings of an autoscaling group missing from a spec.
+
+    Args:
+        spec (dict): The 'asg' key of a stack spec, see ASG_SPEC.
+
+    Returns:
+        dict: Every key of ASG_SPEC.
+
+    Raises:
+        ValueError: If the spec asks for a warm pool and for spot capacity or instance requirements.
+    """
+    spec = spec or {}
+    if spec.get('warm_pool') is not None:
+        mixed = [key for key in ('instance_requirements', 'on_demand_percentage') if spec.get(key, ASG_SPEC[key]) != ASG_SPEC[key]]
+        if mixed:
+            raise ValueError(f"A group with a warm pool can't have a mixed instances policy; leave out {', '.join(mixed)} and set instance_type")
+    return dict(ASG_SPEC, **spec)
+
+
+def launch_settings(lt_id: str, spec: dict, lt_version: str = '$Latest') -> dict:
+    """This function builds the parameter telling a group what to launch.
+
+    A group with a warm pool launches the launch template as is, its instance type included,
+    see ASG_SPEC; any other group launches it through a mixed instances policy.
+
+    Args:
+        lt_id (str): Id of the launch template.
+        spec (dict): Settings of the group, see asg_spec.
+        lt_version (str): Version of the launch template to launch.
+
+    Returns:
+        dict: LaunchTemplate, or MixedInstancesPolicy.
+    """
+    if spec['warm_pool'] is not None:
+        return {'LaunchTemplate': {'LaunchTemplateId': lt_id, 'Version': lt_version}}
+    mixed_instances_policy = {
+        'LaunchTemplate': {
+            'LaunchTemplateSpecification': {
+                'LaunchTemplateId': lt_id,
+                'Version': lt_version
+            },
+            'Overrides': [{'InstanceRequirements': requirements} for requirements in spec['instance_requirements']],
+        },
+    }
+    if spec['on_demand_percentage'] is not None:
+        mixed_instances_policy['InstancesDistribution'] = {
+            'OnDemandBaseCapacity': spec['on_demand_base_capacity'],
+            'OnDemandPercentageAboveBaseCapacity': spec['on_demand_percentage'],
+            'SpotAllocationStrategy': spec['spot_allocation_strategy'],
+        }
+    return {'MixedInstancesPolicy': mixed_instances_policy}
+
+
+def group_settings(lt_id: str, spec: dict, lt_version: str = '$Latest') -> dict:
+    """This function builds the capacity and instance parameters of create_auto_scaling_group.
+
+    Args:
+        lt_id (str): Id of the launch template.
+        spec (dict): Settings of the group, see asg_spec.
+        lt_version (str): Version of the launch template to launch.
+
+    Returns:
+        dict: MinSize, MaxSize, DesiredCapacity if set, and LaunchTemplate or MixedInstancesPolicy, see launch_settings.
+    """
+    settings = {'MinSize': spec['min_size'], 'MaxSize': spec['max_size'], **launch_settings(lt_id, spec, lt_version)}
+    if spec['desired_capacity'] is not None:
+        settings['DesiredCapacity'] = spec['desired_capacity']
+    return settings
+
+
+def capacity_changes(live: dict, spec: dict) -> dict:
+    """This function lists the capacity settings of an existing group that differ from its spec.
+
+    Args:
+        live (dict): The group, as described by describe_auto_scaling_groups.
+        spec (dict): Settings of the group, see asg_spec.
+
+    Returns:
+        dict: The update_auto_scaling_group parameters to change, empty if none.
+    """
+    wanted = {'MinSize': spec['min_size'], 'MaxSize': spec['max_size']}
+    if spec['desired_capacity'] is not None:
+        wanted['DesiredCapacity'] = spec['desired_capacity']
+    return {key: value for key, value in wanted.items() if live.get(key) != value}
+
+
+def warm_pool_settings(spec: dict) -> dict:
+    """This function builds the parameters of put_warm_pool from a spec.
+
+    Args:
+        spec (dict): Settings of the group, see asg_spec.
+
+    Returns:
+        dict: MinSize, PoolState, InstanceReusePolicy and MaxGroupPreparedCapacity if set, or
+            None if the spec has no warm pool.
+    """
+    if spec['warm_pool'] is None:
+        return None
+    warm_pool = dict(WARM_POOL, **spec['warm_pool'])
+    settings = {
+        'MinSize': warm_pool['min_size'],
+        'PoolState': warm_pool['pool_state'],
+        'InstanceReusePolicy': {'ReuseOnScaleIn': warm_pool['reuse_on_scale_in']},
+    }
+    if warm_pool['max_prepared_capacity'] is not None:
+        settings['MaxGroupPreparedCapacity'] = warm_pool['max_prepared_capacity']
+    return settings
+
+
+def lifecycle_hooks(name: str, spec: dict) -> dict:
+    """This function builds the parameters of every lifecycle hook of a spec.
+
+    Args:
+        name (str): Name of the autoscaling group.
+        spec (dict): Settings of the group, see asg_spec.
+
+    Returns:
+        dict: The put_lifecycle_hook parameters of every hook, keyed by hook name.
+    """
+    hooks = {}
+    for hook in spec['lifecycle_hooks']:
+        settings = {
+            'LifecycleHookName': name + hook['name'],
+            'LifecycleTransition': hook['transition'],
+            'HeartbeatTimeout': hook.get('heartbeat_timeout', 3600),
+            'DefaultResult': hook.get('default_result', 'ABANDON'),
+        }
+        if 'notification_target_arn' in hook:
+            settings['NotificationTargetARN'] = hook['notification_target_arn']
+        if 'role_arn' in hook:
+            settings['RoleARN'] = hook['role_arn']
+        hooks[settings['LifecycleHookName']] = settings
+    return hooks
+
+
+def refresh_preferences(spec: dict) -> dict:
+    """This function builds the Preferences of start_instance_refresh from a spec.
+
+    Args:
+        spec (dict): Settings of the group, see asg_spec.
+
+    Returns:
+        dict: MinHealthyPercentage, InstanceWarmup, SkipMatching and the checkpoints if any.
+    """
+    refresh = dict(REFRESH_PREFERENCES, **spec['instance_refresh'])
+    preferences = {
+        'MinHealthyPercentage': refresh['min_healthy_percentage'],
+        'InstanceWarmup': spec['instance_warmup'],
+        'SkipMatching': refresh['skip_matching'],
+    }
+    if refresh['checkpoints']:
+        # The last checkpoint has to be the end of the refresh.
+        preferences['CheckpointPercentages'] = sorted(set(refresh['checkpoints']) | {100})
+        preferences['CheckpointDelay'] = refresh['checkpoint_delay']
+    return preferences
+
+
+def launch_template(live: dict) -> tuple:
+    """This function returns the launch template an existing group launches.
+
+    Args:
+        live (dict): The group, as described by describe_auto_scaling_groups.
+
+    Returns:
+        tuple: Id and version of the launch template, or None for either.
+    """
+    specification = live.get('MixedInstancesPolicy', {}).get('LaunchTemplate', {}).get('LaunchTemplateSpecification') or live.get('LaunchTemplate', {})
+    return specification.get('LaunchTemplateId'), specification.get('Version')
+
+
+def launch_changes(live: dict, lt_id: str, spec: dict, lt_version: str = '$Latest') -> dict:
+    """This function tells if an existing group must be switched to another launch template, version or mode.
+
+    Args:
+        live (dict): The group, as described by describe_auto_scaling_groups.
+        lt_id (str): Id of the launch template.
+        spec (dict): Settings of the group, see asg_spec.
+        lt_version (str): Version of the launch template to launch.
+
+    Returns:
+        dict: The update_auto_scaling_group parameters switching the group, see launch_settings,
+            empty if it already launches them.
+    """
+    wanted = launch_settings(lt_id, spec, lt_version)
+    if launch_template(live) == (lt_id, lt_version) and all(key in live for key in wanted):
+        return {}
+    return wanted
+
+
+def policy_names(name: str, spec: dict) -> list:
+    """This function lists the names of the scaling policies a spec asks for.
+
+    Args:
+        name (str): Name of the autoscaling group.
+        spec (dict): Settings of the group, see asg_spec.
+
+    Returns:
+        list: Names of the policies.
+    """
+    return [name + suffix for suffix, key in [(BACKLOG_POLICY, 'backlog_per_instance'), (REQUESTS_POLICY, 'requests_per_target')] if spec[key] is not None]
+
+
+def same_configuration(wanted, live) -> bool:
+    """This function tells if a described configuration has every value of the wanted one.
+
+    Keys the API fills in with defaults, and missing from the wanted configuration, are ignored.
+
+    Args:
+        wanted : Configuration as passed to the API.
+        live : Configuration as described by the API.
+
+    Returns:
+        bool: True if putting wanted would change nothing.
+    """
+    if isinstance(wanted, dict):
+        return isinstance(live, dict) and all(key in live and same_configuration(value, live[key]) for key, value in wanted.items())
+    if isinstance(wanted, list):
+        return isinstance(live, list) and len(wanted) == len(live) and all(map(same_configuration, wanted, live))
+    return wanted == live
+
+
+def scaling_policies(name: str, spec: dict, queue_name: str, lb_arn: str, tg_arn: str) -> dict:
+    """This function builds the target tracking configuration of every scaling policy of a group.
+
+    The SQS backlog per instance isn't a CloudWatch metric, so it is computed with metric math
+    from the queue's visible messages and the group's in-service instances.
+
+    Args:
+        name (str): Name of the autoscaling group.
+        spec (dict): Settings of the group, see asg_spec.
+        queue_name (str): Name of the queue the instances consume.
+        lb_arn (str): ARN of the load balancer in front of the group.
+        tg_arn (str): ARN of the target group of the group.
+
+    Returns:
+        dict: TargetTrackingConfiguration of every policy, keyed by policy name.
+    """
+    policies = {}
+    if spec['backlog_per_instance'] is not None:
+        policies[name + BACKLOG_POLICY] = {
+            'CustomizedMetricSpecification': {
+                'Metrics': [
+                    {
+                        'Id': 'backlog',
+                        'Label': 'Visible messages of the queue',
+                        'MetricStat': {
+                            'Metric': {
+                                'Namespace': 'AWS/SQS',
+                                'MetricName': 'ApproximateNumberOfMessagesVisible',
+                                'Dimensions': [{'Name': 'QueueName', 'Value': queue_name}],
+                            },
+                            'Stat': 'Sum',
+                        },
+                        'ReturnData': False,
+                    },
+                    {
+                        'Id': 'instances',
+                        'Label': 'In-service instances of the group',
+                        'MetricStat': {
+                            'Metric': {
+                                'Namespace': 'AWS/AutoScaling',
+                                'MetricName': 'GroupInServiceInstances',
+                                'Dimensions': [{'Name': 'AutoScalingGroupName', 'Value': name}],
+                            },
+                            'Stat': 'Average',
+                        },
+                        'ReturnData': False,
+                    },
+                    {
+                        'Id': 'backlog_per_instance',
+                        'Label': 'Backlog per instance',
+                        'Expression': 'backlog / instances',
+                        'ReturnData': True,
+                    },
+                ],
+            },
+            'TargetValue': float(spec['backlog_per_instance']),
+        }
+    if spec['requests_per_target'] is not None:
+        # The label is app/<lb name>/<lb id>/targetgroup/<tg name>/<tg id>.
+        resource_label = lb_arn.split(':loadbalancer/')[1] + '/' + tg_arn.split(':')[-1]
+        policies[name + REQUESTS_POLICY] = {
+            'PredefinedMetricSpecification': {
+                'PredefinedMetricType': 'ALBRequestCountPerTarget',
+                'ResourceLabel': resource_label,
+            },
+            'TargetValue': float(spec['requests_per_target']),
+        }
+    return policies
+
+
 class Asg:
-    def __init__(self,as_client) -> None:
+    def __init__(self,as_client, inventory=None, wait_manager=None) -> None:
         """Class that represents AWS autoscaling services.
 
         Args:
             as_client : Client to create, manage and configure AWS autoscaling service at low level
+            inventory (Inventory): Optional snapshot to serve existence checks from.
+            wait_manager (WaitManager): Optional shared poller to wait for the deletion of the group with.
         """
         self.as_client = as_client
+        self.inventory = inventory
+        self.wait_manager = wait_manager
 
-    def create_asg(self, name: str, lt_id: str, pvt_sub: str, tg_arn: list, tags: list) -> str:
-        """This method creates an autoscaling group.
+    def create_asg(self, name: str, lt_id: str, pvt_sub: str, tg_arn: list, tags: list, spec: dict = None, lt_version: str = '$Latest') -> str:
+        """This method creates an autoscaling group, or brings the existing one to the spec.
+
+        Lifecycle hooks are created with the group, so its first instances go through them, and
+        the warm pool is added right after. When an existing group launches another launch
+        template, or another version of it, it is switched to the new one and its instances are replaced by an instance
+        refresh, so the new template is rolled out without dropping below the healthy minimum.
 
         Args:
             name (str): Name of the autoscaling group.
             lt_id (str): Id of the launch template.
-            pvt_sub (str): Private subnet ID.
+            pvt_sub (str): Private subnet ID, or comma separated IDs.
+            tg_arn (list): Target groups to register the instances with.
             tags (list): Tags to add to the autoscaling group.
+            spec (dict): Capacity, instance mix, warm pool, lifecycle hooks and refresh
+                preferences, see ASG_SPEC. One on-demand instance with 2 vCPUs and 4 GiB by default.
+            lt_version (str): Version of the launch template to launch, e.g. the one Ec2.create_launch_template made.
 
         Returns:
             str: Return the created autoscaling group ARN.
         """
+        spec = asg_spec(spec)
         if self.check_asg(name):
+            hooks = list(lifecycle_hooks(name, spec).values())
             self.asg = self.as_client.create_auto_scaling_group(
                 AutoScalingGroupName=name,
-                MaxSize=1,
-                MinSize=1,
                 VPCZoneIdentifier=pvt_sub,
                 TargetGroupARNs=tg_arn,
                 Tags=tags,
-                MixedInstancesPolicy={
-                    'LaunchTemplate': {
-                        'LaunchTemplateSpecification': {
-                            'LaunchTemplateId': lt_id,
-                            'Version': '$Latest'
-                        },
-                        'Overrides': [
-                            {
-                                'InstanceRequirements': {
-                                    'VCpuCount': {
-                                        'Min': 2,
-                                        'Max': 2
-                                    },
-                                    'MemoryMiB': {
-                                        'Min': 4096,
-                                        'Max': 4096
-                                    },
-                                }
-                            },
-                        ]
-                    },
-                },
+                **({'LifecycleHookSpecificationList': hooks} if hooks else {}),
+                **group_settings(lt_id, spec, lt_version),
             )
+            if self.inventory is not None:
+                self.inventory.invalidate('auto_scaling_groups')
+            self.put_warm_pool(name, spec, exists=False)
+            refresh = False
+        else:
+            changes = capacity_changes(self.asg_description, spec)
+            launch = launch_changes(self.asg_description, lt_id, spec, lt_version)
+            refresh = bool(launch)
+            # A group spread over new zones launches in their subnets from now on.
+            if set(filter(None, self.asg_description['VPCZoneIdentifier'].split(','))) != set(pvt_sub.split(',')):
+                changes['VPCZoneIdentifier'] = pvt_sub
+            changes.update(launch)
+            if changes:
+                self.as_client.update_auto_scaling_group(AutoScalingGroupName=name, **changes)
+                if self.inventory is not None:
+                    self.inventory.invalidate('auto_scaling_groups')
+            self.put_lifecycle_hooks(name, spec)
+            self.put_warm_pool(name, spec)
+
+        if refresh:
+            self.refresh_instances(name, spec)
 
         self.check_asg(name)
 
         return self.asg_arn
 
+    def put_warm_pool(self, name: str, spec: dict = None, exists: bool = True) -> None:
+        """This method gives the autoscaling group the warm pool of the spec.
+
+        The pool is only read when the spec has one, and only put when it is missing or differs.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            spec (dict): The 'asg' key of a stack spec, see ASG_SPEC; its 'warm_pool' key is the pool, see WARM_POOL.
+            exists (bool): False if the group was just created, so it can't have a pool yet.
+        """
+        settings = warm_pool_settings(asg_spec(spec))
+        if settings is None:
+            return
+        if exists:
+            live = self.as_client.describe_warm_pool(AutoScalingGroupName=name).get('WarmPoolConfiguration')
+            if live is not None and live.get('Status') != 'PendingDelete' and same_configuration(settings, live):
+                return
+        self.as_client.put_warm_pool(AutoScalingGroupName=name, **settings)
+        if self.inventory is not None:
+            # The group's record carries its warm pool.
+            self.inventory.invalidate('auto_scaling_groups')
+
+    def put_lifecycle_hooks(self, name: str, spec: dict = None) -> None:
+        """This method gives the autoscaling group the lifecycle hooks of the spec.
+
+        The hooks are only read when the spec has some, and a hook is only put when it is
+        missing or differs. Hooks of the group with its name prefix that the spec no longer has
+        are deleted.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            spec (dict): The 'asg' key of a stack spec, see ASG_SPEC; its 'lifecycle_hooks' key lists the hooks.
+        """
+        wanted = lifecycle_hooks(name, asg_spec(spec))
+        if not wanted:
+            return
+        live = {hook['LifecycleHookName']: hook for hook in self.as_client.describe_lifecycle_hooks(AutoScalingGroupName=name)['LifecycleHooks']}
+        for hook_name, settings in wanted.items():
+            if hook_name not in live or not same_configuration(settings, live[hook_name]):
+                self.as_client.put_lifecycle_hook(AutoScalingGroupName=name, **settings)
+        for hook_name in live:
+            if hook_name.startswith(name) and hook_name not in wanted:
+                self.as_client.delete_lifecycle_hook(AutoScalingGroupName=name, LifecycleHookName=hook_name)
+
+    def refresh_instances(self, name: str, spec: dict = None, timeout: float = 600) -> str:
+        """This method replaces the instances of the autoscaling group with ones from its launch template.
+
+        Instances are replaced in batches that keep the healthy share of the group above the
+        spec's minimum, pausing at its checkpoints. A refresh already in progress started from
+        an older template, so it is cancelled and replaced by a new one.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            spec (dict): The 'asg' key of a stack spec, see ASG_SPEC; its 'instance_refresh' key holds the preferences, see REFRESH_PREFERENCES.
+            timeout (float): Seconds to wait for the cancelled refresh to end.
+
+        Returns:
+            str: Id of the instance refresh.
+        """
+        preferences = refresh_preferences(asg_spec(spec))
+        deadline = time.monotonic() + timeout
+        cancelled = False
+        while True:
+            try:
+                return self.as_client.start_instance_refresh(AutoScalingGroupName=name, Strategy='Rolling', Preferences=preferences)['InstanceRefreshId']
+            except ClientError as exc:
+                if exc.response['Error']['Code'] != 'InstanceRefreshInProgress' or time.monotonic() > deadline:
+                    raise
+            if not cancelled:
+                try:
+                    self.as_client.cancel_instance_refresh(AutoScalingGroupName=name)
+                except ClientError as exc:
+                    # The refresh may have ended in the meantime.
+                    if exc.response['Error']['Code'] != 'ActiveInstanceRefreshNotFound':
+                        raise
+                cancelled = True
+            time.sleep(5)
+
+    def put_scaling_policies(self, name: str, queue_name: str, lb_arn: str, tg_arn: str, spec: dict = None) -> str:
+        """This method attaches the target tracking policies of the spec to the autoscaling group.
+
+        The policies of the group are read with one call, and a policy is only put when it is
+        missing or differs. Managed policies the spec no longer asks for are deleted.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            queue_name (str): Name of the queue whose backlog drives the group.
+            lb_arn (str): ARN of the load balancer in front of the group.
+            tg_arn (str): ARN of the target group of the group.
+            spec (dict): The 'asg' key of a stack spec, see ASG_SPEC; its 'backlog_per_instance' and 'requests_per_target' keys are the targets.
+
+        Returns:
+            str: Comma separated ARNs of the policies.
+        """
+        spec = asg_spec(spec)
+        wanted = scaling_policies(name, spec, queue_name, lb_arn, tg_arn)
+        live = {policy['PolicyName']: policy for policy in paginate(self.as_client, 'describe_policies', 'ScalingPolicies', AutoScalingGroupName=name)}
+
+        arns = []
+        changed = False
+        for policy_name, configuration in wanted.items():
+            policy = live.get(policy_name)
+            if policy is not None and same_configuration(configuration, policy.get('TargetTrackingConfiguration')):
+                arns.append(policy['PolicyARN'])
+                continue
+            if policy_name == name + BACKLOG_POLICY:
+                # The backlog is divided by this group metric, which is only published when collected.
+                self.as_client.enable_metrics_collection(AutoScalingGroupName=name, Metrics=['GroupInServiceInstances'], Granularity='1Minute')
+            response = self.as_client.put_scaling_policy(
+                AutoScalingGroupName=name,
+                PolicyName=policy_name,
+                PolicyType='TargetTrackingScaling',
+                EstimatedInstanceWarmup=spec['instance_warmup'],
+                TargetTrackingConfiguration=configuration,
+            )
+            arns.append(response['PolicyARN'])
+            changed = True
+
+        for suffix in (BACKLOG_POLICY, REQUESTS_POLICY):
+            if name + suffix in live and name + suffix not in wanted:
+                self.as_client.delete_policy(AutoScalingGroupName=name, PolicyName=name + suffix)
+                changed = True
+
+        if changed and self.inventory is not None:
+            self.inventory.invalidate('scaling_policies')
+        return ','.join(arns)
+
     def check_asg(self, name: str) -> bool:
         """This method checks if the asg exists or not with the given name.
 
@@ -64,9 +567,36 @@ class Asg:
         Returns:
             bool: False if 
         """
-        for asg in self.as_client.describe_auto_scaling_groups()['AutoScalingGroups']:
+        if self.inventory is not None:
+            asgs = self.inventory.find('auto_scaling_groups', name=name)
+        else:
+            asgs = paginate(self.as_client, 'describe_auto_scaling_groups', 'AutoScalingGroups', AutoScalingGroupNames=[name])
+        for asg in asgs:
             if name == asg['AutoScalingGroupName']:
                 self.asg_arn = asg['AutoScalingGroupARN']
+                self.asg_description = asg
                 return False
         else:
-            return True
\ No newline at end of file
+            return True
+
+    def delete_asg(self, name: str) -> None:
+        """This method deletes the autoscaling group with its instances, and waits until it is gone.
+
+        Args:
+            name (str): Name of the autoscaling group.
+        """
+        if self.check_asg(name):
+            return
+        try:
+            self.as_client.delete_auto_scaling_group(AutoScalingGroupName=name, ForceDelete=True)
+        except self.as_client.exceptions.ClientError as exc:
+            # A second delete of a group that is already being deleted is refused.
+            if exc.response['Error']['Code'] != 'ScalingActivityInProgress':
+                raise
+        if self.wait_manager is not None:
+            self.wait_manager.wait('auto_scaling_group_deleted', self.as_client, name)
+        else:
+            while list(paginate(self.as_client, 'describe_auto_scaling_groups', 'AutoScalingGroups', AutoScalingGroupNames=[name])):
+                time.sleep(5)
+        if self.inventory is not None:
+            self.inventory.invalidate('auto_scaling_groups', 'scaling_policies')
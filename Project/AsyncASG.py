@@ -0,0 +1,207 @@
+import asyncio
+import time
+from botocore.exceptions import ClientError
+from ASG import (BACKLOG_POLICY, REQUESTS_POLICY, asg_spec, capacity_changes, group_settings, launch_changes, lifecycle_hooks,
+                 refresh_preferences, same_configuration, scaling_policies, warm_pool_settings)
+from Paginator import paginate_async
+
+
+class AsyncAsg:
+    def __init__(self, as_client, delay: float = 5) -> None:
+        """Class that represents AWS autoscaling services, driven by an aiobotocore client.
+
+        Every method has the semantics of the Asg method of the same name, and must be awaited.
+
+        Args:
+            as_client : Aiobotocore autoscaling client
+            delay (float): Seconds between two polls while waiting for the group to be deleted.
+        """
+        self.as_client = as_client
+        self.delay = delay
+
+    async def create_asg(self, name: str, lt_id: str, pvt_sub: str, tg_arn: list, tags: list, spec: dict = None, lt_version: str = '$Latest') -> str:
+        """This method creates an autoscaling group, or brings the existing one to the spec.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            lt_id (str): Id of the launch template.
+            pvt_sub (str): Private subnet ID, or comma separated IDs.
+            tg_arn (list): Target groups to register the instances with.
+            tags (list): Tags to add to the autoscaling group.
+            spec (dict): Capacity, instance mix, warm pool, lifecycle hooks and refresh
+                preferences, see ASG_SPEC.
+            lt_version (str): Version of the launch template to launch, e.g. the one Ec2.create_launch_template made.
+
+        Returns:
+            str: Return the created autoscaling group ARN.
+        """
+        spec = asg_spec(spec)
+        if await self.check_asg(name):
+            hooks = list(lifecycle_hooks(name, spec).values())
+            await self.as_client.create_auto_scaling_group(
+                AutoScalingGroupName=name,
+                VPCZoneIdentifier=pvt_sub,
+                TargetGroupARNs=tg_arn,
+                Tags=tags,
+                **({'LifecycleHookSpecificationList': hooks} if hooks else {}),
+                **group_settings(lt_id, spec, lt_version),
+            )
+            await self.put_warm_pool(name, spec, exists=False)
+            refresh = False
+        else:
+            changes = capacity_changes(self.asg_description, spec)
+            launch = launch_changes(self.asg_description, lt_id, spec, lt_version)
+            refresh = bool(launch)
+            # A group spread over new zones launches in their subnets from now on.
+            if set(filter(None, self.asg_description['VPCZoneIdentifier'].split(','))) != set(pvt_sub.split(',')):
+                changes['VPCZoneIdentifier'] = pvt_sub
+            changes.update(launch)
+            if changes:
+                await self.as_client.update_auto_scaling_group(AutoScalingGroupName=name, **changes)
+            await self.put_lifecycle_hooks(name, spec)
+            await self.put_warm_pool(name, spec)
+
+        if refresh:
+            await self.refresh_instances(name, spec)
+
+        await self.check_asg(name)
+
+        return self.asg_arn
+
+    async def put_warm_pool(self, name: str, spec: dict = None, exists: bool = True) -> None:
+        """This method gives the autoscaling group the warm pool of the spec.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            spec (dict): The 'asg' key of a stack spec, see ASG_SPEC; its 'warm_pool' key is the pool, see WARM_POOL.
+            exists (bool): False if the group was just created, so it can't have a pool yet.
+        """
+        settings = warm_pool_settings(asg_spec(spec))
+        if settings is None:
+            return
+        if exists:
+            live = (await self.as_client.describe_warm_pool(AutoScalingGroupName=name)).get('WarmPoolConfiguration')
+            if live is not None and live.get('Status') != 'PendingDelete' and same_configuration(settings, live):
+                return
+        await self.as_client.put_warm_pool(AutoScalingGroupName=name, **settings)
+
+    async def put_lifecycle_hooks(self, name: str, spec: dict = None) -> None:
+        """This method gives the autoscaling group the lifecycle hooks of the spec.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            spec (dict): The 'asg' key of a stack spec, see ASG_SPEC; its 'lifecycle_hooks' key lists the hooks.
+        """
+        wanted = lifecycle_hooks(name, asg_spec(spec))
+        if not wanted:
+            return
+        response = await self.as_client.describe_lifecycle_hooks(AutoScalingGroupName=name)
+        live = {hook['LifecycleHookName']: hook for hook in response['LifecycleHooks']}
+        for hook_name, settings in wanted.items():
+            if hook_name not in live or not same_configuration(settings, live[hook_name]):
+                await self.as_client.put_lifecycle_hook(AutoScalingGroupName=name, **settings)
+        for hook_name in live:
+            if hook_name.startswith(name) and hook_name not in wanted:
+                await self.as_client.delete_lifecycle_hook(AutoScalingGroupName=name, LifecycleHookName=hook_name)
+
+    async def refresh_instances(self, name: str, spec: dict = None, timeout: float = 600) -> str:
+        """This method replaces the instances of the autoscaling group with ones from its launch template.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            spec (dict): The 'asg' key of a stack spec, see ASG_SPEC; its 'instance_refresh' key holds the preferences, see REFRESH_PREFERENCES.
+            timeout (float): Seconds to wait for the cancelled refresh to end.
+
+        Returns:
+            str: Id of the instance refresh.
+        """
+        preferences = refresh_preferences(asg_spec(spec))
+        deadline = time.monotonic() + timeout
+        cancelled = False
+        while True:
+            try:
+                response = await self.as_client.start_instance_refresh(AutoScalingGroupName=name, Strategy='Rolling', Preferences=preferences)
+                return response['InstanceRefreshId']
+            except ClientError as exc:
+                if exc.response['Error']['Code'] != 'InstanceRefreshInProgress' or time.monotonic() > deadline:
+                    raise
+            if not cancelled:
+                try:
+                    await self.as_client.cancel_instance_refresh(AutoScalingGroupName=name)
+                except ClientError as exc:
+                    if exc.response['Error']['Code'] != 'ActiveInstanceRefreshNotFound':
+                        raise
+                cancelled = True
+            await asyncio.sleep(self.delay)
+
+    async def put_scaling_policies(self, name: str, queue_name: str, lb_arn: str, tg_arn: str, spec: dict = None) -> str:
+        """This method attaches the target tracking policies of the spec to the autoscaling group.
+
+        Args:
+            name (str): Name of the autoscaling group.
+            queue_name (str): Name of the queue whose backlog drives the group.
+            lb_arn (str): ARN of the load balancer in front of the group.
+            tg_arn (str): ARN of the target group of the group.
+            spec (dict): The 'asg' key of a stack spec, see ASG_SPEC; its 'backlog_per_instance' and 'requests_per_target' keys are the targets.
+
+        Returns:
+            str: Comma separated ARNs of the policies.
+        """
+        spec = asg_spec(spec)
+        wanted = scaling_policies(name, spec, queue_name, lb_arn, tg_arn)
+        live = {policy['PolicyName']: policy async for policy in paginate_async(self.as_client, 'describe_policies', 'ScalingPolicies', AutoScalingGroupName=name)}
+
+        arns = []
+        for policy_name, configuration in wanted.items():
+            policy = live.get(policy_name)
+            if policy is not None and same_configuration(configuration, policy.get('TargetTrackingConfiguration')):
+                arns.append(policy['PolicyARN'])
+                continue
+            if policy_name == name + BACKLOG_POLICY:
+                await self.as_client.enable_metrics_collection(AutoScalingGroupName=name, Metrics=['GroupInServiceInstances'], Granularity='1Minute')
+            response = await self.as_client.put_scaling_policy(
+                AutoScalingGroupName=name,
+                PolicyName=policy_name,
+                PolicyType='TargetTrackingScaling',
+                EstimatedInstanceWarmup=spec['instance_warmup'],
+                TargetTrackingConfiguration=configuration,
+            )
+            arns.append(response['PolicyARN'])
+
+        for suffix in (BACKLOG_POLICY, REQUESTS_POLICY):
+            if name + suffix in live and name + suffix not in wanted:
+                await self.as_client.delete_policy(AutoScalingGroupName=name, PolicyName=name + suffix)
+
+        return ','.join(arns)
+
+    async def check_asg(self, name: str) -> bool:
+        """This method checks if the asg exists or not with the given name.
+
+        Args:
+            name (str): Name of the autoscaling group.
+
+        Returns:
+            bool: False if it exists, else True.
+        """
+        async for asg in paginate_async(self.as_client, 'describe_auto_scaling_groups', 'AutoScalingGroups', AutoScalingGroupNames=[name]):
+            if name == asg['AutoScalingGroupName']:
+                self.asg_arn = asg['AutoScalingGroupARN']
+                self.asg_description = asg
+                return False
+        return True
+
+    async def delete_asg(self, name: str) -> None:
+        """This method deletes the autoscaling group with its instances, and waits until it is gone.
+
+        Args:
+            name (str): Name of the autoscaling group.
+        """
+        if await self.check_asg(name):
+            return
+        try:
+            await self.as_client.delete_auto_scaling_group(AutoScalingGroupName=name, ForceDelete=True)
+        except self.as_client.exceptions.ClientError as exc:
+            if exc.response['Error']['Code'] != 'ScalingActivityInProgress':
+                raise
+        while not await self.check_asg(name):
+            await asyncio.sleep(self.delay)
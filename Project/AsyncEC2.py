@@ -0,0 +1,159 @@
+import os
+from EC2 import CONTENT_TAG, IMAGE_ID, USER_DATA, content_hash, content_matches, launch_template_data
+from Paginator import paginate_async
+
+
+class AsyncEc2:
+    def __init__(self, ec2_client):
+        """Class that represents Amazon EC2 service, driven by an aiobotocore client.
+
+        Every method has the semantics of the Ec2 method of the same name, and must be awaited.
+
+        Args:
+            ec2_client : Aiobotocore EC2 client
+        """
+        self.ec2_client = ec2_client
+        # Launch templates read by name, keyed by name.
+        self.launch_templates = {}
+
+    async def create_launch_template(self, name: str, iam_ip_name: str, tags: list, sg: list, key_name: str = 'QubeKey',
+                                     image_id: str = IMAGE_ID, user_data: str = USER_DATA, instance_type: str = None) -> str:
+        """This method creates launch template, or a new version of it when its content changed.
+
+        Args:
+            name (str): Name of the launch template.
+            iam_ip_name (str): IAM instance profile.
+            tags (list): tags to add to the launch template.
+            sg (list): security groups.
+            key_name (str): Name of the key pair to launch instances with.
+            image_id (str): AMI of the instances.
+            user_data (str): Base64 encoded user data of the instances.
+            instance_type (str): Instance type of the instances. None leaves it to the autoscaling group.
+
+        Returns:
+            str: Return launch template id.
+        """
+        data = launch_template_data(iam_ip_name, sg, key_name, image_id, user_data, instance_type)
+        digest = content_hash(data)
+        template = await self.find_launch_template(name)
+        if template is None:
+            self.lt = await self.ec2_client.create_launch_template(
+                LaunchTemplateName=name,
+                VersionDescription=digest,
+                LaunchTemplateData=data,
+                TagSpecifications=[{'ResourceType': 'launch-template', 'Tags': tags + [{'Key': CONTENT_TAG, 'Value': f'1:{digest}'}]}]
+            )
+            self.lt_id = self.lt['LaunchTemplate']['LaunchTemplateId']
+            self.lt_version = str(self.lt['LaunchTemplate']['LatestVersionNumber'])
+            self.launch_templates.pop(name, None)
+        elif content_matches(template, digest):
+            self.lt_id = template['LaunchTemplateId']
+            self.lt_version = str(template['LatestVersionNumber'])
+        else:
+            self.lt_id = template['LaunchTemplateId']
+            response = await self.ec2_client.create_launch_template_version(
+                LaunchTemplateId=self.lt_id,
+                VersionDescription=digest,
+                LaunchTemplateData=data,
+            )
+            version = response['LaunchTemplateVersion']['VersionNumber']
+            await self.ec2_client.create_tags(Resources=[self.lt_id], Tags=[{'Key': CONTENT_TAG, 'Value': f'{version}:{digest}'}])
+            self.lt_version = str(version)
+            self.launch_templates.pop(name, None)
+        return self.lt_id
+
+    async def find_launch_template(self, name: str) -> dict:
+        """This method looks up a launch template by name, reading it once.
+
+        Args:
+            name (str): The name of the launch template to find.
+
+        Returns:
+            dict: The template, as described by describe_launch_templates, or None.
+        """
+        if name not in self.launch_templates:
+            try:
+                launch_templates = (await self.ec2_client.describe_launch_templates(LaunchTemplateNames=[name]))['LaunchTemplates']
+            except self.ec2_client.exceptions.ClientError as exc:
+                if exc.response['Error']['Code'] != 'InvalidLaunchTemplateName.NotFoundException':
+                    raise
+                launch_templates = []
+            self.launch_templates[name] = launch_templates[0] if launch_templates else None
+        return self.launch_templates[name]
+
+    async def check_launch_template(self, name: str) -> bool:
+        """This method checks if launch template exists with the given name.
+
+        Args:
+            name (str): The name of the launch template to find.
+
+        Returns:
+            bool: Return False if launch template with the given name exists, else True.
+        """
+        template = await self.find_launch_template(name)
+        if template is None:
+            return True
+        self.lt_id = template['LaunchTemplateId']
+        self.lt_version = str(template['LatestVersionNumber'])
+        return False
+
+    async def create_key(self, tags: list, name: str = 'QubeKey', path: str = None) -> str:
+        """This method creates key pair.
+
+        Args:
+            tags (list): Tags to add to the key pair.
+            name (str): Name of the key pair.
+            path (str): File the private key is saved to, <name>.pem by default.
+
+        Returns:
+            str: Return the key pair id.
+        """
+        if await self.check_key_pair(name):
+            self.kp = await self.ec2_client.create_key_pair(
+                KeyName=name,
+                KeyType='rsa',
+                KeyFormat='pem',
+                TagSpecifications=[{'ResourceType': 'key-pair', 'Tags': tags}],
+            )
+            with open(path or name + '.pem', 'w') as key_file:
+                key_file.write(self.kp['KeyMaterial'])
+            self.key_pair_id = self.kp['KeyPairId']
+        return self.key_pair_id
+
+    async def check_key_pair(self, name: str = 'QubeKey') -> bool:
+        """This method checks if key pair with the given name already exists.
+
+        Args:
+            name (str): Name of the key pair to find.
+
+        Returns:
+            bool: Return False if already exists, else True.
+        """
+        async for key in paginate_async(self.ec2_client, 'describe_key_pairs', 'KeyPairs', Filters=[{'Name': 'key-name', 'Values': [name]}]):
+            if name == key['KeyName']:
+                self.key_pair_id = key['KeyPairId']
+                return False
+        return True
+
+    async def delete_launch_template(self, name: str) -> None:
+        """This method deletes the launch template with all its versions.
+
+        Args:
+            name (str): Name of the launch template.
+        """
+        if not await self.check_launch_template(name):
+            await self.ec2_client.delete_launch_template(LaunchTemplateName=name)
+            self.launch_templates.pop(name, None)
+
+    async def delete_key(self, name: str = 'QubeKey', path: str = None) -> None:
+        """This method deletes the key pair and its saved private key.
+
+        Args:
+            name (str): Name of the key pair.
+            path (str): File the private key was saved to, <name>.pem by default.
+        """
+        path = path or name + '.pem'
+        if not await self.check_key_pair(name):
+            await self.ec2_client.delete_key_pair(KeyName=name)
+        if os.path.exists(path):
+            os.remove(path)
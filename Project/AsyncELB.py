@@ -0,0 +1,184 @@
+import asyncio
+from Paginator import paginate_async
+from ELB import elb_spec, listener_changes, target_group_changes
+
+
+class AsyncElb:
+    def __init__(self, elbv2_client) -> None:
+        """Class that represents amazon elastic load balancer services, driven by an aiobotocore client.
+
+        Every method has the semantics of the Elb method of the same name, and must be awaited.
+
+        Args:
+            elbv2_client : Aiobotocore ELBv2 client
+        """
+        self.elbv2_client = elbv2_client
+
+    async def create_elb(self, name: str, pub_sub: list, tags: list, elb_sg: str, vpc_id: str, tg_name: str = 'QubeTG', spec: dict = None) -> str:
+        """This method creates application load balancer, and reconciles its listeners, rules and target groups.
+
+        Args:
+            name (str): Name of the load balancer.
+            pub_sub (list): Public subnets.
+            tags (list): Tags to add to the load balancers.
+            elb_sg (str): Security group ID.
+            vpc_id (str): VPC ID.
+            tg_name (str): Name of the target group the autoscaling group registers with.
+            spec (dict): Listeners and target groups, see elb_spec.
+
+        Returns:
+            str: Return the target group arn.
+        """
+        if spec is None:
+            spec = elb_spec(prefix=tg_name[:-len('TG')])
+        created = await self.check_elb(name, tg_name)
+        if created:
+            response = await self.elbv2_client.create_load_balancer(
+                Name=name,
+                Subnets=pub_sub,
+                SecurityGroups=[elb_sg],
+                Scheme='internet-facing',
+                Tags=tags,
+                Type='application',
+                IpAddressType='ipv4',
+            )
+            self.elb_arn = response['LoadBalancers'][0]['LoadBalancerArn']
+            self.elb_dns_name = response['LoadBalancers'][0]['DNSName']
+
+        await self.reconcile(name, spec, vpc_id, tags, created)
+        self.target_group_arn = self.target_group_arns[tg_name]
+        return self.target_group_arn
+
+    async def read_elb(self, spec: dict, created: bool = False) -> dict:
+        """This method reads the live target groups, listeners and rules of the load balancer self.elb_arn.
+
+        Args:
+            spec (dict): Load balancer spec, see elb_spec.
+            created (bool): The load balancer was just created, so it has no listeners to read.
+
+        Returns:
+            dict: The live state, see Elb.read_elb.
+        """
+        names = list(spec['target_groups'])
+        try:
+            target_groups = [tg async for tg in paginate_async(self.elbv2_client, 'describe_target_groups', 'TargetGroups', Names=names)]
+        except self.elbv2_client.exceptions.TargetGroupNotFoundException:
+            target_groups = [tg async for tg in paginate_async(self.elbv2_client, 'describe_target_groups', 'TargetGroups') if tg['TargetGroupName'] in names]
+
+        live = {'target_groups': {tg['TargetGroupName']: tg for tg in target_groups}, 'attributes': {}, 'listeners': {}, 'rules': {}}
+        responses = await asyncio.gather(*[
+            self.elbv2_client.describe_target_group_attributes(TargetGroupArn=tg['TargetGroupArn']) for tg in target_groups
+        ])
+        for tg, response in zip(target_groups, responses):
+            live['attributes'][tg['TargetGroupName']] = {attribute['Key']: attribute['Value'] for attribute in response['Attributes']}
+        if created:
+            return live
+
+        listeners = [listener async for listener in paginate_async(self.elbv2_client, 'describe_listeners', 'Listeners', LoadBalancerArn=self.elb_arn)]
+        rules = await asyncio.gather(*[
+            self._rules(listener['ListenerArn']) for listener in listeners
+        ])
+        for listener, listener_rules in zip(listeners, rules):
+            live['listeners'][listener['Port']] = listener
+            live['rules'][listener['Port']] = {int(rule['Priority']): rule for rule in listener_rules if not rule['IsDefault']}
+        return live
+
+    async def reconcile(self, name: str, spec: dict, vpc_id: str, tags: list, created: bool = False) -> list:
+        """This method brings the target groups, listeners and rules of the load balancer self.elb_arn in line with a spec.
+
+        Args:
+            name (str): Name of the load balancer.
+            spec (dict): Load balancer spec, see elb_spec.
+            vpc_id (str): VPC ID of the target groups.
+            tags (list): Tags to add to created target groups, listeners and rules.
+            created (bool): The load balancer was just created.
+
+        Returns:
+            list: The changes that were applied, see Elb.reconcile.
+        """
+        live = await self.read_elb(spec, created)
+        applied = []
+        self.target_group_arns = {tg_name: tg['TargetGroupArn'] for tg_name, tg in live['target_groups'].items()}
+        for change in target_group_changes(spec, live, vpc_id):
+            if change['action'] == 'replace':
+                raise ValueError(f"Target group {change['name']} can't be updated: {change['detail']}")
+            if change['action'] == 'create':
+                response = await self.elbv2_client.create_target_group(**change['params'], Tags=tags)
+                self.target_group_arns[change['name']] = response['TargetGroups'][0]['TargetGroupArn']
+            elif change['params']:
+                await self.elbv2_client.modify_target_group(TargetGroupArn=change['id'], **change['params'])
+            if change['attributes']:
+                await self.elbv2_client.modify_target_group_attributes(
+                    TargetGroupArn=self.target_group_arns[change['name']],
+                    Attributes=[{'Key': key, 'Value': value} for key, value in change['attributes'].items()]
+                )
+            if change['action'] != 'exists':
+                applied.append(change)
+
+        listener_arns = {port: listener['ListenerArn'] for port, listener in live['listeners'].items()}
+        for change in listener_changes(name, spec, live, self.target_group_arns):
+            resource, action = change['resource'], change['action']
+            if action == 'exists':
+                continue
+            if resource == 'listener' and action == 'create':
+                response = await self.elbv2_client.create_listener(LoadBalancerArn=self.elb_arn, Tags=tags, **change['params'])
+                listener_arns[change['port']] = response['Listeners'][0]['ListenerArn']
+            elif resource == 'listener' and action == 'modify':
+                await self.elbv2_client.modify_listener(ListenerArn=change['id'], **change['params'])
+            elif resource == 'listener':
+                await self.elbv2_client.delete_listener(ListenerArn=change['id'])
+            elif action == 'create':
+                await self.elbv2_client.create_rule(ListenerArn=listener_arns[change['port']], Tags=tags, **change['params'])
+            elif action == 'modify':
+                await self.elbv2_client.modify_rule(RuleArn=change['id'], **change['params'])
+            else:
+                await self.elbv2_client.delete_rule(RuleArn=change['id'])
+            applied.append(change)
+
+        self.listener_arn = listener_arns.get(spec['listeners'][0]['port']) if spec['listeners'] else None
+        return applied
+
+    async def check_elb(self, name, tg_name: str = 'QubeTG') -> bool:
+        """This method check if load balancer is created or not.
+
+        Args:
+            name (str): The name of the load balancer to find.
+            tg_name (str): The name of the target group to find.
+
+        Returns:
+            bool: Return False if load balancer exists, else True.
+        """
+        for lb in await self._describe('describe_load_balancers', 'LoadBalancers', 'LoadBalancerNotFoundException', name):
+            if name == lb['LoadBalancerName']:
+                self.elb_arn = lb['LoadBalancerArn']
+                for tg in await self._describe('describe_target_groups', 'TargetGroups', 'TargetGroupNotFoundException', tg_name):
+                    if tg_name == tg['TargetGroupName']:
+                        self.target_group_arn = tg['TargetGroupArn']
+                return False
+        return True
+
+    async def delete_elb(self, name: str, tg_name: str = 'QubeTG', spec: dict = None) -> None:
+        """This method deletes the load balancer with its listeners and rules, then the target groups.
+
+        Args:
+            name (str): Name of the load balancer.
+            tg_name (str): Name of the target group.
+            spec (dict): Load balancer spec, see elb_spec, to delete every target group of.
+        """
+        for lb in await self._describe('describe_load_balancers', 'LoadBalancers', 'LoadBalancerNotFoundException', name):
+            async for listener in paginate_async(self.elbv2_client, 'describe_listeners', 'Listeners', LoadBalancerArn=lb['LoadBalancerArn']):
+                await self.elbv2_client.delete_listener(ListenerArn=listener['ListenerArn'])
+            await self.elbv2_client.delete_load_balancer(LoadBalancerArn=lb['LoadBalancerArn'])
+
+        for target_group in spec['target_groups'] if spec else [tg_name]:
+            for tg in await self._describe('describe_target_groups', 'TargetGroups', 'TargetGroupNotFoundException', target_group):
+                await self.elbv2_client.delete_target_group(TargetGroupArn=tg['TargetGroupArn'])
+
+    async def _rules(self, listener_arn: str) -> list:
+        return [rule async for rule in paginate_async(self.elbv2_client, 'describe_rules', 'Rules', ListenerArn=listener_arn)]
+
+    async def _describe(self, operation: str, result_key: str, not_found: str, name: str) -> list:
+        try:
+            return [record async for record in paginate_async(self.elbv2_client, operation, result_key, Names=[name])]
+        except getattr(self.elbv2_client.exceptions, not_found):
+            return []
@@ -0,0 +1,187 @@
+import asyncio
+import json
+from IAM import ASSUME_ROLE_POLICY, POLICY_VERSIONS, document_hash, policy_document
+from Paginator import paginate_async
+
+
+class AsyncIam:
+    def __init__(self, iam_client, delay: float = 5) -> None:
+        """Class that represents AWS IAM services, driven by an aiobotocore client.
+
+        Every method has the semantics of the Iam method of the same name, and must be awaited.
+
+        Args:
+            iam_client : Aiobotocore IAM client
+            delay (float): Seconds between two polls while waiting for the instance profile.
+        """
+        self.iam_client = iam_client
+        self.delay = delay
+
+    async def create_instance_profile(self, name: str, tags: list, role_name: str = 'QubeRole') -> str:
+        """This method creates an IAM instance profile.
+
+        Args:
+            name (str): Name of the instance profile.
+            tags (list): tags to add to the instance profile.
+            role_name (str): Name of the IAM role to create and add to the instance profile.
+
+        Returns:
+            str: Return the instance profile id.
+        """
+        if await self.check_instance_profile(name):
+            self.ip = await self.iam_client.create_instance_profile(InstanceProfileName=name, Tags=tags)
+            while True:
+                try:
+                    await self.iam_client.get_instance_profile(InstanceProfileName=name)
+                    break
+                except self.iam_client.exceptions.NoSuchEntityException:
+                    await asyncio.sleep(self.delay)
+            self.ip_id = self.ip['InstanceProfile']['InstanceProfileId']
+
+            self.role = await self.iam_client.create_role(
+                RoleName=role_name,
+                AssumeRolePolicyDocument=json.dumps(ASSUME_ROLE_POLICY),
+                Tags=tags
+            )
+            self.iam_role_name = role_name
+            await self.iam_client.add_role_to_instance_profile(InstanceProfileName=name, RoleName=role_name)
+
+        return self.ip_id
+
+    async def check_instance_profile(self, name: str) -> bool:
+        """This method checks if instance profile exists with the given name.
+
+        Args:
+            name (str): Name of the instance profile to check.
+
+        Returns:
+            bool: Return False if instance profile exists, else True.
+        """
+        try:
+            ip = (await self.iam_client.get_instance_profile(InstanceProfileName=name))['InstanceProfile']
+        except self.iam_client.exceptions.NoSuchEntityException:
+            return True
+        if ip['Roles']:
+            self.iam_role_name = ip['Roles'][0]['RoleName']
+        self.ip_id = ip['InstanceProfileId']
+        return False
+
+    async def create_add_iam_policy_to_role(self, name: str, tags: list, asg_arn: str, role_name: str = None, document: dict = None) -> str:
+        """This method creates the IAM policy, or updates its document, and attaches it to the IAM role.
+
+        Args:
+            name (str): Name of the IAM policy.
+            tags (list): Tags to add to the IAM policy.
+            asg_arn (str): Auto scaling group arn.
+            role_name (str): Name of the IAM role, the one of the last instance profile checked by default.
+            document (dict): Policy document, see IAM.policy_document. The default KMS policy by default.
+
+        Returns:
+            str: Return the IAM policy arn.
+        """
+        role_name = role_name or self.iam_role_name
+        document = document or policy_document()
+        policy = await self._find_policy(name)
+        if policy is None:
+            self.policy = await self.iam_client.create_policy(
+                PolicyName=name,
+                PolicyDocument=json.dumps(document),
+                Tags=tags
+            )
+            self.policy_arn = self.policy['Policy']['Arn']
+        else:
+            self.policy_arn = policy['Arn']
+            if document_hash(policy['Document']) != document_hash(document):
+                await self.update_iam_policy(self.policy_arn, document)
+
+        if await self.check_iam_policy(name, role_name):
+            await self.iam_client.attach_role_policy(RoleName=role_name, PolicyArn=self.policy_arn)
+
+        return self.policy_arn
+
+    async def update_iam_policy(self, arn: str, document: dict) -> str:
+        """This method makes a document the default version of a policy, see Iam.update_iam_policy.
+
+        Args:
+            arn (str): ARN of the IAM policy.
+            document (dict): The new policy document.
+
+        Returns:
+            str: Id of the new version.
+        """
+        versions = sorted([version async for version in paginate_async(self.iam_client, 'list_policy_versions', 'Versions', PolicyArn=arn)],
+                          key=lambda version: version['CreateDate'])
+        old = [version for version in versions if not version['IsDefaultVersion']]
+        while old and len(versions) >= POLICY_VERSIONS:
+            version = old.pop(0)
+            await self.iam_client.delete_policy_version(PolicyArn=arn, VersionId=version['VersionId'])
+            versions.remove(version)
+        version = await self.iam_client.create_policy_version(PolicyArn=arn, PolicyDocument=json.dumps(document), SetAsDefault=True)
+        return version['PolicyVersion']['VersionId']
+
+    async def check_iam_policy(self, name: str, role_name: str = None) -> bool:
+        """This method checks if IAM policy is attached to IAM role.
+
+        Args:
+            name (str): Name to check for the IAM policy.
+            role_name (str): Name of the IAM role, the one of the last instance profile checked by default.
+
+        Returns:
+            bool: Return False if IAM policy is attached to role, else True.
+        """
+        try:
+            async for policy in paginate_async(self.iam_client, 'list_attached_role_policies', 'AttachedPolicies', RoleName=role_name or self.iam_role_name):
+                if name == policy['PolicyName']:
+                    self.policy_arn = policy['PolicyArn']
+                    return False
+        except self.iam_client.exceptions.NoSuchEntityException:
+            pass
+        return True
+
+    async def delete_instance_profile(self, name: str, role_name: str = 'QubeRole') -> None:
+        """This method deletes the instance profile and its role.
+
+        Args:
+            name (str): Name of the instance profile.
+            role_name (str): Name of the IAM role created with the instance profile.
+        """
+        try:
+            ip = (await self.iam_client.get_instance_profile(InstanceProfileName=name))['InstanceProfile']
+            for role in ip['Roles']:
+                await self.iam_client.remove_role_from_instance_profile(InstanceProfileName=name, RoleName=role['RoleName'])
+            await self.iam_client.delete_instance_profile(InstanceProfileName=name)
+        except self.iam_client.exceptions.NoSuchEntityException:
+            pass
+
+        try:
+            policies = [policy async for policy in paginate_async(self.iam_client, 'list_attached_role_policies', 'AttachedPolicies', RoleName=role_name)]
+            for policy in policies:
+                await self.iam_client.detach_role_policy(RoleName=role_name, PolicyArn=policy['PolicyArn'])
+            await self.iam_client.delete_role(RoleName=role_name)
+        except self.iam_client.exceptions.NoSuchEntityException:
+            pass
+
+    async def delete_iam_policy(self, name: str) -> None:
+        """This method detaches the IAM policy from its roles and deletes it with all its versions.
+
+        Args:
+            name (str): Name of the IAM policy.
+        """
+        policies = [policy async for policy in paginate_async(self.iam_client, 'list_policies', 'Policies', Scope='Local') if policy['PolicyName'] == name]
+        for policy in policies:
+            arn = policy['Arn']
+            roles = [role async for role in paginate_async(self.iam_client, 'list_entities_for_policy', 'PolicyRoles', PolicyArn=arn, EntityFilter='Role')]
+            for role in roles:
+                await self.iam_client.detach_role_policy(RoleName=role['RoleName'], PolicyArn=arn)
+            async for version in paginate_async(self.iam_client, 'list_policy_versions', 'Versions', PolicyArn=arn):
+                if not version['IsDefaultVersion']:
+                    await self.iam_client.delete_policy_version(PolicyArn=arn, VersionId=version['VersionId'])
+            await self.iam_client.delete_policy(PolicyArn=arn)
+
+    async def _find_policy(self, name: str) -> dict:
+        # The policy, with the document of its default version under 'Document', or None.
+        async for policy in paginate_async(self.iam_client, 'list_policies', 'Policies', Scope='Local'):
+            if policy['PolicyName'] == name:
+                version = (await self.iam_client.get_policy_version(PolicyArn=policy['Arn'], VersionId=policy['DefaultVersionId']))['PolicyVersion']
+                return dict(policy, Document=version['Document'])
+        return None
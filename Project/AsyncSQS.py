@@ -0,0 +1,48 @@
+class AsyncSqs:
+    def __init__(self, sqs_client) -> None:
+        """Class that represents Amazon SQS service, driven by an aiobotocore client.
+
+        Every method has the semantics of the Sqs method of the same name, and must be awaited.
+
+        Args:
+            sqs_client : Aiobotocore SQS client
+        """
+        self.sqs_client = sqs_client
+
+    async def create_sqs_queue(self, name: str, tags: dict) -> str:
+        """This method creates SQS queue.
+
+        Args:
+            name (str): Name of the queue.
+            tags (dict): Tags to add to the queue.
+
+        Returns:
+            str: Return the queue url.
+        """
+        if await self.check_sqs_queue(name):
+            self.queue_url = (await self.sqs_client.create_queue(QueueName=name, tags=tags))['QueueUrl']
+        return self.queue_url
+
+    async def check_sqs_queue(self, name: str) -> bool:
+        """To check whether SQS already exists with the given name.
+
+        Args:
+            name (str): Name of the queue to check.
+
+        Returns:
+            bool : False if queue exists with the given name, else True.
+        """
+        try:
+            self.queue_url = (await self.sqs_client.get_queue_url(QueueName=name))['QueueUrl']
+            return False
+        except self.sqs_client.exceptions.QueueDoesNotExist:
+            return True
+
+    async def delete_sqs_queue(self, name: str) -> None:
+        """This method deletes the queue with the given name, if it exists.
+
+        Args:
+            name (str): Name of the queue.
+        """
+        if not await self.check_sqs_queue(name):
+            await self.sqs_client.delete_queue(QueueUrl=self.queue_url)
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from botocore.config import Config
+from AsyncVPC import AsyncVpc
+from AsyncSQS import AsyncSqs
+from AsyncASG import AsyncAsg
+from AsyncEC2 import AsyncEc2
+from AsyncIAM import AsyncIam
+from AsyncELB import AsyncElb
+from RateLimiter import RateLimiter
+from Stack import Stack, DEFAULT_SPEC
+from State import spec_hash
+from VPC import carve_subnets
+
+# Service of every client an AsyncStack needs, keyed like the clients dict.
+SERVICES = {
+    'ec2_client': 'ec2',
+    'sqs_client': 'sqs',
+    'as_client': 'autoscaling',
+    'elbv2_client': 'elbv2',
+    'iam_client': 'iam',
+}
+
+
+@asynccontextmanager
+async def open_clients(max_pool_connections: int = 100, max_attempts: int = 8, tracer=None, limiter: RateLimiter = None):
+    """This context manager opens one aiobotocore client per service, shared by every stack.
+
+    aiobotocore is only imported here, so the synchronous backend doesn't need it. Every call of
+    every client goes through one rate limiter and retry budget, as in the synchronous backend.
+
+    Args:
+        max_pool_connections (int): Maximum number of connections of each client, i.e. of
+            concurrent calls to one service.
+        max_attempts (int): Maximum number of attempts of a throttled or failed call, if no limiter is given.
+        tracer (Tracer): Optional tracer of every call of the clients.
+        limiter (RateLimiter): Rate limiter of every call. A new one by default.
+
+    Yields:
+        dict: The clients, keyed as in SERVICES.
+    """
+    from aiobotocore.session import get_session
+
+    session = get_session()
+    if tracer is not None:
+        tracer.attach(session)
+    (limiter or RateLimiter(max_attempts=max_attempts)).attach_async(session)
+    config = RateLimiter.CLIENT_CONFIG.merge(Config(max_pool_connections=max_pool_connections))
+    async with AsyncExitStack() as exit_stack:
+        yield {
+            key: await exit_stack.enter_async_context(session.create_client(service, config=config))
+            for key, service in SERVICES.items()
+        }
+
+
+class AsyncStack(Stack):
+    def __init__(self, spec: dict, clients: dict, state=None, delay: float = 5) -> None:
+        """Class that represents one Qube environment provisioned on an event loop.
+
+        The steps and their dependencies are the ones of Stack, but every wrapper is the async
+        variant of its service, so one event loop can drive the steps of many stacks at once
+        without a thread per call.
+
+        Args:
+            spec (dict): Stack spec, see Stack.
+            clients (dict): Aiobotocore clients, see open_clients. They can be shared between stacks.
+            state (State): Optional local record of the resources.
+            delay (float): Seconds between two polls while waiting for a resource.
+        """
+        self.spec = dict(DEFAULT_SPEC, **spec)
+        if 'topology' in self.spec:
+            self.spec.update(carve_subnets(self.spec['cidr'], self.spec['topology'], clients['ec2_client'].meta.region_name))
+        self.name = self.spec['name']
+        self.tags = self.spec['tags']
+
+        self.vpc = AsyncVpc(clients['ec2_client'], delay)
+        self.sqs = AsyncSqs(clients['sqs_client'])
+        self.elb = AsyncElb(clients['elbv2_client'])
+        self.iam = AsyncIam(clients['iam_client'], delay)
+        self.ec2 = AsyncEc2(clients['ec2_client'])
+        self.asg = AsyncAsg(clients['as_client'], delay)
+
+        self.inventory = None
+        self.state = state
+        self.dag = None
+        self.resources = None
+        self.drift = []
+        # File the private key of the stack's key pair is saved to, <name>Key.pem by default.
+        self.key_path = None
+
+    async def provision_async(self, max_workers: int = 8) -> dict:
+        """This method creates every resource of the stack that doesn't exist yet.
+
+        Args:
+            max_workers (int): Maximum number of steps to run at the same time.
+
+        Returns:
+            dict: Result of every provisioning step, keyed by step name.
+        """
+        self.resources = await self.build(max_workers).run_async()
+        await self.prune_endpoints_async()
+        if self.state is not None:
+            self.state.save(self.name, self.resources, spec_hash(self.spec))
+        return self.resources
+
+    async def locate_network_async(self) -> dict:
+        """This method finds the ids of the existing VPC resources of the stack, see Stack.locate_network.
+
+        Returns:
+            dict: Id of every VPC step's resource, or None if it doesn't exist, keyed by step name.
+        """
+        vpc = self.vpc
+        ids = {}
+        ids['igw'] = None if await vpc.check_internet_gateway(self.named_tags('IG')) else vpc.igw_id
+        ids['public_rt'] = None if await vpc.check_public_route_table(self.named_tags('PublicRT')) else vpc.public_rt_id
+        for route in self.private_routes():
+            ids[route['nat']] = None if await vpc.check_nat_gateway(self.tags, self.name + 'NG' + route['suffix']) else vpc.nat_gw_id
+            ids[route['private_rt']] = None if await vpc.check_private_route_table(self.named_tags('PrivateRT' + route['suffix'])) else vpc.private_rt_id
+
+        vpc_missing = await vpc.check_virtual_private_cloud(self.named_tags('VPC'), self.spec['cidr'])
+        ids['vpc'] = None if vpc_missing else vpc.myvpc_id
+        # Security groups are looked up in the stack's VPC.
+        ids['alb_sg'] = None if vpc_missing or await vpc.check_alb_security_group(self.name + 'AlbSG') else vpc.group_id
+        ids['asg_sg'] = None if vpc_missing or await vpc.check_asg_security_group(self.name + 'AsgSG') else vpc.asg_sgid
+        ids['endpoint_sg'] = None if vpc_missing or await vpc.check_endpoint_security_group(self.name + 'EndpointSG') else vpc.endpoint_sgid
+        for endpoint in self.vpc_endpoints():
+            ids[endpoint['step']] = None if vpc_missing or await vpc.check_vpc_endpoint(endpoint['service'], self.named_tags(endpoint['suffix'])) else vpc.endpoint_id
+        for i, _ in enumerate(self.spec['public_subnets'], 1):
+            ids[f'pub_sub_{i}'] = None if vpc_missing or await vpc.check_public_subnet(self.named_tags(f'PublicSubnet{i}')) else vpc.pub_subnet_id
+        for i, _ in enumerate(self.spec['private_subnets'], 1):
+            ids[f'pvt_sub_{i}'] = None if vpc_missing or await vpc.check_private_subnet(self.named_tags(f'PrivateSubnet{i}')) else vpc.pvt_subnet_id
+        return ids
+
+    async def prune_endpoints_async(self) -> list:
+        """This method deletes the VPC endpoints of the stack whose service was dropped from the spec, see Stack.prune_endpoints.
+
+        Returns:
+            list: Ids of the deleted endpoints.
+        """
+        services = [endpoint['service'] for endpoint in self.vpc_endpoints()]
+        stale = [endpoint['VpcEndpointId'] for endpoint in await self.vpc.stale_vpc_endpoints(self.name + 'Endpoint', services)]
+        await asyncio.gather(*[self.vpc.delete_vpc_endpoint(endpoint_id) for endpoint_id in stale])
+        return stale
+
+    async def destroy_async(self, max_workers: int = 8) -> dict:
+        """This method deletes every resource of the stack, see Stack.build_teardown.
+
+        Args:
+            max_workers (int): Maximum number of deletions to run at the same time.
+
+        Returns:
+            dict: Result of every deletion step, keyed by step name.
+        """
+        network = await self.locate_network_async()
+        if network['vpc'] is not None:
+            await self.prune_endpoints_async()
+        results = await self.build_teardown(network, max_workers).run_async()
+        if self.state is not None:
+            self.state.delete(self.name)
+        self.resources = None
+        return results
+
+
+async def run_stacks(stacks: list, destroy: bool = False) -> list:
+    """This function provisions, or destroys, every stack concurrently on the running event loop.
+
+    A failing stack doesn't stop the others; its error is reported in its result.
+
+    Args:
+        stacks (list): The AsyncStack objects.
+        destroy (bool): Delete the stacks instead of provisioning them.
+
+    Returns:
+        list: One result per stack with 'name', 'status', 'seconds', 'vpc_id', 'asg_arn' and 'error',
+            as returned by Fleet.provision.
+    """
+    async def run(stack):
+        start = time.perf_counter()
+        result = {'name': stack.name, 'status': 'destroyed' if destroy else 'ok', 'vpc_id': None, 'asg_arn': None, 'error': None}
+        try:
+            if destroy:
+                await stack.destroy_async()
+            else:
+                steps = await stack.provision_async()
+                result['vpc_id'] = steps['vpc']
+                result['asg_arn'] = steps['asg']
+        except Exception as exc:
+            result['status'] = 'failed'
+            result['error'] = f"{type(exc).__name__}: {exc}"
+        result['seconds'] = round(time.perf_counter() - start, 1)
+        return result
+
+    return list(await asyncio.gather(*[run(stack) for stack in stacks]))
@@ -0,0 +1,640 @@
+import asyncio
+import time
+from botocore.exceptions import ClientError
+from Paginator import paginate_async
+from VPC import (ENDPOINT_GONE, FILTER_BATCH, GATEWAY_ENDPOINTS, TAG_BATCH, endpoint_changes, endpoint_service_name,
+                 rule_permissions, security_group_rule_changes, security_group_spec)
+
+
+class AsyncVpc:
+    def __init__(self, ec2_client, delay: float = 5):
+        """ Class that represents Amazon VPC service, driven by an aiobotocore client.
+
+        Every method has the semantics of the Vpc method of the same name, and must be awaited.
+
+        Args:
+            ec2_client : Aiobotocore EC2 client
+            delay (float): Seconds between two polls while waiting for a resource.
+        """
+        self.ec2_client = ec2_client
+        self.delay = delay
+
+    async def create_virtual_private_cloud(self, tags: list, cidr: str) -> str:
+        """This method creates virtual private cloud with given tags and cidr range.
+
+        Args:
+            tags (list): tags to add to the vpc
+            cidr (str): CIDR block
+
+        Returns:
+            str: Returns the VPC id.
+        """
+        if await self.check_virtual_private_cloud(tags, cidr):
+            vpc = await self.ec2_client.create_vpc(CidrBlock=cidr, TagSpecifications=[{'ResourceType': 'vpc', 'Tags': tags},])
+            vpc_id = vpc['Vpc']['VpcId']
+            while vpc['Vpc']['State'] != 'available':
+                await asyncio.sleep(self.delay)
+                vpc = {'Vpc': (await self.ec2_client.describe_vpcs(VpcIds=[vpc_id]))['Vpcs'][0]}
+            self.myvpc_id = vpc_id
+        return self.myvpc_id
+
+    async def check_virtual_private_cloud(self, tags: list, cidr: str) -> bool:
+        """This method checks if the virtual private cloud exists with given name and tags.
+
+        Args:
+            tags (list): tags to add to the vpc
+            cidr (str): CIDR block
+
+        Returns:
+            bool: False if it exists. True if it doesn't.
+        """
+        async for vpc in paginate_async(
+                self.ec2_client, 'describe_vpcs', 'Vpcs',
+                Filters=[{'Name': 'cidr', 'Values': [cidr]}] + self._tag_filters(tags[:2])):
+            if cidr == vpc['CidrBlock'] and tags[0] in vpc['Tags'] and tags[1] in vpc['Tags']:
+                self.myvpc_id = vpc['VpcId']
+                return False
+        return True
+
+    async def create_and_attach_internet_gateway(self, tags: list) -> str:
+        """This method creates and attaches an internet gateway with the vpc created.
+
+        Args:
+            tags (list): tags to add to an internet gateway.
+
+        Returns:
+            str: Return the internet gateway id.
+        """
+        if await self.check_internet_gateway(tags):
+            igw = await self.ec2_client.create_internet_gateway(TagSpecifications=[{'ResourceType': 'internet-gateway', 'Tags': tags},])
+            self.igw_id = igw['InternetGateway']['InternetGatewayId']
+
+        if await self.check_igw_attached_to_vpc():
+            await self.ec2_client.attach_internet_gateway(InternetGatewayId=self.igw_id, VpcId=self.myvpc_id)
+
+        return self.igw_id
+
+    async def check_internet_gateway(self, tags: list) -> bool:
+        """This method checks if an internet gateway exists with the given tags.
+
+        Args:
+            tags (list): tags to find if the internet gateway exists with the same tags.
+        """
+        async for igw in paginate_async(self.ec2_client, 'describe_internet_gateways', 'InternetGateways', Filters=self._tag_filters(tags[:2])):
+            if tags[0] in igw['Tags'] and tags[1] in igw['Tags']:
+                self.igw_id = igw['InternetGatewayId']
+                return False
+        return True
+
+    async def check_igw_attached_to_vpc(self) -> bool:
+        """This method checks if internet gateway is attached to vpc or not.
+
+        Returns:
+            bool: False if internet gateway is attached to vpc, else True.
+        """
+        async for igw in paginate_async(self.ec2_client, 'describe_internet_gateways', 'InternetGateways', InternetGatewayIds=[self.igw_id]):
+            if self.igw_id == igw['InternetGatewayId']:
+                return igw['Attachments'] == []
+        return False
+
+    async def create_public_route_table(self, tags: list) -> str:
+        """This method creates public route table.
+
+        Args:
+            tags (list): Tags to add to the public route table
+
+        Returns:
+            str: Return the public route table id.
+        """
+        if await self.check_public_route_table(tags):
+            self.public_rt_id = await self._create_route_table(tags, GatewayId=self.igw_id)
+        return self.public_rt_id
+
+    async def check_public_route_table(self, tags: list) -> bool:
+        """This method checks whether public route table is created or not.
+
+        Args:
+            tags (list): Tags to find the route table created.
+
+        Returns:
+            bool: False if public route table exists, else True.
+        """
+        rt_id = await self._find_route_table(tags)
+        if rt_id is None:
+            return True
+        self.public_rt_id = rt_id
+        return False
+
+    async def create_public_subnet(self, cidr: str, availability_zone: str, tags: list) -> str:
+        """This method creates public subnet.
+
+        Args:
+            cidr (str): The CIDR block of subnet.
+            availability_zone (str): Subnet will be created in that AZ.
+            tags (list): Tags to add to the subnet.
+
+        Returns:
+            str: Return the public subnet id.
+        """
+        subnet_id = await self._find_subnet(tags)
+        if subnet_id is None:
+            subnet_id = await self._create_subnet(cidr, availability_zone, tags, self.public_rt_id)
+        self.pub_subnet_id = subnet_id
+        return subnet_id
+
+    async def check_public_subnet(self, tags: list) -> bool:
+        """This method checks if public subnet exists.
+
+        Args:
+            tags (list): Tags of the subnet.
+
+        Returns:
+            bool: False if public subnet exists, else True.
+        """
+        subnet_id = await self._find_subnet(tags)
+        if subnet_id is None:
+            return True
+        self.pub_subnet_id = subnet_id
+        return False
+
+    async def create_nat_gateway(self, tags: list, name: str, subnet_id: str) -> str:
+        """This method creates an NAT gateway.
+
+        Args:
+            tags (list): tags to add to the nat gateway.
+            name (str): Name tag of the nat gateway.
+            subnet_id (str): Public subnet of the stack to create the nat gateway in.
+
+        Returns:
+            str: Return the nat gateway id.
+        """
+        nat_gw_id = await self._find_nat_gateway(tags, name)
+        if nat_gw_id is None:
+            elastic_ip = await self.ec2_client.allocate_address(Domain='vpc', TagSpecifications=[{'ResourceType': 'elastic-ip', 'Tags': tags},])
+            self.pub_sub1_id = subnet_id
+            tags = [{'Key': 'Name', 'Value': name}] + tags
+            nat_gw = await self.ec2_client.create_nat_gateway(SubnetId=subnet_id, AllocationId=elastic_ip['AllocationId'], TagSpecifications=[{'ResourceType': 'natgateway', 'Tags': tags},])
+            nat_gw_id = nat_gw['NatGateway']['NatGatewayId']
+            while True:
+                state = (await self.ec2_client.describe_nat_gateways(NatGatewayIds=[nat_gw_id]))['NatGateways'][0]
+                if state['State'] == 'available':
+                    break
+                if state['State'] in ('failed', 'deleting', 'deleted'):
+                    raise RuntimeError(f"nat_gateway {nat_gw_id} failed: {state.get('FailureMessage', state['State'])}")
+                await asyncio.sleep(self.delay)
+        self.nat_gw_id = nat_gw_id
+        return nat_gw_id
+
+    async def check_nat_gateway(self, tags: list, name: str = 'QubeNG') -> bool:
+        """This method checks if NAT gateway is already created.
+
+        Args:
+            tags (list): Tags to find if the NAT already created.
+            name (str): Name tag of the nat gateway.
+
+        Returns:
+            bool: False if NAT exists, else True.
+        """
+        nat_gw_id = await self._find_nat_gateway(tags, name)
+        if nat_gw_id is None:
+            return True
+        self.nat_gw_id = nat_gw_id
+        return False
+
+    async def create_private_route_table(self, tags: list, nat_gw_id: str = None) -> str:
+        """This method creates a private route table.
+
+        Args:
+            tags (list): Tags to add to the private route table.
+            nat_gw_id (str): NAT gateway of the default route. Defaults to the last one created or found.
+
+        Returns:
+            str: Return the private route table id.
+        """
+        rt_id = await self._find_route_table(tags)
+        if rt_id is None:
+            rt_id = await self._create_route_table(tags, NatGatewayId=nat_gw_id or self.nat_gw_id)
+        self.private_rt_id = rt_id
+        return rt_id
+
+    async def check_private_route_table(self, tags: list) -> bool:
+        """This method checks whether private route table is created or not.
+
+        Args:
+            tags (list): Tags to find the route table created.
+
+        Returns:
+            bool: False if private route table exists, else True.
+        """
+        rt_id = await self._find_route_table(tags)
+        if rt_id is None:
+            return True
+        self.private_rt_id = rt_id
+        return False
+
+    async def create_private_subnet(self, cidr: str, availability_zone: str, tags: list, rt_id: str = None) -> str:
+        """This method creates private subnet.
+
+        Args:
+            cidr (str): The CIDR block of subnet.
+            availability_zone (str): Subnet will be created in that AZ.
+            tags (list): Tags to add to the subnet.
+            rt_id (str): Private route table to associate the subnet with. Defaults to the last one created or found.
+
+        Returns:
+            str: Return the private subnet id.
+        """
+        subnet_id = await self._find_subnet(tags)
+        if subnet_id is None:
+            subnet_id = await self._create_subnet(cidr, availability_zone, tags, rt_id or self.private_rt_id)
+        self.pvt_subnet_id = subnet_id
+        return subnet_id
+
+    async def check_private_subnet(self, tags: list) -> bool:
+        """This method checks if private subnet exists.
+
+        Args:
+            tags (list): Tags of the subnet.
+
+        Returns:
+            bool: False if private subnet exists, else True.
+        """
+        subnet_id = await self._find_subnet(tags)
+        if subnet_id is None:
+            return True
+        self.pvt_subnet_id = subnet_id
+        return False
+
+    async def create_alb_security_group(self, name: str, desc: str, tags: list) -> str:
+        """This method creates security group for application load balancer.
+
+        Its rules are applied by reconcile_security_groups.
+
+        Args:
+            name (str): Name of the security group.
+            desc (str): Description for the security group.
+            tags (list): Tags to add to the security group.
+
+        Returns:
+            str: The security group id.
+        """
+        if await self.check_alb_security_group(name):
+            self.group_id = await self._create_security_group(name, desc, tags)
+        return self.group_id
+
+    async def check_alb_security_group(self, name: str) -> bool:
+        """This method checks if security group is there for alb or not.
+
+        Args:
+            name (str): Name of the security group to check.
+
+        Returns:
+            bool: False if alb security group exists, else True.
+        """
+        group_id = await self._find_security_group(name)
+        if group_id is None:
+            return True
+        self.group_id = group_id
+        return False
+
+    async def create_asg_security_group(self, name: str, desc: str, tags: list) -> str:
+        """This method creates security group for autoscaling group.
+
+        Its rules are applied by reconcile_security_groups.
+
+        Args:
+            name (str): Name of the security group.
+            desc (str): Description for the security group.
+            tags (list): Tags to add to the security group.
+
+        Returns:
+            str: The security group id.
+        """
+        if await self.check_asg_security_group(name):
+            self.asg_sgid = await self._create_security_group(name, desc, tags)
+        return self.asg_sgid
+
+    async def check_asg_security_group(self, name: str) -> bool:
+        """This method checks if security group is there for asg or not.
+
+        Args:
+            name (str): Name of the security group to check.
+
+        Returns:
+            bool: False if asg security group exists, else True.
+        """
+        group_id = await self._find_security_group(name)
+        if group_id is None:
+            return True
+        self.asg_sgid = group_id
+        return False
+
+    async def create_endpoint_security_group(self, name: str, desc: str, tags: list) -> str:
+        """This method creates the security group of the interface endpoints.
+
+        Its rules are applied by reconcile_security_groups.
+
+        Args:
+            name (str): Name of the security group.
+            desc (str): Description for the security group.
+            tags (list): Tags to add to the security group.
+
+        Returns:
+            str: The security group id.
+        """
+        if await self.check_endpoint_security_group(name):
+            self.endpoint_sgid = await self._create_security_group(name, desc, tags)
+        return self.endpoint_sgid
+
+    async def check_endpoint_security_group(self, name: str) -> bool:
+        """This method checks if the security group of the interface endpoints exists.
+
+        Args:
+            name (str): Name of the security group to check.
+
+        Returns:
+            bool: False if the endpoint security group exists, else True.
+        """
+        group_id = await self._find_security_group(name)
+        if group_id is None:
+            return True
+        self.endpoint_sgid = group_id
+        return False
+
+    async def read_security_group_rules(self, group_ids: list) -> dict:
+        """This method reads the rules of security groups, see Vpc.read_security_group_rules.
+
+        Args:
+            group_ids (list): Ids of the security groups.
+
+        Returns:
+            dict: The rules of every group, keyed by group id.
+        """
+        rules = {group_id: [] for group_id in group_ids}
+        for i in range(0, len(group_ids), FILTER_BATCH):
+            async for rule in paginate_async(self.ec2_client, 'describe_security_group_rules', 'SecurityGroupRules',
+                                             Filters=[{'Name': 'group-id', 'Values': group_ids[i:i + FILTER_BATCH]}]):
+                rules[rule['GroupId']].append(rule)
+        return rules
+
+    async def reconcile_security_groups(self, group_ids: dict, spec: dict = None) -> int:
+        """This method brings the ingress rules of the stack's security groups in line with a spec, see Vpc.reconcile_security_groups.
+
+        Args:
+            group_ids (dict): Id of every security group of the stack, keyed as in SECURITY_GROUPS_SPEC.
+            spec (dict): The 'security_groups' key of the stack spec, see SECURITY_GROUPS_SPEC.
+
+        Returns:
+            int: Number of ingress permissions the groups have.
+        """
+        spec = security_group_spec(spec)
+        live = await self.read_security_group_rules(list(group_ids.values()))
+        calls = []
+        count = 0
+        for kind, group_id in group_ids.items():
+            permissions = rule_permissions(spec[kind], group_ids)
+            authorize, revoke = security_group_rule_changes(permissions, live[group_id])
+            if authorize:
+                calls.append(self.ec2_client.authorize_security_group_ingress(GroupId=group_id, IpPermissions=authorize))
+            if revoke:
+                calls.append(self.ec2_client.revoke_security_group_ingress(GroupId=group_id, SecurityGroupRuleIds=revoke))
+            count += len(permissions)
+        await asyncio.gather(*calls)
+        return count
+
+    async def create_vpc_endpoint(self, service: str, tags: list, route_table_ids: list = None, subnet_ids: list = None, sg_id: str = None) -> str:
+        """This method creates a VPC endpoint, or brings the existing one to the given route tables or subnets, see Vpc.create_vpc_endpoint.
+
+        Args:
+            service (str): Short name of the service, e.g. 's3' or 'sqs'.
+            tags (list): Tags to add to the endpoint.
+            route_table_ids (list): Route tables of a gateway endpoint.
+            subnet_ids (list): Subnets of an interface endpoint, at most one per availability zone.
+            sg_id (str): Security group of an interface endpoint.
+
+        Returns:
+            str: The endpoint id.
+        """
+        service_name = endpoint_service_name(service, self.ec2_client.meta.region_name)
+        endpoint = await self._find_vpc_endpoint(service_name)
+        if endpoint is None:
+            if service in GATEWAY_ENDPOINTS:
+                params = {'VpcEndpointType': 'Gateway', 'RouteTableIds': route_table_ids}
+            else:
+                await self.ec2_client.modify_vpc_attribute(VpcId=self.myvpc_id, EnableDnsHostnames={'Value': True})
+                params = {'VpcEndpointType': 'Interface', 'SubnetIds': subnet_ids, 'SecurityGroupIds': [sg_id], 'PrivateDnsEnabled': True}
+            endpoint = (await self.ec2_client.create_vpc_endpoint(
+                VpcId=self.myvpc_id, ServiceName=service_name,
+                TagSpecifications=[{'ResourceType': 'vpc-endpoint', 'Tags': tags},], **params
+            ))['VpcEndpoint']
+        else:
+            changes = endpoint_changes(endpoint, route_table_ids, subnet_ids, sg_id)
+            if changes:
+                await self.ec2_client.modify_vpc_endpoint(VpcEndpointId=endpoint['VpcEndpointId'], **changes)
+        self.endpoint_id = endpoint['VpcEndpointId']
+        return endpoint['VpcEndpointId']
+
+    async def check_vpc_endpoint(self, service: str, tags: list) -> bool:
+        """This method checks if the vpc has an endpoint of a service.
+
+        Args:
+            service (str): Short name of the service, e.g. 'sqs'.
+            tags (list): Tags of the endpoint.
+
+        Returns:
+            bool: False if the endpoint exists, else True.
+        """
+        endpoint = await self._find_vpc_endpoint(endpoint_service_name(service, self.ec2_client.meta.region_name))
+        if endpoint is None:
+            return True
+        self.endpoint_id = endpoint['VpcEndpointId']
+        return False
+
+    async def delete_virtual_private_cloud(self, vpc_id: str) -> None:
+        """This method deletes the vpc. Everything created in it must be deleted first.
+
+        Args:
+            vpc_id (str): Id of the vpc.
+        """
+        await self._retry_in_use(self.ec2_client.delete_vpc, VpcId=vpc_id)
+
+    async def delete_internet_gateway(self, igw_id: str) -> None:
+        """This method detaches the internet gateway from its vpc and deletes it.
+
+        Args:
+            igw_id (str): Id of the internet gateway.
+        """
+        async for igw in paginate_async(self.ec2_client, 'describe_internet_gateways', 'InternetGateways', InternetGatewayIds=[igw_id]):
+            for attachment in igw['Attachments']:
+                await self._retry_in_use(self.ec2_client.detach_internet_gateway, InternetGatewayId=igw_id, VpcId=attachment['VpcId'])
+        await self.ec2_client.delete_internet_gateway(InternetGatewayId=igw_id)
+
+    async def delete_route_table(self, rt_id: str) -> None:
+        """This method disassociates a route table from its subnets and deletes it.
+
+        Args:
+            rt_id (str): Id of the route table.
+        """
+        async for rt in paginate_async(self.ec2_client, 'describe_route_tables', 'RouteTables', RouteTableIds=[rt_id]):
+            for association in rt['Associations']:
+                if not association['Main']:
+                    await self.ec2_client.disassociate_route_table(AssociationId=association['RouteTableAssociationId'])
+        await self._retry_in_use(self.ec2_client.delete_route_table, RouteTableId=rt_id)
+
+    async def delete_subnet(self, subnet_id: str) -> None:
+        """This method deletes a subnet, once the network interfaces left in it are released.
+
+        Args:
+            subnet_id (str): Id of the subnet.
+        """
+        await self._retry_in_use(self.ec2_client.delete_subnet, SubnetId=subnet_id)
+
+    async def delete_nat_gateway(self, nat_gw_id: str) -> None:
+        """This method deletes the NAT gateway, waits for it to be gone and releases its elastic IP.
+
+        Args:
+            nat_gw_id (str): Id of the NAT gateway.
+        """
+        nat_gateways = [ng async for ng in paginate_async(self.ec2_client, 'describe_nat_gateways', 'NatGateways', NatGatewayIds=[nat_gw_id])]
+        allocation_ids = [address['AllocationId'] for ng in nat_gateways for address in ng['NatGatewayAddresses'] if 'AllocationId' in address]
+        await self.ec2_client.delete_nat_gateway(NatGatewayId=nat_gw_id)
+        while any([ng['State'] not in ('deleted', 'failed') async for ng in paginate_async(
+                self.ec2_client, 'describe_nat_gateways', 'NatGateways', Filter=[{'Name': 'nat-gateway-id', 'Values': [nat_gw_id]}])]):
+            await asyncio.sleep(self.delay)
+        for allocation_id in allocation_ids:
+            await self._retry_in_use(self.ec2_client.release_address, AllocationId=allocation_id)
+
+    async def delete_security_group(self, group_id: str) -> None:
+        """This method deletes a security group, once no network interface or group references it.
+
+        Args:
+            group_id (str): Id of the security group.
+        """
+        await self._retry_in_use(self.ec2_client.delete_security_group, GroupId=group_id)
+
+    async def stale_vpc_endpoints(self, prefix: str, services: list) -> list:
+        """This method finds the endpoints of the vpc that were created for a service no longer wanted.
+
+        Args:
+            prefix (str): Start of the Name tag of the endpoints to consider, e.g. 'QubeEndpoint'.
+            services (list): Short names of the services whose endpoints are kept.
+
+        Returns:
+            list: The stale endpoints, as described by describe_vpc_endpoints.
+        """
+        region = self.ec2_client.meta.region_name
+        wanted = {endpoint_service_name(service, region) for service in services}
+        return [
+            endpoint async for endpoint in paginate_async(self.ec2_client, 'describe_vpc_endpoints', 'VpcEndpoints', Filters=[{'Name': 'vpc-id', 'Values': [self.myvpc_id]}])
+            if endpoint['ServiceName'] not in wanted and endpoint['State'].lower() not in ENDPOINT_GONE
+            and any(tag['Key'] == 'Name' and tag['Value'].startswith(prefix) for tag in endpoint.get('Tags', []))
+        ]
+
+    async def delete_vpc_endpoint(self, endpoint_id: str) -> None:
+        """This method deletes a VPC endpoint, see Vpc.delete_vpc_endpoint.
+
+        Args:
+            endpoint_id (str): Id of the endpoint.
+        """
+        failed = (await self.ec2_client.delete_vpc_endpoints(VpcEndpointIds=[endpoint_id])).get('Unsuccessful', [])
+        # The call succeeds even when the endpoint can't be deleted.
+        if failed:
+            raise RuntimeError(f"vpc_endpoint {endpoint_id}: {failed[0]['Error']['Message']}")
+
+    async def tag_resources(self, resource_ids: list, tags: list) -> None:
+        """This method adds or overwrites tags on many EC2 resources at once, see Vpc.tag_resources.
+
+        Args:
+            resource_ids (list): Ids of the resources.
+            tags (list): Tags to add to every resource.
+        """
+        for start in range(0, len(resource_ids), TAG_BATCH):
+            await self.ec2_client.create_tags(Resources=resource_ids[start:start + TAG_BATCH], Tags=tags)
+
+    async def _find_subnet(self, tags: list) -> str:
+        async for subnet in paginate_async(
+                self.ec2_client, 'describe_subnets', 'Subnets',
+                Filters=[{'Name': 'vpc-id', 'Values': [self.myvpc_id]}] + self._tag_filters(tags[:2])):
+            if tags[0] in subnet['Tags'] and tags[1] in subnet['Tags']:
+                return subnet['SubnetId']
+        return None
+
+    async def _create_subnet(self, cidr: str, availability_zone: str, tags: list, rt_id: str) -> str:
+        subnet = await self.ec2_client.create_subnet(CidrBlock=cidr, VpcId=self.myvpc_id, AvailabilityZone=availability_zone,
+                                                     TagSpecifications=[{'ResourceType': 'subnet', 'Tags': tags},])
+        subnet_id = subnet['Subnet']['SubnetId']
+        await self.ec2_client.associate_route_table(RouteTableId=rt_id, SubnetId=subnet_id)
+        return subnet_id
+
+    async def _find_nat_gateway(self, tags: list, name: str) -> str:
+        tags_to_find = [{'Key': 'Name', 'Value': name}] + tags
+        async for ng in paginate_async(self.ec2_client, 'describe_nat_gateways', 'NatGateways', Filter=self._tag_filters(tags_to_find[:2])):
+            if ng['State'] in ('deleting', 'deleted', 'failed'):
+                continue
+            if tags_to_find[0] in ng['Tags'] and tags_to_find[1] in ng['Tags']:
+                return ng['NatGatewayId']
+        return None
+
+    async def _find_route_table(self, tags: list) -> str:
+        async for rt in paginate_async(self.ec2_client, 'describe_route_tables', 'RouteTables', Filters=self._tag_filters(tags[:2])):
+            if tags[0] in rt['Tags'] and tags[1] in rt['Tags']:
+                return rt['RouteTableId']
+        return None
+
+    async def _create_route_table(self, tags: list, **target) -> str:
+        rt = await self.ec2_client.create_route_table(VpcId=self.myvpc_id, TagSpecifications=[{'ResourceType': 'route-table', 'Tags': tags},])
+        rt_id = rt['RouteTable']['RouteTableId']
+        await self.ec2_client.create_route(RouteTableId=rt_id, DestinationCidrBlock='0.0.0.0/0', **target)
+        return rt_id
+
+    async def _find_vpc_endpoint(self, service_name: str) -> dict:
+        async for endpoint in paginate_async(
+                self.ec2_client, 'describe_vpc_endpoints', 'VpcEndpoints',
+                Filters=[{'Name': 'vpc-id', 'Values': [self.myvpc_id]}, {'Name': 'service-name', 'Values': [service_name]}]):
+            if endpoint['State'].lower() not in ENDPOINT_GONE:
+                return endpoint
+        return None
+
+    async def _create_security_group(self, name: str, desc: str, tags: list) -> str:
+        sg = await self.ec2_client.create_security_group(
+            GroupName=name,
+            Description=desc,
+            VpcId=self.myvpc_id,
+            TagSpecifications=[{'ResourceType': 'security-group', 'Tags': tags},]
+        )
+        return sg['GroupId']
+
+    async def _find_security_group(self, name: str) -> str:
+        # See Vpc._find_security_group.
+        vpc_id = getattr(self, 'myvpc_id', None)
+        if vpc_id is None:
+            return None
+        async for sg in paginate_async(self.ec2_client, 'describe_security_groups', 'SecurityGroups',
+                                       Filters=[{'Name': 'group-name', 'Values': [name]}, {'Name': 'vpc-id', 'Values': [vpc_id]}]):
+            if sg['GroupName'] == name and sg['VpcId'] == vpc_id:
+                return sg['GroupId']
+        return None
+
+    async def _retry_in_use(self, operation, timeout: float = 600, **kwargs) -> None:
+        # See Vpc._retry_in_use.
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                await operation(**kwargs)
+                return
+            except ClientError as exc:
+                code = exc.response['Error']['Code']
+                if code not in ('DependencyViolation', 'InvalidIPAddress.InUse') or time.monotonic() > deadline:
+                    raise
+            await asyncio.sleep(self.delay)
+
+    def _tag_filters(self, tags: list) -> list:
+        """This method turns tags into describe filters, so only matching resources are returned.
+
+        Args:
+            tags (list): Tags the resources must have.
+
+        Returns:
+            list: One 'tag:<key>' filter per tag.
+        """
+        return [{'Name': 'tag:' + tag['Key'], 'Values': [tag['Value']]} for tag in tags]
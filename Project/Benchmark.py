@@ -0,0 +1,383 @@
+import argparse
+import ipaddress
+import json
+import os
+import threading
+import time
+from collections import Counter
+import boto3
+from Clients import ClientFactory
+from Fleet import Fleet, format_table
+from Inventory import Inventory
+from Plan import Plan
+from RateLimiter import RateLimiter
+from Stack import DEFAULT_SPEC
+from State import State
+from VPC import Vpc
+from ELB import Elb
+from ASG import Asg
+from EC2 import Ec2
+from IAM import Iam
+from SQS import Sqs
+from Messages import Consumer, Producer, lookup_queue_url
+from WaitManager import WaitManager
+
+# moto has every AZ of the region DEFAULT_SPEC uses.
+REGION = 'ap-south-1'
+
+
+class CallCounter:
+    def __init__(self, latency: float = 0) -> None:
+        """Class that represents a count of the API calls made by the clients of a session.
+
+        Args:
+            latency (float): Seconds every call is delayed by, to stand in for the network.
+        """
+        self.latency = latency
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def attach(self, session) -> None:
+        """This method counts every call of the clients the session builds from now on.
+
+        Args:
+            session (boto3.session.Session): Session of the clients.
+        """
+        session.events.register('before-call', self._before_call, unique_id='qube-benchmark-before-call')
+
+    def snapshot(self) -> Counter:
+        """This method copies the counts so far.
+
+        Returns:
+            Counter: Calls per (service, operation).
+        """
+        with self.lock:
+            return Counter(self.calls)
+
+    def since(self, snapshot: Counter) -> dict:
+        """This method counts the calls made since a snapshot, per service.
+
+        Args:
+            snapshot (Counter): Counts returned by snapshot.
+
+        Returns:
+            dict: Calls per service and per operation.
+        """
+        calls = self.snapshot() - snapshot
+        services = Counter()
+        for (service, _), count in calls.items():
+            services[service] += count
+        return {
+            'total': sum(calls.values()),
+            'services': dict(sorted(services.items())),
+            'operations': {f'{service}.{operation}': count for (service, operation), count in sorted(calls.items())},
+        }
+
+    def _before_call(self, model, **kwargs) -> None:
+        with self.lock:
+            self.calls[(model.service_model.service_name, model.name)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def bench_specs(count: int) -> list:
+    """This function builds the specs of the benchmarked stacks.
+
+    Args:
+        count (int): Number of stacks.
+
+    Returns:
+        list: One spec per stack, each in its own 10.x.0.0/16.
+    """
+    if count == 1:
+        return [dict(DEFAULT_SPEC)]
+    return [
+        {
+            'name': f'Bench{i}',
+            'cidr': f'10.{i}.0.0/16',
+            'public_subnets': [{'cidr': f'10.{i}.1.0/24', 'az': REGION + 'a'}, {'cidr': f'10.{i}.2.0/24', 'az': REGION + 'b'}],
+            'private_subnets': [{'cidr': f'10.{i}.3.0/24', 'az': REGION + 'a'}],
+            'tags': DEFAULT_SPEC['tags'],
+        }
+        for i in range(count)
+    ]
+
+
+class Benchmark:
+    def __init__(self, stacks: int = 1, subnets: int = 0, security_groups: int = 0, latency: float = 0,
+                 poll_delay: float = 0.5, workers: int = 4, messages: int = 0) -> None:
+        """Class that represents one benchmark run of the whole provisioning flow against moto.
+
+        The account is first filled with unrelated subnets and security groups, then the flow of
+        script.py runs phase by phase: inventory read, plan, provisioning, the no-op run of an
+        unchanged stack, every check_* method on its own, and teardown. Every phase records its
+        wall clock and its API calls per service and operation. With messages, the queue of the
+        first stack is also filled by a Producer and drained by a Consumer.
+
+        Args:
+            stacks (int): Number of stacks provisioned together, as a fleet.
+            subnets (int): Number of unrelated subnets in the account.
+            security_groups (int): Number of unrelated security groups in the account.
+            latency (float): Seconds added to every API call.
+            poll_delay (float): Seconds between two polls of the shared waiter.
+            workers (int): Maximum number of stacks provisioned at the same time.
+            messages (int): Number of messages sent through the queue, 0 to skip it.
+        """
+        self.stacks = stacks
+        self.subnets = subnets
+        self.security_groups = security_groups
+        self.latency = latency
+        self.poll_delay = poll_delay
+        self.workers = workers
+        self.messages = messages
+        self.results = {}
+
+    def run(self) -> dict:
+        """This method runs the benchmark. moto is only imported here.
+
+        Returns:
+            dict: The results, see the README.
+        """
+        from moto import mock_autoscaling, mock_ec2, mock_elbv2, mock_iam, mock_sqs
+
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+        os.environ['MOTO_EC2_LOAD_DEFAULT_AMIS'] = 'false'
+
+        with mock_ec2(), mock_elbv2(), mock_autoscaling(), mock_iam(), mock_sqs():
+            start = time.perf_counter()
+            self.seed()
+            seed_seconds = round(time.perf_counter() - start, 3)
+
+            session = boto3.session.Session(region_name=REGION)
+            counter = CallCounter(self.latency)
+            counter.attach(session)
+            clients = ClientFactory(session, RateLimiter.CLIENT_CONFIG, max(50, self.workers * 8), RateLimiter())
+            inventory = Inventory(clients['ec2_client'], clients['elbv2_client'], clients['as_client'], clients['iam_client'])
+            fleet = Fleet(bench_specs(self.stacks), clients, inventory, self.workers, WaitManager(delay=self.poll_delay), State(':memory:'))
+
+            self.results = {
+                'config': {
+                    'stacks': self.stacks, 'subnets': self.subnets, 'security_groups': self.security_groups,
+                    'latency': self.latency, 'poll_delay': self.poll_delay, 'workers': self.workers,
+                    'messages': self.messages,
+                },
+                'seed_seconds': seed_seconds,
+                'phases': {},
+                'steps': {},
+                'checks': {},
+                'critical_path': {},
+            }
+            phases = self.results['phases']
+
+            phases['inventory_refresh'] = self.measure(counter, inventory.refresh)
+            phases['plan'] = self.measure(counter, lambda: [Plan(stack).compute() for stack in fleet.stacks])
+            phases['provision'] = self.measure(counter, fleet.provision)
+            self.record_dags(fleet, 'provision')
+            phases['verify_noop'] = self.measure(counter, lambda: [stack.verify() for stack in fleet.stacks])
+            self.measure_checks(counter, clients, fleet.stacks[0])
+            if self.messages:
+                self.measure_messages(counter, clients, fleet.stacks[0])
+            phases['destroy'] = self.measure(counter, fleet.destroy)
+            self.record_dags(fleet, 'destroy')
+        return self.results
+
+    def seed(self) -> None:
+        """This method fills the account with unrelated subnets and security groups, spread over VPCs."""
+        ec2_client = boto3.client('ec2', region_name=REGION)
+        noise = [{'Key': 'Product', 'Value': 'noise'}]
+        vpc_ids = []
+        # A /16 holds 4096 /28 subnets.
+        for i in range(max(1, -(-max(self.subnets, self.security_groups) // 4096))):
+            cidr = ipaddress.ip_network(f'100.{64 + i}.0.0/16')
+            vpc_ids.append((ec2_client.create_vpc(CidrBlock=str(cidr))['Vpc']['VpcId'], list(cidr.subnets(new_prefix=28))))
+        for i in range(self.subnets):
+            vpc_id, cidrs = vpc_ids[i // 4096]
+            ec2_client.create_subnet(
+                VpcId=vpc_id, CidrBlock=str(cidrs[i % 4096]),
+                TagSpecifications=[{'ResourceType': 'subnet', 'Tags': noise + [{'Key': 'Name', 'Value': f'noise{i}'}]}]
+            )
+        for i in range(self.security_groups):
+            ec2_client.create_security_group(
+                GroupName=f'noise{i}', Description='benchmark noise', VpcId=vpc_ids[i // 4096][0],
+                TagSpecifications=[{'ResourceType': 'security-group', 'Tags': noise}]
+            )
+
+    def measure(self, counter: CallCounter, func) -> dict:
+        """This method runs one phase.
+
+        Args:
+            counter (CallCounter): Counter of the clients the phase calls.
+            func : Callable running the phase.
+
+        Returns:
+            dict: Wall clock seconds and calls of the phase.
+        """
+        snapshot = counter.snapshot()
+        start = time.perf_counter()
+        func()
+        return dict(seconds=round(time.perf_counter() - start, 3), calls=counter.since(snapshot))
+
+    def record_dags(self, fleet: Fleet, phase: str) -> None:
+        """This method keeps the step timings and the longest critical path of the last fleet run.
+
+        Args:
+            fleet (Fleet): The benchmarked fleet.
+            phase (str): Name of the phase the graphs ran in.
+        """
+        longest = {'stack': None, 'steps': [], 'seconds': 0}
+        steps = {}
+        for stack in fleet.stacks:
+            timings = stack.dag.timings
+            for step, (start, end) in timings.items():
+                steps[step] = max(steps.get(step, 0), round(end - start, 3))
+            path = stack.dag.critical_path()
+            if path:
+                seconds = round(timings[path[-1]][1] - timings[path[0]][0], 3)
+                if seconds >= longest['seconds']:
+                    longest = {'stack': stack.name, 'steps': path, 'seconds': seconds}
+        self.results['steps'][phase] = steps
+        self.results['critical_path'][phase] = longest
+
+    def measure_messages(self, counter: CallCounter, clients, stack) -> None:
+        """This method sends messages through the queue of a provisioned stack while a consumer drains it.
+
+        The consumer runs alongside the producer, as it would in production, and stops after one
+        empty receive, so the drain phase ends with a one second poll.
+
+        Args:
+            counter (CallCounter): Counter of the clients.
+            clients : Clients of the run.
+            stack (Stack): A provisioned stack.
+        """
+        sqs_client = clients['sqs_client']
+        queue_url = lookup_queue_url(sqs_client, stack.name + 'SQS')
+        producer = Producer(sqs_client, queue_url)
+        consumer = Consumer(sqs_client, queue_url, lambda message: None, wait_time=1)
+        phases = self.results['phases']
+        consumer.start(idle_polls=1)
+        phases['sqs_produce'] = self.measure(counter, lambda: producer.send(f'message {i}' for i in range(self.messages)))
+        phases['sqs_drain'] = self.measure(counter, consumer.join)
+        self.results['messages'] = {
+            'sqs_produce': round(self.messages / phases['sqs_produce']['seconds']),
+            'sqs_consume': round(self.messages / (phases['sqs_produce']['seconds'] + phases['sqs_drain']['seconds'])),
+        }
+
+    def measure_checks(self, counter: CallCounter, clients, stack) -> None:
+        """This method times every check_* method on its own, against a provisioned stack.
+
+        The wrappers are built without an inventory, so each check makes its own calls, as it
+        does when script.py runs without a snapshot.
+
+        Args:
+            counter (CallCounter): Counter of the clients.
+            clients : Clients of the run.
+            stack (Stack): A provisioned stack.
+        """
+        name = stack.name
+        vpc = Vpc(clients['ec2_resource'], clients['ec2_client'])
+        elb = Elb(clients['elbv2_client'])
+        asg = Asg(clients['as_client'])
+        ec2 = Ec2(clients['ec2_client'])
+        iam = Iam(clients['iam_client'])
+        sqs = Sqs(clients['sqs_resource'])
+        checks = [
+            ('Vpc.check_virtual_private_cloud', lambda: vpc.check_virtual_private_cloud(stack.named_tags('VPC'), stack.spec['cidr'])),
+            ('Vpc.check_internet_gateway', lambda: vpc.check_internet_gateway(stack.named_tags('IG'))),
+            ('Vpc.check_igw_attached_to_vpc', vpc.check_igw_attached_to_vpc),
+            ('Vpc.check_public_route_table', lambda: vpc.check_public_route_table(stack.named_tags('PublicRT'))),
+            ('Vpc.check_public_subnet', lambda: vpc.check_public_subnet(stack.named_tags('PublicSubnet1'))),
+            ('Vpc.check_nat_gateway', lambda: vpc.check_nat_gateway(stack.tags, name + 'NG')),
+            ('Vpc.check_private_route_table', lambda: vpc.check_private_route_table(stack.named_tags('PrivateRT'))),
+            ('Vpc.check_private_subnet', lambda: vpc.check_private_subnet(stack.named_tags('PrivateSubnet1'))),
+            ('Vpc.check_alb_security_group', lambda: vpc.check_alb_security_group(name + 'AlbSG')),
+            ('Vpc.check_asg_security_group', lambda: vpc.check_asg_security_group(name + 'AsgSG')),
+            ('Sqs.check_sqs_queue', lambda: sqs.check_sqs_queue(name + 'SQS')),
+            ('Elb.check_elb', lambda: elb.check_elb(name + 'ALB', name + 'TG')),
+            ('Iam.check_instance_profile', lambda: iam.check_instance_profile(name + 'IP')),
+            ('Iam.check_iam_policy', lambda: iam.check_iam_policy(name + 'Policy', name + 'Role')),
+            ('Ec2.check_key_pair', lambda: ec2.check_key_pair(name + 'Key')),
+            ('Ec2.check_launch_template', lambda: ec2.check_launch_template(name + 'LT')),
+            ('Asg.check_asg', lambda: asg.check_asg(name + 'ASG')),
+        ]
+        for method, check in checks:
+            snapshot = counter.snapshot()
+            start = time.perf_counter()
+            missing = check()
+            self.results['checks'][method] = {
+                'seconds': round(time.perf_counter() - start, 3),
+                'calls': counter.since(snapshot)['total'],
+                'found': not missing,
+            }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """This function lists the regressions of a run against a baseline run of the same config.
+
+    A phase or check regresses if it makes more calls than the baseline, or takes longer than the
+    baseline by more than the tolerance.
+
+    Args:
+        results (dict): Results of the run.
+        baseline (dict): Results of the baseline run.
+        tolerance (float): Allowed relative increase of wall clock.
+
+    Returns:
+        list: One message per regression.
+    """
+    regressions = []
+    if results['config'] != baseline['config']:
+        regressions.append(f"config differs from the baseline: {baseline['config']}")
+    for group, count_of in [('phases', lambda entry: entry['calls']['total']), ('checks', lambda entry: entry['calls'])]:
+        for name, entry in results[group].items():
+            base = baseline.get(group, {}).get(name)
+            if base is None:
+                continue
+            if count_of(entry) > count_of(base):
+                regressions.append(f"{name}: {count_of(entry)} calls, baseline {count_of(base)}")
+            if entry['seconds'] > base['seconds'] * (1 + tolerance) and entry['seconds'] - base['seconds'] > 0.05:
+                regressions.append(f"{name}: {entry['seconds']}s, baseline {base['seconds']}s")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the provisioning flow against moto.")
+    parser.add_argument("--stacks", type=int, default=1, help="number of stacks provisioned as a fleet")
+    parser.add_argument("--subnets", type=int, default=0, help="unrelated subnets created in the account first, e.g. 10000")
+    parser.add_argument("--security-groups", type=int, default=0, help="unrelated security groups created in the account first")
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every API call")
+    parser.add_argument("--poll-delay", type=float, default=0.5, help="seconds between two polls of the shared waiter")
+    parser.add_argument("--workers", type=int, default=4, help="number of stacks provisioned at the same time")
+    parser.add_argument("--messages", type=int, default=0, help="messages sent through the first stack's queue and consumed, e.g. 10000")
+    parser.add_argument("--output", metavar="FILE", default="benchmark.json", help="JSON file to write the results to")
+    parser.add_argument("--baseline", metavar="FILE", help="JSON results to compare with; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative increase of wall clock")
+    args = parser.parse_args()
+
+    results = Benchmark(args.stacks, args.subnets, args.security_groups, args.latency, args.poll_delay, args.workers, args.messages).run()
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+
+    rows = [
+        {'phase': phase, 'seconds': entry['seconds'], 'calls': entry['calls']['total'],
+         **{service: count for service, count in entry['calls']['services'].items()}}
+        for phase, entry in results['phases'].items()
+    ]
+    services = sorted({service for entry in results['phases'].values() for service in entry['calls']['services']})
+    print(format_table(rows, ['phase', 'seconds', 'calls'] + services))
+    for phase, path in results['critical_path'].items():
+        print(f"Critical path of {phase} ({path['seconds']}s):", " -> ".join(path['steps']))
+    for phase, rate in results.get('messages', {}).items():
+        print(f"{phase}: {rate} messages per second")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print("Regression:", regression)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
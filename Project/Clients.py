@@ -0,0 +1,99 @@
+import threading
+from collections.abc import Mapping
+import boto3
+from botocore.config import Config
+
+
+class LazyClient:
+    def __init__(self, factory, key: str) -> None:
+        """Class that represents a client or resource that is only built when it is first used.
+
+        Every attribute is looked up on the real client, which the factory builds on the first
+        lookup, so wrappers can be handed their clients before knowing whether they will call them.
+
+        Args:
+            factory (ClientFactory): Factory that builds the real client.
+            key (str): Key of the client in the factory.
+        """
+        self._factory = factory
+        self._key = key
+
+    def __getattr__(self, name: str):
+        return getattr(self._factory.build(self._key), name)
+
+    def __repr__(self) -> str:
+        return f"LazyClient({self._key!r})"
+
+
+class ClientFactory(Mapping):
+    # How each key of the clients dict is built: (boto3 session method, service name).
+    SERVICES = {
+        'ec2_resource': ('resource', 'ec2'),
+        'ec2_client': ('client', 'ec2'),
+        'sqs_resource': ('resource', 'sqs'),
+        'sqs_client': ('client', 'sqs'),
+        'as_client': ('client', 'autoscaling'),
+        'elbv2_client': ('client', 'elbv2'),
+        'iam_client': ('client', 'iam'),
+    }
+
+    def __init__(self, session=None, config: Config = None, max_pool_connections: int = 50, limiter=None) -> None:
+        """Class that represents the clients dict of a run, with every client built on first use.
+
+        It can be passed wherever a clients dict is expected; its values are LazyClient objects.
+        All clients come from one boto3 session, so credentials are resolved once and each
+        service model is loaded once, and a client is only built when a call first needs it, so
+        short commands don't pay for the services they never call. Each client is built once and
+        shared by every thread, with a connection pool large enough for the workers calling it.
+
+        Args:
+            session (boto3.session.Session): Session to build the clients from. A new one by default.
+            config (Config): Config of every client, e.g. RateLimiter.CLIENT_CONFIG.
+            max_pool_connections (int): Maximum number of pooled HTTP connections of each client.
+            limiter (RateLimiter): Optional rate limiter to attach to every client.
+        """
+        self.session = session or boto3.session.Session()
+        self.config = (config or Config()).merge(Config(max_pool_connections=max_pool_connections))
+        self.limiter = limiter
+        self._lazy = {key: LazyClient(self, key) for key in self.SERVICES}
+        self._clients = {}
+        # Building clients from one session isn't thread safe, so they are built one at a time.
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> LazyClient:
+        return self._lazy[key]
+
+    def __iter__(self):
+        return iter(self.SERVICES)
+
+    def __len__(self) -> int:
+        return len(self.SERVICES)
+
+    def build(self, key: str):
+        """This method returns the real client of a key, building it on the first call.
+
+        Args:
+            key (str): Key of the client, one of SERVICES.
+
+        Returns:
+            The boto3 client or resource.
+        """
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    method, service = self.SERVICES[key]
+                    client = getattr(self.session, method)(service, config=self.config)
+                    if self.limiter is not None:
+                        self.limiter.attach(client)
+                    self._clients[key] = client
+        return client
+
+    def built(self) -> list:
+        """This method lists the clients built so far.
+
+        Returns:
+            list: Keys of the clients that were used.
+        """
+        return list(self._clients)
@@ -0,0 +1,171 @@
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Dag:
+    def __init__(self, max_workers: int = 8) -> None:
+        """Class that represents a dependency graph of provisioning steps.
+
+        Every node declares the nodes it takes as inputs. When the graph is run, every node whose
+        inputs are ready is submitted to a thread pool, so independent steps run concurrently.
+
+        Args:
+            max_workers (int): Maximum number of steps to run at the same time.
+        """
+        self.max_workers = max_workers
+        self.nodes = {}
+        self.results = {}
+        self.timings = {}
+
+    def add_node(self, name: str, func, inputs: list = None) -> None:
+        """This method adds a step to the graph.
+
+        Args:
+            name (str): Unique name of the step.
+            func : Callable that runs the step. It is called with the results of the inputs, in order.
+            inputs (list): Names of the steps this step depends on.
+        """
+        if name in self.nodes:
+            raise ValueError(f"Node {name} is already in the graph")
+        self.nodes[name] = (func, list(inputs or []))
+
+    def check_graph(self) -> list:
+        """This method checks that every input exists and that the graph has no cycle.
+
+        Returns:
+            list: Names of the steps in a valid execution order.
+        """
+        for name, (_, inputs) in self.nodes.items():
+            for dep in inputs:
+                if dep not in self.nodes:
+                    raise ValueError(f"Node {name} depends on unknown node {dep}")
+
+        order = []
+        pending = {name: set(inputs) for name, (_, inputs) in self.nodes.items()}
+        while pending:
+            ready = [name for name, deps in pending.items() if not deps]
+            if not ready:
+                raise ValueError(f"Cycle detected between nodes {sorted(pending)}")
+            for name in ready:
+                del pending[name]
+                order.append(name)
+            for deps in pending.values():
+                deps.difference_update(ready)
+        return order
+
+    def run(self) -> dict:
+        """This method runs every step, starting each one as soon as all its inputs are done.
+
+        If a step raises, no new step is started, the running ones are allowed to finish and the
+        first exception is raised again.
+
+        Returns:
+            dict: Result of every step, keyed by step name.
+        """
+        self.check_graph()
+        self.results = {}
+        self.timings = {}
+        started = set()
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                if error is None:
+                    for name, (func, inputs) in self.nodes.items():
+                        if name not in started and all(dep in self.results for dep in inputs):
+                            args = [self.results[dep] for dep in inputs]
+                            running[executor.submit(self._run_node, name, func, args)] = name
+                            started.add(name)
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as exc:
+                        if error is None:
+                            error = exc
+
+        if error is not None:
+            raise error
+        return self.results
+
+    async def run_async(self) -> dict:
+        """This method runs every step on the event loop, starting each one as soon as all its inputs are done.
+
+        Steps may return awaitables, which are awaited; at most max_workers steps run at the same
+        time. Errors are handled as in run.
+
+        Returns:
+            dict: Result of every step, keyed by step name.
+        """
+        self.check_graph()
+        self.results = {}
+        self.timings = {}
+        slots = asyncio.Semaphore(self.max_workers)
+        started = set()
+        running = {}
+        error = None
+
+        while True:
+            if error is None:
+                for name, (func, inputs) in self.nodes.items():
+                    if name not in started and all(dep in self.results for dep in inputs):
+                        args = [self.results[dep] for dep in inputs]
+                        running[asyncio.ensure_future(self._run_node_async(slots, name, func, args))] = name
+                        started.add(name)
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    self.results[name] = task.result()
+                except Exception as exc:
+                    if error is None:
+                        error = exc
+
+        if error is not None:
+            raise error
+        return self.results
+
+    async def _run_node_async(self, slots: asyncio.Semaphore, name: str, func, args: list):
+        async with slots:
+            start = time.perf_counter()
+            try:
+                result = func(*args)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            finally:
+                self.timings[name] = (start, time.perf_counter())
+
+    def _run_node(self, name: str, func, args: list):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.timings[name] = (start, time.perf_counter())
+
+    def critical_path(self) -> list:
+        """This method finds the chain of steps that bounded the wall clock of the last run.
+
+        Returns:
+            list: Names of the steps on the critical path, from first to last.
+        """
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while self.nodes[name][1]:
+            name = max(self.nodes[name][1], key=lambda n: self.timings[n][1])
+            path.append(name)
+        return path[::-1]
@@ -1,51 +1,187 @@
+import hashlib
+import json
+import os
+from Paginator import paginate
+
+# Launch template contents shared with AsyncEc2.
+IMAGE_ID = 'ami-078efad6f7ec18b8a'
+USER_DATA = 'IyEvYmluL2Jhc2gKeXVtIGluc3RhbGwgaHR0cGQgLXkKc2VydmljZSBodHRwZCBzdGFydApjaGtjb25maWcgaHR0cGQgb24KbWtkaXIgLXAgL3Zhci93d3cvaHRtbC93b3JsZHNvZ29vZAplY2hvICJIZWxsbyB3b3JsZCBweXRob24iID4gL3Zhci93d3cvaHRtbC93b3JsZHNvZ29vZC9pbmRleC5odG1sCg=='
+
+# Tag of a launch template recording '<version>:<hash>' of the latest version the project created.
+CONTENT_TAG = 'QubeContentHash'
+
+
+def launch_template_data(iam_ip_name: str, sg: list, key_name: str, image_id: str = IMAGE_ID, user_data: str = USER_DATA,
+                         instance_type: str = None) -> dict:
+    """This function builds the LaunchTemplateData of the instances of a stack.
+
+    Args:
+        iam_ip_name (str): IAM instance profile.
+        sg (list): security groups.
+        key_name (str): Name of the key pair to launch instances with.
+        image_id (str): AMI of the instances.
+        user_data (str): Base64 encoded user data of the instances.
+        instance_type (str): Instance type of the instances. None leaves it to the autoscaling group.
+
+    Returns:
+        dict: The launch template data.
+    """
+    data = {
+        'IamInstanceProfile': {
+            'Name': iam_ip_name
+        },
+        'ImageId': image_id,
+        'KeyName': key_name,
+        'Monitoring': {
+            'Enabled': False
+        },
+        'UserData': user_data,
+        'SecurityGroupIds': sg,
+    }
+    if instance_type is not None:
+        data['InstanceType'] = instance_type
+    return data
+
+
+def content_hash(data: dict) -> str:
+    """This function hashes launch template data, so two versions can be compared without reading them.
+
+    Args:
+        data (dict): Launch template data.
+
+    Returns:
+        str: Hex digest of the data.
+    """
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def recorded_content(template: dict) -> tuple:
+    """This function reads the version and hash recorded on a launch template.
+
+    Args:
+        template (dict): The template, as described by describe_launch_templates.
+
+    Returns:
+        tuple: The recorded version number and hash, or (None, None) if the template has no record.
+    """
+    for tag in template.get('Tags', []):
+        if tag['Key'] == CONTENT_TAG:
+            version, _, digest = tag['Value'].partition(':')
+            return int(version), digest
+    return None, None
+
+
+def content_matches(template: dict, digest: str) -> bool:
+    """This function tells if the latest version of a launch template has the given content.
+
+    The record is only trusted if no version was added since the project wrote it.
+
+    Args:
+        template (dict): The template, as described by describe_launch_templates.
+        digest (str): Hash of the wanted launch template data, see content_hash.
+
+    Returns:
+        bool: True if the latest version has that content.
+    """
+    version, recorded = recorded_content(template)
+    return version == template['LatestVersionNumber'] and recorded == digest
+
+
 class Ec2:
-    def __init__(self,ec2_client):
+    def __init__(self,ec2_client, inventory=None):
         """Class that represents Amazon EC2 service.
 
         Args:
             ec2_client : EC2 client to create, manage and configure AWS EC2 service at low level
+            inventory (Inventory): Optional snapshot to serve existence checks from.
         """
         self.ec2_client=ec2_client
+        self.inventory = inventory
+        # Launch templates read by name when there is no inventory, keyed by name.
+        self.launch_templates = {}
+
+    def create_launch_template(self, name: str, iam_ip_name: str, tags: list, sg: list, key_name: str = 'QubeKey',
+                               image_id: str = IMAGE_ID, user_data: str = USER_DATA, instance_type: str = None) -> str:
+        """This method creates launch template, or a new version of it when its content changed.
 
-    def create_launch_template(self, name: str, iam_ip_name: str, tags: list, sg: list) -> str:
-        """This method creates launch template.
+        The content is hashed and compared with the hash recorded on the template for its
+        latest version, so an unchanged template costs the lookup and nothing else. A changed
+        AMI, user data or security group list becomes a new version, which the autoscaling group
+        launches by number and can roll to; the number is kept in self.lt_version.
 
         Args:
             name (str): Name of the launch template.
             iam_ip_name (str): IAM instance profile.
             tags (list): tags to add to the launch template.
             sg (list): security groups.
+            key_name (str): Name of the key pair to launch instances with.
+            image_id (str): AMI of the instances.
+            user_data (str): Base64 encoded user data of the instances.
+            instance_type (str): Instance type of the instances. None leaves it to the autoscaling group.
 
         Returns:
             str: Return launch template id.
         """
-        if self.check_launch_template(name):
+        data = launch_template_data(iam_ip_name, sg, key_name, image_id, user_data, instance_type)
+        digest = content_hash(data)
+        template = self.find_launch_template(name)
+        if template is None:
             self.lt = self.ec2_client.create_launch_template(
                 LaunchTemplateName=name,
-                LaunchTemplateData={
-                    'IamInstanceProfile': {
-                        'Name': iam_ip_name
-                    },
-                    'ImageId': 'ami-078efad6f7ec18b8a',
-                    'KeyName': 'QubeKey',
-                    'Monitoring': {
-                        'Enabled': False
-                    },
-                    'UserData': 'IyEvYmluL2Jhc2gKeXVtIGluc3RhbGwgaHR0cGQgLXkKc2VydmljZSBodHRwZCBzdGFydApjaGtjb25maWcgaHR0cGQgb24KbWtkaXIgLXAgL3Zhci93d3cvaHRtbC93b3JsZHNvZ29vZAplY2hvICJIZWxsbyB3b3JsZCBweXRob24iID4gL3Zhci93d3cvaHRtbC93b3JsZHNvZ29vZC9pbmRleC5odG1sCg==',
-                    'SecurityGroupIds': sg,
-                },
+                VersionDescription=digest,
+                LaunchTemplateData=data,
                 TagSpecifications=[
                     {
                         'ResourceType': 'launch-template',
-                        'Tags': tags
+                        'Tags': tags + [{'Key': CONTENT_TAG, 'Value': f'1:{digest}'}]
                     },
                 ]
             )
-
             self.lt_id = self.lt['LaunchTemplate']['LaunchTemplateId']
+            self.lt_version = str(self.lt['LaunchTemplate']['LatestVersionNumber'])
+            self._invalidate_launch_template(name)
+        elif content_matches(template, digest):
+            self.lt_id = template['LaunchTemplateId']
+            self.lt_version = str(template['LatestVersionNumber'])
+        else:
+            self.lt_id = template['LaunchTemplateId']
+            version = self.ec2_client.create_launch_template_version(
+                LaunchTemplateId=self.lt_id,
+                VersionDescription=digest,
+                LaunchTemplateData=data,
+            )['LaunchTemplateVersion']['VersionNumber']
+            self.ec2_client.create_tags(Resources=[self.lt_id], Tags=[{'Key': CONTENT_TAG, 'Value': f'{version}:{digest}'}])
+            self.lt_version = str(version)
+            self._invalidate_launch_template(name)
 
         return self.lt_id
 
+    def find_launch_template(self, name: str) -> dict:
+        """This method looks up a launch template by name.
+
+        Lookups are served from the inventory when there is one. Otherwise the template is read
+        by name with one call and kept, so later lookups of the same name are free.
+
+        Args:
+            name (str): The name of the launch template to find.
+
+        Returns:
+            dict: The template, as described by describe_launch_templates, or None.
+        """
+        if self.inventory is not None:
+            for lt in self.inventory.find('launch_templates', name=name):
+                return lt
+            return None
+        if name not in self.launch_templates:
+            try:
+                launch_templates = self.ec2_client.describe_launch_templates(LaunchTemplateNames=[name])['LaunchTemplates']
+            except self.ec2_client.exceptions.ClientError as exc:
+                if exc.response['Error']['Code'] != 'InvalidLaunchTemplateName.NotFoundException':
+                    raise
+                launch_templates = []
+            self.launch_templates[name] = launch_templates[0] if launch_templates else None
+        return self.launch_templates[name]
+
     def check_launch_template(self, name: str) -> bool:
         """This method checks if launch template exists with the given name.
 
@@ -55,22 +191,37 @@ class Ec2:
         Returns:
             bool: Return False if launch template with the given name exists, else True.
         """
-        for lt in self.ec2_client.describe_launch_templates()['LaunchTemplates']:
-            if name == lt['LaunchTemplateName']:
-                self.lt_id = lt['LaunchTemplateId']
-                return False
-        else:
+        template = self.find_launch_template(name)
+        if template is None:
             return True
+        self.lt_id = template['LaunchTemplateId']
+        self.lt_version = str(template['LatestVersionNumber'])
+        return False
+
+    def _invalidate_launch_template(self, name: str) -> None:
+        """This method forgets a launch template after a change, so its next lookup reads it again.
+
+        Args:
+            name (str): Name of the launch template.
+        """
+        self.launch_templates.pop(name, None)
+        if self.inventory is not None:
+            self.inventory.invalidate('launch_templates')
         
-    def create_key(self, tags: list) -> None:
+    def create_key(self, tags: list, name: str = 'QubeKey', path: str = None) -> str:
         """This method creates key pair.
 
         Args:
             tags (list): Tags to add to the key pair.
+            name (str): Name of the key pair.
+            path (str): File the private key is saved to, <name>.pem by default.
+
+        Returns:
+            str: Return the key pair id.
         """
-        if self.check_key_pair():
+        if self.check_key_pair(name):
             self.kp = self.ec2_client.create_key_pair(
-                KeyName = 'QubeKey',
+                KeyName = name,
                 KeyType = 'rsa',
                 KeyFormat = 'pem',
                 TagSpecifications=[
@@ -81,18 +232,58 @@ class Ec2:
                     ],
             )
 
+            if self.inventory is not None:
+                self.inventory.invalidate('key_pairs')
+
             # Save the private key to a file
-            with open('QubeKey.pem', 'w') as key_file:
+            with open(path or name + '.pem', 'w') as key_file:
                 key_file.write(self.kp['KeyMaterial'])
 
-    def check_key_pair(self) -> bool:
-        """This method checks if key pair with name QubeKey already exists.
+            self.key_pair_id = self.kp['KeyPairId']
+
+        return self.key_pair_id
+
+    def check_key_pair(self, name: str = 'QubeKey') -> bool:
+        """This method checks if key pair with the given name already exists.
+
+        Args:
+            name (str): Name of the key pair to find.
 
         Returns:
             bool: Return False if already exists, else True.
         """
-        for key in self.ec2_client.describe_key_pairs()['KeyPairs']:
-            if "QubeKey" == key['KeyName']:
+        if self.inventory is not None:
+            key_pairs = self.inventory.find('key_pairs', name=name)
+        else:
+            key_pairs = paginate(self.ec2_client, 'describe_key_pairs', 'KeyPairs', Filters=[{'Name': 'key-name', 'Values': [name]}])
+        for key in key_pairs:
+            if name == key['KeyName']:
+                self.key_pair_id = key['KeyPairId']
                 return False
         else:
             return True
+
+    def delete_launch_template(self, name: str) -> None:
+        """This method deletes the launch template with all its versions.
+
+        Args:
+            name (str): Name of the launch template.
+        """
+        if not self.check_launch_template(name):
+            self.ec2_client.delete_launch_template(LaunchTemplateName=name)
+            self._invalidate_launch_template(name)
+
+    def delete_key(self, name: str = 'QubeKey', path: str = None) -> None:
+        """This method deletes the key pair and its saved private key.
+
+        Args:
+            name (str): Name of the key pair.
+            path (str): File the private key was saved to, <name>.pem by default.
+        """
+        path = path or name + '.pem'
+        if not self.check_key_pair(name):
+            self.ec2_client.delete_key_pair(KeyName=name)
+            if self.inventory is not None:
+                self.inventory.invalidate('key_pairs')
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,14 +1,348 @@
+from concurrent.futures import ThreadPoolExecutor
+from Paginator import paginate
+
+# Target group attributes and listener rules are read one resource per call, at most this many at a time.
+READ_WORKERS = 8
+
+# Listeners and target groups of the load balancer, overridden key by key by the 'elb' key of a
+# stack spec. Target group names are suffixes of the stack name; the 'TG' target group always
+# exists, and is the one the autoscaling group registers its instances with.
+ELB_SPEC = {
+    'target_groups': {'TG': {}},
+    # Listeners, each a dict with the keys of LISTENER, keyed by port on the load balancer.
+    'listeners': [{'port': 80, 'rules': [{'priority': 5, 'paths': ['/worldsogood/'], 'forward': {'TG': 1}}]}],
+}
+
+# Settings of a target group, overridden key by key by its entry in 'target_groups'. The port and
+# protocol of an existing target group can't change; blue/green deploys use a new name instead.
+TARGET_GROUP = {
+    'port': 80,
+    'protocol': 'HTTP',
+    'health_check': {},
+    # Seconds a deregistered instance keeps serving its in-flight requests.
+    'deregistration_delay': 300,
+    # Seconds over which a new instance's share of requests ramps up, 0 to disable.
+    'slow_start': 0,
+}
+
+# Health check of a target group, overridden key by key by its 'health_check' key.
+HEALTH_CHECK = {
+    'path': '/',
+    'interval': 30,
+    'timeout': 5,
+    'healthy_threshold': 5,
+    'unhealthy_threshold': 2,
+    'matcher': '200',
+}
+
+# Settings of a listener. 'forward' maps target group suffixes to weights for the default action,
+# which otherwise is FIXED_RESPONSE. Each rule is a dict with 'priority', 'paths' and/or 'hosts',
+# and 'forward', e.g. {'TG': 90, 'TGGreen': 10} to send a tenth of the requests to TGGreen.
+LISTENER = {
+    'port': 80,
+    'protocol': 'HTTP',
+    'certificate_arn': None,
+    'ssl_policy': None,
+    'forward': None,
+    'rules': [],
+}
+
+FIXED_RESPONSE = {
+    'Type': 'fixed-response',
+    'FixedResponseConfig': {
+        'ContentType': 'text/plain',
+        'StatusCode': '200',
+        'MessageBody': 'Hello from the Qube Cinema'
+    }
+}
+
+# Target group attributes a new target group starts with.
+DEFAULT_ATTRIBUTES = {'deregistration_delay.timeout_seconds': '300', 'slow_start.duration_seconds': '0'}
+
+
+def elb_spec(spec: dict = None, prefix: str = 'Qube') -> dict:
+    """This function fills in the listeners and target groups missing from a spec, with full names.
+
+    Args:
+        spec (dict): The 'elb' key of a stack spec, see ELB_SPEC.
+        prefix (str): Name of the stack, prepended to the target group suffixes.
+
+    Returns:
+        dict: 'target_groups', the settings of every target group keyed by full name with the 'TG'
+            one first, and 'listeners', with every key of LISTENER and forward weights keyed by full name.
+    """
+    spec = dict(ELB_SPEC, **(spec or {}))
+    target_groups = {}
+    for suffix, settings in dict(ELB_SPEC['target_groups'], **spec['target_groups']).items():
+        settings = dict(TARGET_GROUP, **(settings or {}))
+        settings['health_check'] = dict(HEALTH_CHECK, **settings['health_check'])
+        target_groups[prefix + suffix] = settings
+
+    def weights(forward):
+        return {prefix + suffix: weight for suffix, weight in forward.items()} if forward else None
+
+    listeners = []
+    for listener in spec['listeners']:
+        listener = dict(LISTENER, **listener)
+        listener['forward'] = weights(listener['forward'])
+        listener['rules'] = [dict(rule, forward=weights(rule['forward'])) for rule in listener['rules']]
+        listeners.append(listener)
+    return {'target_groups': target_groups, 'listeners': listeners}
+
+
+def health_check_settings(settings: dict) -> dict:
+    """This function builds the health check parameters of a target group.
+
+    Args:
+        settings (dict): Settings of the target group, see TARGET_GROUP.
+
+    Returns:
+        dict: Parameters of create_target_group and modify_target_group, named like the keys
+            describe_target_groups returns.
+    """
+    health_check = settings['health_check']
+    return {
+        'HealthCheckProtocol': settings['protocol'],
+        'HealthCheckPath': health_check['path'],
+        'HealthCheckIntervalSeconds': health_check['interval'],
+        'HealthCheckTimeoutSeconds': health_check['timeout'],
+        'HealthyThresholdCount': health_check['healthy_threshold'],
+        'UnhealthyThresholdCount': health_check['unhealthy_threshold'],
+        'Matcher': {'HttpCode': health_check['matcher']},
+    }
+
+
+def forward_action(weights: dict, arns: dict) -> dict:
+    """This function builds a forward action, weighted between target groups.
+
+    Args:
+        weights (dict): Weights keyed by target group name.
+        arns (dict): ARNs keyed by target group name. Names without an ARN are kept as they are.
+
+    Returns:
+        dict: The action.
+    """
+    return {
+        'Type': 'forward',
+        'ForwardConfig': {
+            'TargetGroups': [{'TargetGroupArn': arns.get(name, name), 'Weight': weight} for name, weight in weights.items()]
+        }
+    }
+
+
+def rule_conditions(rule: dict) -> list:
+    """This function builds the conditions of a listener rule.
+
+    Args:
+        rule (dict): Rule of a listener spec, with 'paths' and/or 'hosts'.
+
+    Returns:
+        list: The conditions.
+    """
+    conditions = []
+    if rule.get('paths'):
+        conditions.append({'Field': 'path-pattern', 'PathPatternConfig': {'Values': rule['paths']}})
+    if rule.get('hosts'):
+        conditions.append({'Field': 'host-header', 'HostHeaderConfig': {'Values': rule['hosts']}})
+    return conditions
+
+
+def same_actions(wanted: list, live: list) -> bool:
+    """This function compares actions, ignoring how they are spelled.
+
+    A forward to one target group is the same whatever its weight, and may be described with
+    TargetGroupArn instead of ForwardConfig.
+
+    Args:
+        wanted (list): Actions of the spec.
+        live (list): Actions as described.
+
+    Returns:
+        bool: True if they route requests the same way.
+    """
+    def key(action):
+        if action['Type'] == 'forward':
+            groups = action.get('ForwardConfig', {}).get('TargetGroups') or [{'TargetGroupArn': action['TargetGroupArn']}]
+            if len(groups) == 1:
+                return 'forward', ((groups[0]['TargetGroupArn'], None),)
+            return 'forward', tuple(sorted((group['TargetGroupArn'], group.get('Weight', 1)) for group in groups))
+        return action['Type'], tuple(sorted(action.get('FixedResponseConfig', action.get('RedirectConfig', {})).items()))
+
+    return [key(action) for action in wanted] == [key(action) for action in live]
+
+
+def same_conditions(wanted: list, live: list) -> bool:
+    """This function compares rule conditions, ignoring their order and spelling.
+
+    Args:
+        wanted (list): Conditions of the spec.
+        live (list): Conditions as described.
+
+    Returns:
+        bool: True if they match the same requests.
+    """
+    def key(condition):
+        config = condition.get('PathPatternConfig') or condition.get('HostHeaderConfig') or {}
+        return condition['Field'], tuple(sorted(condition.get('Values') or config.get('Values', [])))
+
+    return sorted(map(key, wanted)) == sorted(map(key, live))
+
+
+def listener_settings(listener: dict, arns: dict) -> dict:
+    """This function builds the parameters of a listener.
+
+    Args:
+        listener (dict): Listener of a spec, see LISTENER.
+        arns (dict): Target group ARNs keyed by name.
+
+    Returns:
+        dict: Parameters of create_listener and modify_listener.
+    """
+    settings = {
+        'Protocol': listener['protocol'],
+        'Port': listener['port'],
+        'DefaultActions': [forward_action(listener['forward'], arns) if listener['forward'] else FIXED_RESPONSE],
+    }
+    if listener['certificate_arn']:
+        settings['Certificates'] = [{'CertificateArn': listener['certificate_arn']}]
+    if listener['ssl_policy']:
+        settings['SslPolicy'] = listener['ssl_policy']
+    return settings
+
+
+def target_group_changes(spec: dict, live: dict, vpc_id: str = None) -> list:
+    """This function diffs the target groups of a spec against the live ones.
+
+    Args:
+        spec (dict): Load balancer spec, see elb_spec.
+        live (dict): Live state, see Elb.read_elb.
+        vpc_id (str): VPC the target groups belong in, None if it isn't known yet.
+
+    Returns:
+        list: One change per target group, a dict with 'resource', 'name', 'action' ('create',
+            'modify', 'replace' or 'exists'), 'id', 'detail', 'params' of create_target_group or
+            modify_target_group, and 'attributes' to set.
+    """
+    changes = []
+    for name, settings in spec['target_groups'].items():
+        health_check = health_check_settings(settings)
+        attributes = {
+            'deregistration_delay.timeout_seconds': str(settings['deregistration_delay']),
+            'slow_start.duration_seconds': str(settings['slow_start']),
+        }
+        tg = live['target_groups'].get(name)
+        if tg is None:
+            changes.append({
+                'resource': 'target_group', 'name': name, 'action': 'create', 'id': None, 'detail': None,
+                'params': dict(Name=name, Protocol=settings['protocol'], Port=settings['port'], VpcId=vpc_id, TargetType='instance', **health_check),
+                'attributes': {key: value for key, value in attributes.items() if DEFAULT_ATTRIBUTES[key] != value},
+            })
+            continue
+
+        fixed = [f'{key} {tg[key]}, not {value}' for key, value in [('Port', settings['port']), ('Protocol', settings['protocol']), ('VpcId', vpc_id)]
+                 if value is not None and tg[key] != value]
+        params = {key: value for key, value in health_check.items() if tg.get(key) != value}
+        live_attributes = live['attributes'].get(name, DEFAULT_ATTRIBUTES)
+        attributes = {key: value for key, value in attributes.items() if live_attributes.get(key) != value}
+        if fixed:
+            action, detail = 'replace', '; '.join(fixed) + '; use a new target group name'
+        elif params or attributes:
+            action, detail = 'modify', ', '.join(list(params) + list(attributes))
+        else:
+            action, detail = 'exists', None
+        changes.append({
+            'resource': 'target_group', 'name': name, 'action': action, 'id': tg['TargetGroupArn'], 'detail': detail,
+            'params': params, 'attributes': attributes,
+        })
+    return changes
+
+
+def listener_changes(name: str, spec: dict, live: dict, arns: dict) -> list:
+    """This function diffs the listeners and rules of a spec against the live ones.
+
+    Rules are matched by priority, so shifting weights between target groups, or changing what a
+    rule matches, modifies the rule in place and never leaves a gap in routing. Rules and
+    listeners missing from the spec are deleted last.
+
+    Args:
+        name (str): Name of the load balancer.
+        spec (dict): Load balancer spec, see elb_spec.
+        live (dict): Live state, see Elb.read_elb.
+        arns (dict): Target group ARNs keyed by name.
+
+    Returns:
+        list: Changes of listeners and rules, dicts with 'resource', 'name', 'action' ('create',
+            'modify', 'delete' or 'exists'), 'id', 'detail', 'port' and the 'params' of the call.
+    """
+    changes = []
+    deletions = []
+    for listener in spec['listeners']:
+        port = listener['port']
+        settings = listener_settings(listener, arns)
+        current = live['listeners'].get(port)
+        if current is None:
+            changes.append({'resource': 'listener', 'name': f'{name}:{port}', 'action': 'create', 'id': None, 'detail': None, 'port': port, 'params': settings})
+        else:
+            params = {key: value for key, value in settings.items() if key in ('Protocol', 'Certificates', 'SslPolicy') and current.get(key) != value}
+            if not same_actions(settings['DefaultActions'], current['DefaultActions']):
+                params['DefaultActions'] = settings['DefaultActions']
+            changes.append({
+                'resource': 'listener', 'name': f'{name}:{port}', 'action': 'modify' if params else 'exists', 'id': current['ListenerArn'],
+                'detail': ', '.join(params) or None, 'port': port, 'params': params,
+            })
+
+        rules = live['rules'].get(port, {})
+        for rule in listener['rules']:
+            conditions = rule_conditions(rule)
+            actions = [forward_action(rule['forward'], arns)]
+            rule_name = f"{name}:{port}:{rule['priority']}"
+            current = rules.get(rule['priority'])
+            if current is None:
+                changes.append({
+                    'resource': 'listener_rule', 'name': rule_name, 'action': 'create', 'id': None, 'detail': None, 'port': port,
+                    'params': {'Priority': rule['priority'], 'Conditions': conditions, 'Actions': actions},
+                })
+                continue
+            params = {}
+            if not same_conditions(conditions, current['Conditions']):
+                params['Conditions'] = conditions
+            if not same_actions(actions, current['Actions']):
+                params['Actions'] = actions
+            changes.append({
+                'resource': 'listener_rule', 'name': rule_name, 'action': 'modify' if params else 'exists', 'id': current['RuleArn'],
+                'detail': ', '.join(params) or None, 'port': port, 'params': params,
+            })
+        wanted = {rule['priority'] for rule in listener['rules']}
+        deletions += [
+            {'resource': 'listener_rule', 'name': f'{name}:{port}:{priority}', 'action': 'delete', 'id': rule['RuleArn'], 'detail': 'not in the spec', 'port': port, 'params': {}}
+            for priority, rule in rules.items() if priority not in wanted
+        ]
+
+    ports = {listener['port'] for listener in spec['listeners']}
+    deletions += [
+        {'resource': 'listener', 'name': f'{name}:{port}', 'action': 'delete', 'id': listener['ListenerArn'], 'detail': 'not in the spec', 'port': port, 'params': {}}
+        for port, listener in live['listeners'].items() if port not in ports
+    ]
+    return changes + deletions
+
+
 class Elb:
-    def __init__(self, elbv2_client) -> None:
+    def __init__(self, elbv2_client, inventory=None) -> None:
         """Class that represents amazon elastic load balancer services.
 
         Args:
             elbv2_client : client to create, manage and configure AWS ELB service at low level
+            inventory (Inventory): Optional snapshot to serve existence checks from.
         """
         self.elbv2_client = elbv2_client
+        self.inventory = inventory
+
+    def create_elb(self, name: str, pub_sub: list, tags: list, elb_sg: str, vpc_id: str, tg_name: str = 'QubeTG', spec: dict = None) -> str:
+        """This method creates application load balancer, and reconciles its listeners, rules and target groups.
 
-    def create_elb(self, name: str, pub_sub: list, tags: list, elb_sg: str, vpc_id: str) -> str:
-        """This method creates application load balancer.
+        The load balancer is created only if it doesn't exist. Its listeners, rules and target
+        groups are then brought in line with the spec with the fewest calls, see reconcile, so a
+        deploy that shifts traffic between target groups never recreates the load balancer.
 
         Args:
             name (str): Name of the load balancer.
@@ -16,12 +350,18 @@ class Elb:
             tags (list): Tags to add to the load balancers.
             elb_sg (str): Security group ID.
             vpc_id (str): VPC ID.
+            tg_name (str): Name of the target group the autoscaling group registers with.
+            spec (dict): Listeners and target groups, see elb_spec. By default one HTTP listener
+                whose /worldsogood/ rule forwards to tg_name.
 
         Returns:
             str: Return the target group arn.
         """
-        if self.check_elb(name):
-            response1 = self.elbv2_client.create_load_balancer(
+        if spec is None:
+            spec = elb_spec(prefix=tg_name[:-len('TG')])
+        created = self.check_elb(name, tg_name)
+        if created:
+            response = self.elbv2_client.create_load_balancer(
                 Name=name,
                 Subnets=pub_sub,
                 SecurityGroups=[
@@ -32,72 +372,178 @@ class Elb:
                 Type='application',
                 IpAddressType='ipv4',
             )
-            self.elb_arn = response1['LoadBalancers'][0]['LoadBalancerArn']
-            self.elb_dns_name = response1['LoadBalancers'][0]['DNSName']
-
-            response2 = self.elbv2_client.create_listener(
-                LoadBalancerArn=self.elb_arn,
-                Protocol='HTTP',
-                Port=80,
-                DefaultActions=[
-                    {
-                        'Type': 'fixed-response',
-                        'FixedResponseConfig': {
-                            'ContentType': 'text/plain',
-                            'StatusCode': '200',
-                            'MessageBody': 'Hello from the Qube Cinema'
-                        }
-                    }
-                ],
-                Tags=tags
-            )
-            self.listener_arn = response2['Listeners'][0]['ListenerArn']
-
-            response3 = self.elbv2_client.create_target_group(
-                Name='QubeTG',
-                Protocol='HTTP',
-                Port=80,
-                VpcId=vpc_id,
-                TargetType='instance',
-                Tags=tags
-            )
-            self.target_group_arn = response3['TargetGroups'][0]['TargetGroupArn']
-
-            self.elbv2_client.create_rule(
-                ListenerArn=self.listener_arn,
-                Conditions=[
-                    {
-                        'Field': 'path-pattern',
-                        'Values': [
-                            '/worldsogood/'
-                        ]
-                    }
-                ],
-                Actions=[
-                    {
-                        'Type': 'forward',
-                        'TargetGroupArn': self.target_group_arn
-                    }
-                ],
-                Priority=5,
-                Tags=tags
-            )
+            self.elb_arn = response['LoadBalancers'][0]['LoadBalancerArn']
+            self.elb_dns_name = response['LoadBalancers'][0]['DNSName']
+
+        self.reconcile(name, spec, vpc_id, tags, created)
+        self.target_group_arn = self.target_group_arns[tg_name]
         return self.target_group_arn
 
-    def check_elb(self, name) -> bool:
+    def read_elb(self, spec: dict, created: bool = False) -> dict:
+        """This method reads the live target groups, listeners and rules of the load balancer self.elb_arn.
+
+        The target groups come from the inventory, or from one describe_target_groups call for
+        all of them, and the listeners from one call. The API takes a single target group per
+        describe_target_group_attributes call and a single listener per describe_rules call, so
+        those are made concurrently, up to READ_WORKERS at a time.
+
+        Args:
+            spec (dict): Load balancer spec, see elb_spec.
+            created (bool): The load balancer was just created, so it has no listeners to read.
+
+        Returns:
+            dict: 'target_groups' keyed by name, their 'attributes' keyed by name, 'listeners'
+                keyed by port, and the non-default 'rules' of each listener keyed by port and priority.
+        """
+        names = list(spec['target_groups'])
+        if self.inventory is not None:
+            target_groups = [tg for tg_name in names for tg in self.inventory.find('target_groups', name=tg_name)]
+        else:
+            try:
+                target_groups = list(paginate(self.elbv2_client, 'describe_target_groups', 'TargetGroups', Names=names))
+            except self.elbv2_client.exceptions.TargetGroupNotFoundException:
+                # Some of them don't exist yet: find the others among every target group.
+                target_groups = [tg for tg in paginate(self.elbv2_client, 'describe_target_groups', 'TargetGroups') if tg['TargetGroupName'] in names]
+
+        live = {'target_groups': {tg['TargetGroupName']: tg for tg in target_groups}, 'attributes': {}, 'listeners': {}, 'rules': {}}
+        with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+            responses = executor.map(lambda tg: self.elbv2_client.describe_target_group_attributes(TargetGroupArn=tg['TargetGroupArn']), target_groups)
+            for tg, response in zip(target_groups, responses):
+                live['attributes'][tg['TargetGroupName']] = {attribute['Key']: attribute['Value'] for attribute in response['Attributes']}
+            if created:
+                return live
+
+            listeners = list(paginate(self.elbv2_client, 'describe_listeners', 'Listeners', LoadBalancerArn=self.elb_arn))
+            rules = executor.map(lambda listener: list(paginate(self.elbv2_client, 'describe_rules', 'Rules', ListenerArn=listener['ListenerArn'])), listeners)
+            for listener, listener_rules in zip(listeners, rules):
+                live['listeners'][listener['Port']] = listener
+                live['rules'][listener['Port']] = {int(rule['Priority']): rule for rule in listener_rules if not rule['IsDefault']}
+        return live
+
+    def reconcile(self, name: str, spec: dict, vpc_id: str, tags: list, created: bool = False) -> list:
+        """This method brings the target groups, listeners and rules of the load balancer self.elb_arn in line with a spec.
+
+        The live state is read once. Target groups are created or modified first, so every
+        rule can forward to them; then listeners and rules are created or modified in place, only
+        where they differ, and the ones missing from the spec are deleted last. Weight changes
+        are a single modify_rule, which the load balancer applies atomically.
+
+        Args:
+            name (str): Name of the load balancer.
+            spec (dict): Load balancer spec, see elb_spec.
+            vpc_id (str): VPC ID of the target groups.
+            tags (list): Tags to add to created target groups, listeners and rules.
+            created (bool): The load balancer was just created.
+
+        Returns:
+            list: The changes that were applied, see target_group_changes and listener_changes.
+        """
+        live = self.read_elb(spec, created)
+        applied = []
+        self.target_group_arns = {tg_name: tg['TargetGroupArn'] for tg_name, tg in live['target_groups'].items()}
+        for change in target_group_changes(spec, live, vpc_id):
+            if change['action'] == 'replace':
+                raise ValueError(f"Target group {change['name']} can't be updated: {change['detail']}")
+            if change['action'] == 'create':
+                response = self.elbv2_client.create_target_group(**change['params'], Tags=tags)
+                self.target_group_arns[change['name']] = response['TargetGroups'][0]['TargetGroupArn']
+            elif change['params']:
+                self.elbv2_client.modify_target_group(TargetGroupArn=change['id'], **change['params'])
+            if change['attributes']:
+                self.elbv2_client.modify_target_group_attributes(
+                    TargetGroupArn=self.target_group_arns[change['name']],
+                    Attributes=[{'Key': key, 'Value': value} for key, value in change['attributes'].items()]
+                )
+            if change['action'] != 'exists':
+                applied.append(change)
+
+        listener_arns = {port: listener['ListenerArn'] for port, listener in live['listeners'].items()}
+        for change in listener_changes(name, spec, live, self.target_group_arns):
+            resource, action = change['resource'], change['action']
+            if action == 'exists':
+                continue
+            if resource == 'listener' and action == 'create':
+                response = self.elbv2_client.create_listener(LoadBalancerArn=self.elb_arn, Tags=tags, **change['params'])
+                listener_arns[change['port']] = response['Listeners'][0]['ListenerArn']
+            elif resource == 'listener' and action == 'modify':
+                self.elbv2_client.modify_listener(ListenerArn=change['id'], **change['params'])
+            elif resource == 'listener':
+                self.elbv2_client.delete_listener(ListenerArn=change['id'])
+            elif action == 'create':
+                self.elbv2_client.create_rule(ListenerArn=listener_arns[change['port']], Tags=tags, **change['params'])
+            elif action == 'modify':
+                self.elbv2_client.modify_rule(RuleArn=change['id'], **change['params'])
+            else:
+                self.elbv2_client.delete_rule(RuleArn=change['id'])
+            applied.append(change)
+
+        if self.inventory is not None and any(change['resource'] == 'target_group' for change in applied):
+            self.inventory.invalidate('target_groups')
+        if self.inventory is not None and created:
+            self.inventory.invalidate('load_balancers')
+        self.listener_arn = listener_arns.get(spec['listeners'][0]['port']) if spec['listeners'] else None
+        return applied
+
+    def check_elb(self, name, tg_name: str = 'QubeTG') -> bool:
         """This method check if load balancer is created or not.
 
         Args:
             name (_type_): The name of the load balancer to find.
+            tg_name (str): The name of the target group to find.
 
         Returns:
             bool: Return False if load balancer exists, else True.
         """
-        for lb in self.elbv2_client.describe_load_balancers()['LoadBalancers']:
+        if self.inventory is not None:
+            load_balancers = self.inventory.find('load_balancers', name=name)
+        else:
+            try:
+                load_balancers = list(paginate(self.elbv2_client, 'describe_load_balancers', 'LoadBalancers', Names=[name]))
+            except self.elbv2_client.exceptions.LoadBalancerNotFoundException:
+                load_balancers = []
+        for lb in load_balancers:
             if name == lb['LoadBalancerName']:
-                for tg in self.elbv2_client.describe_target_groups()['TargetGroups']:
-                    if "QubeTG" == tg['TargetGroupName']:
+                self.elb_arn = lb['LoadBalancerArn']
+                if self.inventory is not None:
+                    target_groups = self.inventory.find('target_groups', name=tg_name)
+                else:
+                    try:
+                        target_groups = list(paginate(self.elbv2_client, 'describe_target_groups', 'TargetGroups', Names=[tg_name]))
+                    except self.elbv2_client.exceptions.TargetGroupNotFoundException:
+                        target_groups = []
+                for tg in target_groups:
+                    if tg_name == tg['TargetGroupName']:
                         self.target_group_arn = tg['TargetGroupArn']
                 return False
         else:
-            return True
\ No newline at end of file
+            return True
+
+    def delete_elb(self, name: str, tg_name: str = 'QubeTG', spec: dict = None) -> None:
+        """This method deletes the load balancer with its listeners and rules, then the target groups.
+
+        Args:
+            name (str): Name of the load balancer.
+            tg_name (str): Name of the target group.
+            spec (dict): Load balancer spec, see elb_spec, to delete every target group of. Only
+                tg_name by default.
+        """
+        try:
+            load_balancers = list(paginate(self.elbv2_client, 'describe_load_balancers', 'LoadBalancers', Names=[name]))
+        except self.elbv2_client.exceptions.LoadBalancerNotFoundException:
+            load_balancers = []
+        for lb in load_balancers:
+            # Deleting a listener deletes its rules, which frees the target group.
+            for listener in paginate(self.elbv2_client, 'describe_listeners', 'Listeners', LoadBalancerArn=lb['LoadBalancerArn']):
+                self.elbv2_client.delete_listener(ListenerArn=listener['ListenerArn'])
+            self.elbv2_client.delete_load_balancer(LoadBalancerArn=lb['LoadBalancerArn'])
+
+        for target_group in spec['target_groups'] if spec else [tg_name]:
+            try:
+                target_groups = list(paginate(self.elbv2_client, 'describe_target_groups', 'TargetGroups', Names=[target_group]))
+            except self.elbv2_client.exceptions.TargetGroupNotFoundException:
+                target_groups = []
+            for tg in target_groups:
+                self.elbv2_client.delete_target_group(TargetGroupArn=tg['TargetGroupArn'])
+
+        if self.inventory is not None:
+            self.inventory.invalidate('load_balancers', 'target_groups')
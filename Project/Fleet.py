@@ -0,0 +1,183 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from Stack import Stack
+from Plan import Plan
+
+
+def load_specs(path: str) -> list:
+    """This function reads stack specs from a JSON or YAML file.
+
+    The file holds either a list of specs or a mapping with a 'stacks' list. Every spec needs a
+    unique 'name'; other keys default to the ones of the single Qube stack.
+
+    Args:
+        path (str): Path of the .json, .yaml or .yml file.
+
+    Returns:
+        list: The stack specs.
+    """
+    with open(path) as spec_file:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            data = yaml.safe_load(spec_file)
+        else:
+            data = json.load(spec_file)
+
+    specs = data['stacks'] if isinstance(data, dict) else data
+    names = [spec.get('name') for spec in specs]
+    if None in names or len(set(names)) != len(names):
+        raise ValueError("Every stack spec needs a unique 'name'")
+    return specs
+
+
+class Fleet:
+    def __init__(self, specs: list, clients: dict, inventory=None, max_workers: int = 4, wait_manager=None, state=None) -> None:
+        """Class that represents a set of identical Qube stacks provisioned together.
+
+        Args:
+            specs (list): One spec per stack, see Stack.
+            clients (dict): Boto3 clients and resources shared by every stack, see Stack.
+            inventory (Inventory): Optional snapshot shared by every stack.
+            max_workers (int): Maximum number of stacks to provision at the same time.
+            wait_manager (WaitManager): Optional poller shared by every stack, so all NAT gateways
+                of the fleet are polled with one describe call per tick.
+            state (State): Optional local record shared by every stack, used to skip unchanged stacks.
+        """
+        self.stacks = [Stack(spec, clients, inventory, wait_manager, state) for spec in specs]
+        self.inventory = inventory
+        self.max_workers = max_workers
+
+    def provision(self) -> list:
+        """This method provisions every stack, a bounded number at a time.
+
+        Stacks whose recorded state still matches their spec and AWS are skipped. The inventory is
+        only read if at least one stack has to be provisioned. A failing stack doesn't stop the
+        others; its error is reported in its result.
+
+        Returns:
+            list: One result per stack with 'name', 'status', 'seconds', 'vpc_id', 'asg_arn' and 'error'.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            unchanged = list(executor.map(self._verify_stack, self.stacks))
+            if self.inventory is not None and not all(unchanged):
+                self.inventory.refresh()
+            return list(executor.map(self._provision_stack, self.stacks, unchanged))
+
+    def plan(self) -> list:
+        """This method reports what provisioning the fleet would change, without changing anything.
+
+        The inventory is read once and every stack is planned from it.
+
+        Returns:
+            list: The rows of every stack's plan, see Plan.
+        """
+        self.inventory.refresh()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            plans = list(executor.map(lambda stack: Plan(stack).compute(), self.stacks))
+        return [row for rows in plans for row in rows]
+
+    def destroy(self) -> list:
+        """This method deletes every stack, a bounded number at a time.
+
+        A failing stack doesn't stop the others; its error is reported in its result.
+
+        Returns:
+            list: One result per stack with 'name', 'status', 'seconds' and 'error'.
+        """
+        if self.inventory is not None:
+            self.inventory.refresh()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._destroy_stack, self.stacks))
+
+    def retag(self, tags: list) -> int:
+        """This method adds or overwrites tags on the VPC resources of every stack.
+
+        The resources of every stack are found from one inventory read and tagged together, so
+        retagging the fleet takes one create_tags call per Vpc.tag_resources batch.
+
+        Args:
+            tags (list): Tags to add, as Key/Value dicts.
+
+        Returns:
+            int: Number of resources tagged.
+        """
+        if self.inventory is not None:
+            self.inventory.refresh()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            networks = list(executor.map(lambda stack: stack.locate_network(), self.stacks))
+        resource_ids = [resource_id for network in networks for resource_id in network.values() if resource_id is not None]
+        if resource_ids:
+            self.stacks[0].vpc.tag_resources(resource_ids, tags)
+        return len(resource_ids)
+
+    def refresh(self) -> list:
+        """This method replaces the instances of every stack's autoscaling group, see Asg.refresh_instances.
+
+        A failing stack doesn't stop the others; its error is reported in its result.
+
+        Returns:
+            list: One result per stack with 'name', 'status', 'refresh_id' and 'error'.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._refresh_stack, self.stacks))
+
+    def _refresh_stack(self, stack: Stack) -> dict:
+        result = {'name': stack.name, 'status': 'started', 'refresh_id': None, 'error': None}
+        try:
+            result['refresh_id'] = stack.asg.refresh_instances(stack.name + 'ASG', stack.spec.get('asg'))
+        except Exception as exc:
+            result['status'] = 'failed'
+            result['error'] = f"{type(exc).__name__}: {exc}"
+        return result
+
+    def _destroy_stack(self, stack: Stack) -> dict:
+        start = time.perf_counter()
+        result = {'name': stack.name, 'status': 'destroyed', 'error': None}
+        try:
+            stack.destroy()
+        except Exception as exc:
+            result['status'] = 'failed'
+            result['error'] = f"{type(exc).__name__}: {exc}"
+        result['seconds'] = round(time.perf_counter() - start, 1)
+        return result
+
+    def _verify_stack(self, stack: Stack) -> bool:
+        try:
+            return stack.verify()
+        except Exception as exc:
+            stack.drift.append(f"verification failed: {exc}")
+            return False
+
+    def _provision_stack(self, stack: Stack, unchanged: bool) -> dict:
+        start = time.perf_counter()
+        result = {'name': stack.name, 'status': 'ok', 'vpc_id': None, 'asg_arn': None, 'error': None}
+        try:
+            if unchanged:
+                result['status'] = 'unchanged'
+                steps = stack.resources
+            else:
+                steps = stack.provision()
+            result['vpc_id'] = steps['vpc']
+            result['asg_arn'] = steps['asg']
+        except Exception as exc:
+            result['status'] = 'failed'
+            result['error'] = f"{type(exc).__name__}: {exc}"
+        result['seconds'] = round(time.perf_counter() - start, 1)
+        return result
+
+
+def format_table(rows: list, columns: list) -> str:
+    """This function renders result rows as a plain text table.
+
+    Args:
+        rows (list): Rows as dicts.
+        columns (list): Keys of the columns to show, in order.
+
+    Returns:
+        str: The table, one line per row under a header line.
+    """
+    cells = [[str(column) for column in columns]]
+    cells += [['' if row.get(column) is None else str(row[column]) for column in columns] for row in rows]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in cells)
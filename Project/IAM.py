@@ -1,20 +1,122 @@
+import hashlib
 import json
+from urllib.parse import unquote
+from Paginator import paginate
+
+# Policy documents shared with AsyncIam.
+ASSUME_ROLE_POLICY = {
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Effect": "Allow",
+            "Principal": {
+                "Service": "ec2.amazonaws.com"
+            },
+            "Action": "sts:AssumeRole"
+        }
+    ]
+}
+
+KMS_POLICY = {
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Sid": "AllowAccessToKMS",
+            "Effect": "Allow",
+            "Action": [
+                "kms:Encrypt",
+                "kms:Decrypt",
+                "kms:ReEncrypt*",
+                "kms:GenerateDataKey*",
+                "kms:DescribeKey",
+                "kms:ListKeys"
+            ],
+            "Resource": "*"
+        }
+    ]
+}
+
+# Settings of the instances' IAM policy. A spec's 'iam' key overrides them.
+IAM_SPEC = {
+    # Statements of the customer managed policy attached to the instances' role.
+    'statements': KMS_POLICY['Statement'],
+}
+
+# Versions a customer managed policy keeps, the default one included, so the previous document
+# can be restored with set_default_policy_version. IAM allows five.
+POLICY_VERSIONS = 2
+
+
+def iam_spec(spec: dict = None) -> dict:
+    """This function fills in the IAM settings missing from a spec.
+
+    Args:
+        spec (dict): The 'iam' key of a stack spec, see IAM_SPEC.
+
+    Returns:
+        dict: Every key of IAM_SPEC.
+    """
+    return dict(IAM_SPEC, **(spec or {}))
+
+
+def policy_document(spec: dict = None) -> dict:
+    """This function builds the document of the instances' policy from a spec.
+
+    Args:
+        spec (dict): The 'iam' key of a stack spec, see IAM_SPEC.
+
+    Returns:
+        dict: The policy document.
+    """
+    return {'Version': '2012-10-17', 'Statement': iam_spec(spec)['statements']}
+
+
+def document_hash(document) -> str:
+    """This function hashes a policy document, so two documents compare equal whatever their formatting.
+
+    Args:
+        document : Policy document, as a dict or as the URL encoded JSON IAM returns.
+
+    Returns:
+        str: SHA-256 hex digest of the canonical JSON of the document.
+    """
+    if isinstance(document, str):
+        document = json.loads(unquote(document))
+    return hashlib.sha256(json.dumps(document, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def default_document(policy: dict) -> dict:
+    """This function picks the document of the default version of a policy.
+
+    Args:
+        policy (dict): The policy, as listed by get_account_authorization_details.
+
+    Returns:
+        dict: The document of its default version.
+    """
+    return next(version['Document'] for version in policy['PolicyVersionList'] if version['IsDefaultVersion'])
+
 
 class Iam:
-    def __init__(self, iam_client) -> None:
+    def __init__(self, iam_client, inventory=None, wait_manager=None) -> None:
         """Class that represents AWS IAM services.
 
         Args:
             iam_client : IAM client to create, manage and configure AWS IAM service at low level
+            inventory (Inventory): Optional snapshot to serve existence checks from.
+            wait_manager (WaitManager): Optional shared poller to wait for the instance profile with.
         """
         self.iam_client = iam_client
+        self.inventory = inventory
+        self.wait_manager = wait_manager
 
-    def create_instance_profile(self, name: str, tags: list) -> str:
+    def create_instance_profile(self, name: str, tags: list, role_name: str = 'QubeRole') -> str:
         """This method creates an IAM instance profile.
 
         Args:
             name (str): Name of the instance profile.
             tags (list): tags to add to the instance profile.
+            role_name (str): Name of the IAM role to create and add to the instance profile.
 
         Returns:
             str: Return the instance profile id.
@@ -25,35 +127,28 @@ class Iam:
                 Tags=tags           
             )
 
-            waiter = self.iam_client.get_waiter('instance_profile_exists')
-            waiter.wait(InstanceProfileName=name)
+            if self.wait_manager is not None:
+                self.wait_manager.wait('instance_profile', self.iam_client, name)
+            else:
+                waiter = self.iam_client.get_waiter('instance_profile_exists')
+                waiter.wait(InstanceProfileName=name)
 
             self.ip_id = self.ip['InstanceProfile']['InstanceProfileId']
 
-            assume_role_policy_document = {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Principal": {
-                            "Service": "ec2.amazonaws.com"
-                        },
-                        "Action": "sts:AssumeRole"
-                    }
-                ]
-            }
             self.role = self.iam_client.create_role(
-                RoleName="QubeRole",
-                AssumeRolePolicyDocument=json.dumps(assume_role_policy_document),
+                RoleName=role_name,
+                AssumeRolePolicyDocument=json.dumps(ASSUME_ROLE_POLICY),
                 Tags=tags
             )
 
-            self.iam_role_name = "QubeRole"
+            self.iam_role_name = role_name
 
             self.iam_client.add_role_to_instance_profile(
                 InstanceProfileName=name,
-                RoleName="QubeRole"
+                RoleName=role_name
             )
+            if self.inventory is not None:
+                self.inventory.invalidate('instance_profiles', 'roles')
 
         return self.ip_id
 
@@ -66,67 +161,170 @@ class Iam:
         Returns:
             bool: Return False if instance profile exists, else True.
         """
-        for ip in self.iam_client.list_instance_profiles(PathPrefix='/')['InstanceProfiles']:
+        if self.inventory is not None:
+            instance_profiles = self.inventory.find('instance_profiles', name=name)
+        else:
+            try:
+                instance_profiles = [self.iam_client.get_instance_profile(InstanceProfileName=name)['InstanceProfile']]
+            except self.iam_client.exceptions.NoSuchEntityException:
+                instance_profiles = []
+        for ip in instance_profiles:
             if name == ip['InstanceProfileName']:
-                self.iam_role_name = ip['Roles'][0]['RoleName']
+                if ip['Roles']:
+                    self.iam_role_name = ip['Roles'][0]['RoleName']
                 self.ip_id = ip['InstanceProfileId']
                 return False
         else:
             return True
 
-    def create_add_iam_policy_to_role(self, name: str, tags: list, asg_arn: str):
-        """This method creates and attaches IAM policy to the IAM role.
+    def create_add_iam_policy_to_role(self, name: str, tags: list, asg_arn: str, role_name: str = None, document: dict = None) -> str:
+        """This method creates the IAM policy, or updates its document, and attaches it to the IAM role.
+
+        The document of an existing policy is compared by hash with its default version, and a
+        changed document becomes a new default version, see update_iam_policy.
 
         Args:
             name (str): Name of the IAM policy.
             tags (list): Tags to add to the IAM policy.
             asg_arn (str): Auto scaling group arn.
+            role_name (str): Name of the IAM role, the one of the last instance profile checked by default.
+            document (dict): Policy document, see policy_document. The default KMS policy by default.
+
+        Returns:
+            str: Return the IAM policy arn.
         """
-        policy_json = {
-            "Version": "2012-10-17",
-            "Statement": [
-                {
-                "Sid": "AllowAccessToKMS",
-                "Effect": "Allow",
-                "Action": [
-                    "kms:Encrypt",
-                    "kms:Decrypt",
-                    "kms:ReEncrypt*",
-                    "kms:GenerateDataKey*",
-                    "kms:DescribeKey",
-                    "kms:ListKeys"
-                ],
-                "Resource": "*"
-                }
-            ]
-            }
-
-        if self.check_iam_policy(name):
+        role_name = role_name or self.iam_role_name
+        document = document or policy_document()
+        policy = self._find_policy(name)
+        if policy is None:
             self.policy = self.iam_client.create_policy(
                 PolicyName=name,
-                PolicyDocument=json.dumps(policy_json),
+                PolicyDocument=json.dumps(document),
                 Tags=tags
             )
+            self.policy_arn = self.policy['Policy']['Arn']
+            self._invalidate('policies')
+        else:
+            self.policy_arn = policy['Arn']
+            if document_hash(policy['Document']) != document_hash(document):
+                self.update_iam_policy(self.policy_arn, document)
 
-            self.iam_client.attach_role_policy(
-                RoleName=self.iam_role_name,
-                PolicyArn=self.policy['Policy']['Arn']
-            )
-    
-    def check_iam_policy(self, name: str) -> bool :
+        if self.check_iam_policy(name, role_name):
+            self.iam_client.attach_role_policy(RoleName=role_name, PolicyArn=self.policy_arn)
+            self._invalidate('roles')
+
+        return self.policy_arn
+
+    def update_iam_policy(self, arn: str, document: dict) -> str:
+        """This method makes a document the default version of a policy.
+
+        The oldest versions are deleted first, so the policy keeps at most POLICY_VERSIONS
+        versions and never reaches the limit of IAM.
+
+        Args:
+            arn (str): ARN of the IAM policy.
+            document (dict): The new policy document.
+
+        Returns:
+            str: Id of the new version.
+        """
+        versions = sorted(paginate(self.iam_client, 'list_policy_versions', 'Versions', PolicyArn=arn), key=lambda version: version['CreateDate'])
+        old = [version for version in versions if not version['IsDefaultVersion']]
+        while old and len(versions) >= POLICY_VERSIONS:
+            version = old.pop(0)
+            self.iam_client.delete_policy_version(PolicyArn=arn, VersionId=version['VersionId'])
+            versions.remove(version)
+        version = self.iam_client.create_policy_version(PolicyArn=arn, PolicyDocument=json.dumps(document), SetAsDefault=True)
+        self._invalidate('policies')
+        return version['PolicyVersion']['VersionId']
+
+    def check_iam_policy(self, name: str, role_name: str = None) -> bool:
         """This method checks if IAM policy is attached to IAM role.
 
         Args:
             name (str): Name to check for the IAM policy.
+            role_name (str): Name of the IAM role, the one of the last instance profile checked by default.
 
         Returns:
             bool: Return False if IAM policy is attached to role, else True.
         """
+        role_name = role_name or self.iam_role_name
+        if self.inventory is not None:
+            roles = self.inventory.find('roles', name=role_name)
+            attached = roles[0]['AttachedManagedPolicies'] if roles else []
+        else:
+            try:
+                attached = list(paginate(self.iam_client, 'list_attached_role_policies', 'AttachedPolicies', RoleName=role_name))
+            except self.iam_client.exceptions.NoSuchEntityException:
+                attached = []
+        for policy in attached:
+            if name == policy['PolicyName']:
+                self.policy_arn = policy['PolicyArn']
+                return False
+        return True
+
+    def delete_instance_profile(self, name: str, role_name: str = 'QubeRole') -> None:
+        """This method deletes the instance profile and its role.
+
+        Args:
+            name (str): Name of the instance profile.
+            role_name (str): Name of the IAM role created with the instance profile.
+        """
         try:
-            for policy in self.iam_client.list_attached_role_policies(RoleName=self.iam_role_name)['AttachedPolicies']:
-                if name == policy['PolicyName']:
-                    return False
-            else:
-                return True
-        except:
-            return True
+            ip = self.iam_client.get_instance_profile(InstanceProfileName=name)['InstanceProfile']
+            for role in ip['Roles']:
+                self.iam_client.remove_role_from_instance_profile(InstanceProfileName=name, RoleName=role['RoleName'])
+            self.iam_client.delete_instance_profile(InstanceProfileName=name)
+        except self.iam_client.exceptions.NoSuchEntityException:
+            pass
+
+        try:
+            for policy in list(paginate(self.iam_client, 'list_attached_role_policies', 'AttachedPolicies', RoleName=role_name)):
+                self.iam_client.detach_role_policy(RoleName=role_name, PolicyArn=policy['PolicyArn'])
+            self.iam_client.delete_role(RoleName=role_name)
+        except self.iam_client.exceptions.NoSuchEntityException:
+            pass
+
+        self._invalidate('instance_profiles', 'roles')
+
+    def delete_iam_policy(self, name: str) -> None:
+        """This method detaches the IAM policy from its roles and deletes it with all its versions.
+
+        Args:
+            name (str): Name of the IAM policy.
+        """
+        if self.inventory is not None:
+            policies = self.inventory.find('policies', name=name)
+        else:
+            policies = [policy for policy in paginate(self.iam_client, 'list_policies', 'Policies', Scope='Local') if policy['PolicyName'] == name]
+        for policy in policies:
+            arn = policy['Arn']
+            for role in list(paginate(self.iam_client, 'list_entities_for_policy', 'PolicyRoles', PolicyArn=arn, EntityFilter='Role')):
+                self.iam_client.detach_role_policy(RoleName=role['RoleName'], PolicyArn=arn)
+            for version in paginate(self.iam_client, 'list_policy_versions', 'Versions', PolicyArn=arn):
+                if not version['IsDefaultVersion']:
+                    self.iam_client.delete_policy_version(PolicyArn=arn, VersionId=version['VersionId'])
+            self.iam_client.delete_policy(PolicyArn=arn)
+
+        self._invalidate('policies', 'roles')
+
+    def _find_policy(self, name: str) -> dict:
+        # The policy, with the document of its default version under 'Document', or None.
+        if self.inventory is not None:
+            for policy in self.inventory.find('policies', name=name):
+                return dict(policy, Document=default_document(policy))
+            return None
+        for policy in paginate(self.iam_client, 'list_policies', 'Policies', Scope='Local'):
+            if policy['PolicyName'] == name:
+                version = self.iam_client.get_policy_version(PolicyArn=policy['Arn'], VersionId=policy['DefaultVersionId'])['PolicyVersion']
+                return dict(policy, Document=version['Document'])
+        return None
+
+    def _invalidate(self, *kinds: str) -> None:
+        """This method drops the given resource types from the inventory after a create or delete.
+
+        Args:
+            kinds (str): Resource types to drop.
+        """
+        if self.inventory is not None:
+            self.inventory.invalidate(*kinds)
@@ -0,0 +1,186 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Paginator import paginate
+
+
+class Inventory:
+    # kind: (client attribute, describe method, response key, id key, name key)
+    # A name key of None means the resource is named by its 'Name' tag.
+    KINDS = {
+        'vpcs': ('ec2_client', 'describe_vpcs', 'Vpcs', 'VpcId', None),
+        'internet_gateways': ('ec2_client', 'describe_internet_gateways', 'InternetGateways', 'InternetGatewayId', None),
+        'route_tables': ('ec2_client', 'describe_route_tables', 'RouteTables', 'RouteTableId', None),
+        'subnets': ('ec2_client', 'describe_subnets', 'Subnets', 'SubnetId', None),
+        'nat_gateways': ('ec2_client', 'describe_nat_gateways', 'NatGateways', 'NatGatewayId', None),
+        'vpc_endpoints': ('ec2_client', 'describe_vpc_endpoints', 'VpcEndpoints', 'VpcEndpointId', None),
+        'security_groups': ('ec2_client', 'describe_security_groups', 'SecurityGroups', 'GroupId', 'GroupName'),
+        'key_pairs': ('ec2_client', 'describe_key_pairs', 'KeyPairs', 'KeyPairId', 'KeyName'),
+        'launch_templates': ('ec2_client', 'describe_launch_templates', 'LaunchTemplates', 'LaunchTemplateId', 'LaunchTemplateName'),
+        'load_balancers': ('elbv2_client', 'describe_load_balancers', 'LoadBalancers', 'LoadBalancerArn', 'LoadBalancerName'),
+        'target_groups': ('elbv2_client', 'describe_target_groups', 'TargetGroups', 'TargetGroupArn', 'TargetGroupName'),
+        'auto_scaling_groups': ('as_client', 'describe_auto_scaling_groups', 'AutoScalingGroups', 'AutoScalingGroupARN', 'AutoScalingGroupName'),
+        # Scaling policies of every group, named by the group they belong to as a prefix.
+        'scaling_policies': ('as_client', 'describe_policies', 'ScalingPolicies', 'PolicyARN', 'PolicyName'),
+        'instance_profiles': ('iam_client', 'list_instance_profiles', 'InstanceProfiles', 'InstanceProfileId', 'InstanceProfileName'),
+        # Roles with their attached policies and instance profiles, and customer managed policies
+        # with every version's document, read together by one pass, see _index.
+        'roles': ('iam_client', 'get_account_authorization_details', 'RoleDetailList', 'RoleId', 'RoleName'),
+        'policies': ('iam_client', 'get_account_authorization_details', 'Policies', 'Arn', 'PolicyName'),
+    }
+
+    # Extra parameters of the describe call of a kind.
+    PARAMS = {
+        'roles': {'Filter': ['Role', 'LocalManagedPolicy']},
+        'policies': {'Filter': ['Role', 'LocalManagedPolicy']},
+    }
+
+    def __init__(self, ec2_client=None, elbv2_client=None, as_client=None, iam_client=None, max_workers: int = 8,
+                 ec2_filters: list = None, shared=None) -> None:
+        """Class that represents an in-memory snapshot of the account's resources.
+
+        Each resource type is read with one paginated describe the first time it is needed and indexed
+        by id, name and tag. The wrappers serve their existence checks from the snapshot and
+        invalidate a resource type after creating a resource of that type.
+
+        Args:
+            ec2_client : EC2 client used to read VPC and EC2 resources.
+            elbv2_client : ELB client used to read load balancers and target groups.
+            as_client : Autoscaling client used to read autoscaling groups.
+            iam_client : IAM client used to read instance profiles, roles and customer managed policies.
+            max_workers (int): Maximum number of resource types to read at the same time.
+            ec2_filters (list): Filters pushed down into every EC2 describe call, e.g. a tag filter
+                that scopes the snapshot to one product in a shared account.
+            shared (Inventory): Optional snapshot serving, and invalidated for, the resource types
+                of the clients this one has none for, e.g. the global IAM types shared by the
+                inventories of several regions.
+        """
+        self.ec2_client = ec2_client
+        self.elbv2_client = elbv2_client
+        self.as_client = as_client
+        self.iam_client = iam_client
+        self.max_workers = max_workers
+        self.ec2_filters = ec2_filters
+        self.shared = shared
+        self._cache = {}
+        # Kinds read by the same call share a lock, so the call is made once for all of them.
+        locks = {}
+        self._locks = {kind: locks.setdefault(spec[:2], threading.Lock()) for kind, spec in self.KINDS.items()}
+
+    def refresh(self, kinds: list = None) -> None:
+        """This method reads the given resource types concurrently, replacing any cached snapshot.
+
+        Args:
+            kinds (list): Resource types to read. Defaults to every type that has a client; the
+                types of the shared snapshot are left to it.
+        """
+        if kinds is None:
+            kinds = [kind for kind, spec in self.KINDS.items() if getattr(self, spec[0]) is not None]
+        self.invalidate(*kinds)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self._index, kinds))
+
+    def invalidate(self, *kinds: str) -> None:
+        """This method drops the snapshot of the given resource types so the next lookup reads them again.
+
+        Args:
+            kinds (str): Resource types to drop.
+        """
+        for kind in kinds:
+            owner = self._owner(kind)
+            if owner is not self:
+                owner.invalidate(kind)
+                continue
+            with self._locks[kind]:
+                self._cache.pop(kind, None)
+
+    def get(self, kind: str) -> list:
+        """This method returns every resource of the given type.
+
+        Args:
+            kind (str): Resource type, one of Inventory.KINDS.
+
+        Returns:
+            list: The resources as returned by the describe call.
+        """
+        return self._index(kind)['items']
+
+    def get_by_id(self, kind: str, resource_id: str) -> dict:
+        """This method finds a resource by its id.
+
+        Args:
+            kind (str): Resource type, one of Inventory.KINDS.
+            resource_id (str): Id (or ARN for ELB and autoscaling) of the resource.
+
+        Returns:
+            dict: The resource, or None if it doesn't exist.
+        """
+        return self._index(kind)['ids'].get(resource_id)
+
+    def find(self, kind: str, tags: list = None, name: str = None) -> list:
+        """This method finds the resources that carry all the given tags and the given name.
+
+        Args:
+            kind (str): Resource type, one of Inventory.KINDS.
+            tags (list): Tags the resources must have, as [{'Key': ..., 'Value': ...}].
+            name (str): Name the resources must have.
+
+        Returns:
+            list: The matching resources.
+        """
+        index = self._index(kind)
+        if name is not None:
+            found = index['names'].get(name, [])
+        else:
+            found = index['items']
+        for tag in tags or []:
+            ids = index['tags'].get((tag['Key'], tag['Value']), {})
+            found = [item for item in found if id(item) in ids]
+        return found
+
+    def _owner(self, kind: str):
+        # The snapshot that reads a kind: the shared one if this one has no client for it.
+        if self.shared is not None and getattr(self, self.KINDS[kind][0]) is None:
+            return self.shared
+        return self
+
+    def _index(self, kind: str) -> dict:
+        owner = self._owner(kind)
+        if owner is not self:
+            return owner._index(kind)
+        with self._locks[kind]:
+            if kind not in self._cache:
+                client_attr, method, key, id_key, name_key = self.KINDS[kind]
+                kwargs = dict(self.PARAMS.get(kind, {}))
+                if client_attr == 'ec2_client' and self.ec2_filters:
+                    # describe_nat_gateways names its filter parameter 'Filter'.
+                    kwargs['Filter' if kind == 'nat_gateways' else 'Filters'] = self.ec2_filters
+                client = getattr(self, client_attr)
+                siblings = [other for other, spec in self.KINDS.items() if spec[:2] == (client_attr, method)]
+                if len(siblings) == 1:
+                    self._cache[kind] = self._build_index(kind, paginate(client, method, key, **kwargs))
+                else:
+                    # Every page holds the records of each sibling kind under its own key.
+                    items = {other: [] for other in siblings}
+                    for page in client.get_paginator(method).paginate(**kwargs):
+                        for other in siblings:
+                            items[other].extend(page.get(self.KINDS[other][2], []))
+                    for other in siblings:
+                        self._cache[other] = self._build_index(other, items[other])
+            return self._cache[kind]
+
+    def _build_index(self, kind: str, items) -> dict:
+        _, _, _, id_key, name_key = self.KINDS[kind]
+        items = list(items)
+        index = {'items': items, 'ids': {}, 'names': {}, 'tags': {}}
+        for item in items:
+            tags = item.get('Tags', [])
+            index['ids'][item[id_key]] = item
+            if name_key is None:
+                names = [tag['Value'] for tag in tags if tag['Key'] == 'Name']
+            else:
+                names = [item[name_key]]
+            for name in names:
+                index['names'].setdefault(name, []).append(item)
+            for tag in tags:
+                index['tags'].setdefault((tag['Key'], tag['Value']), {})[id(item)] = item
+        return index
@@ -0,0 +1,302 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Limits of one SendMessageBatch, DeleteMessageBatch or ChangeMessageVisibilityBatch call.
+MAX_BATCH = 10
+MAX_BATCH_BYTES = 256 * 1024
+
+
+def lookup_queue_url(sqs_client, name: str) -> str:
+    """This function finds the URL of a queue with a single call.
+
+    Args:
+        sqs_client : Boto3 SQS client.
+        name (str): Name of the queue.
+
+    Returns:
+        str: The queue URL, or None if there is no queue with this name.
+    """
+    try:
+        return sqs_client.get_queue_url(QueueName=name)['QueueUrl']
+    except sqs_client.exceptions.QueueDoesNotExist:
+        return None
+
+
+def message_size(entry: dict) -> int:
+    """This function computes the size SQS counts for a message: its body and its attributes.
+
+    Args:
+        entry (dict): SendMessageBatch entry.
+
+    Returns:
+        int: Size in bytes.
+    """
+    size = len(entry['MessageBody'].encode())
+    for name, attribute in entry.get('MessageAttributes', {}).items():
+        value = attribute.get('StringValue', attribute.get('BinaryValue', b''))
+        size += len(name.encode()) + len(attribute['DataType'].encode()) + len(value.encode() if isinstance(value, str) else value)
+    return size
+
+
+def batches(entries, max_bytes: int = MAX_BATCH_BYTES):
+    """This function chunks messages into batches SQS accepts in one call.
+
+    Args:
+        entries : Iterable of SendMessageBatch entries without an 'Id'.
+        max_bytes (int): Maximum total size of a batch.
+
+    Yields:
+        list: Up to MAX_BATCH entries, of at most max_bytes together.
+    """
+    batch, size = [], 0
+    for entry in entries:
+        entry_size = message_size(entry)
+        if batch and (len(batch) == MAX_BATCH or size + entry_size > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(entry)
+        size += entry_size
+    if batch:
+        yield batch
+
+
+def call_batch(call, entries: list, max_attempts: int = 5, base_delay: float = 0.05, **params) -> list:
+    """This function makes one batch call and retries the entries that failed on the server side.
+
+    A batch call succeeds as a whole even when some of its entries fail. Entries that failed
+    through the sender's fault (e.g. an invalid receipt handle) are not retried.
+
+    Args:
+        call : Bound batch method of an SQS client, e.g. sqs_client.send_message_batch.
+        entries (list): Up to MAX_BATCH entries without an 'Id'.
+        max_attempts (int): Maximum attempts of an entry, including the first.
+        base_delay (float): Base of the exponential backoff between attempts, in seconds.
+        params : Other parameters of the call, e.g. QueueUrl.
+
+    Returns:
+        list: The entries that failed for good, each with the 'Code' and 'Message' of its last failure.
+    """
+    pending = dict(enumerate(entries))
+    failed = []
+    for attempt in range(max_attempts):
+        if attempt:
+            time.sleep(random.uniform(0, base_delay * 2 ** attempt))
+        response = call(Entries=[{'Id': str(index), **entry} for index, entry in pending.items()], **params)
+        retry = {}
+        for failure in response.get('Failed', []):
+            entry = pending[int(failure['Id'])]
+            if failure.get('SenderFault') or attempt == max_attempts - 1:
+                failed.append({**entry, 'Code': failure.get('Code'), 'Message': failure.get('Message')})
+            else:
+                retry[int(failure['Id'])] = entry
+        if not retry:
+            break
+        pending = retry
+    return failed
+
+
+class Producer:
+    def __init__(self, sqs_client, queue_url: str, workers: int = 8, max_attempts: int = 5) -> None:
+        """Class that represents a producer sending messages to a queue in batches.
+
+        Messages are chunked into batches of ten, or fewer if their size adds up to more than a
+        batch may carry, and the batches are sent by a pool of threads.
+
+        Args:
+            sqs_client : Boto3 SQS client, shared by every thread.
+            queue_url (str): URL of the queue, see lookup_queue_url.
+            workers (int): Number of batches sent at the same time.
+            max_attempts (int): Maximum attempts of a message whose batch entry failed on the server side.
+        """
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.workers = workers
+        self.max_attempts = max_attempts
+
+    def send(self, messages) -> dict:
+        """This method sends messages, with a bounded number of batches in flight.
+
+        Args:
+            messages : Iterable of message bodies (str), or of SendMessageBatch entries without
+                an 'Id' (e.g. with MessageAttributes, DelaySeconds or MessageGroupId).
+
+        Returns:
+            dict: 'sent', the number of messages sent, 'failed', the entries that couldn't be sent
+                with the 'Code' and 'Message' of their failure, and 'seconds'.
+        """
+        start = time.perf_counter()
+        entries = ({'MessageBody': message} if isinstance(message, str) else message for message in messages)
+        sent = 0
+        failed = []
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch in batches(entries):
+                # Never more than two batches per thread are queued, so a generator of millions of
+                # messages is consumed as fast as it is sent.
+                while len(in_flight) >= self.workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        sent += self._collect(in_flight.pop(future), future.result(), failed)
+                in_flight[executor.submit(self._send_batch, batch)] = len(batch)
+            for future in list(in_flight):
+                sent += self._collect(in_flight.pop(future), future.result(), failed)
+        return {'sent': sent, 'failed': failed, 'seconds': round(time.perf_counter() - start, 3)}
+
+    def _collect(self, size: int, batch_failed: list, failed: list) -> int:
+        failed.extend(batch_failed)
+        return size - len(batch_failed)
+
+    def _send_batch(self, batch: list) -> list:
+        return call_batch(self.sqs_client.send_message_batch, batch, self.max_attempts, QueueUrl=self.queue_url)
+
+
+class Consumer:
+    def __init__(self, sqs_client, queue_url: str, handler, workers: int = 4, wait_time: int = 20,
+                 visibility_timeout: int = 30, max_attempts: int = 5) -> None:
+        """Class that represents a pool of threads consuming a queue with long polling.
+
+        Every thread receives up to ten messages per call, waiting up to wait_time seconds for
+        them, passes them one by one to the handler and deletes the handled ones with one
+        delete_message_batch call. A message whose handler raises isn't deleted, so it is
+        received again once its visibility timeout expires.
+
+        While a message is being handled its visibility timeout is extended, so a slow handler
+        doesn't let another consumer receive it: one heartbeat thread extends every message past
+        half of its timeout, ten per change_message_visibility_batch call.
+
+        Args:
+            sqs_client : Boto3 SQS client, shared by every thread.
+            queue_url (str): URL of the queue, see lookup_queue_url.
+            handler : Callable taking a message dict (with 'Body', 'MessageId', 'ReceiptHandle' and
+                'Attributes').
+            workers (int): Number of receiving threads.
+            wait_time (int): Seconds a receive call waits for messages, at most 20.
+            visibility_timeout (int): Seconds a received message is hidden from other consumers,
+                and by which the heartbeat extends it.
+            max_attempts (int): Maximum attempts of a batch entry that failed on the server side.
+        """
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.handler = handler
+        self.workers = workers
+        self.wait_time = wait_time
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.stats = Counter()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.threads = []
+        self.heartbeat = None
+
+    def start(self, idle_polls: int = None) -> None:
+        """This method starts the receiving threads and the heartbeat thread.
+
+        Args:
+            idle_polls (int): Optional number of consecutive empty receives after which a thread
+                stops, e.g. 1 to drain the queue and return. By default threads run until stop.
+        """
+        self.stopping.clear()
+        self.threads = [
+            threading.Thread(target=self._receive, args=(idle_polls,), name=f'consumer-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+        self.heartbeat = threading.Thread(target=self._extend, name='consumer-heartbeat', daemon=True)
+        self.heartbeat.start()
+
+    def stop(self) -> dict:
+        """This method stops the threads once their current batch is handled, and waits for them.
+
+        Returns:
+            dict: The stats, see run.
+        """
+        self.stopping.set()
+        return self.join()
+
+    def join(self) -> dict:
+        """This method waits until every receiving thread has stopped.
+
+        Returns:
+            dict: The stats, see run.
+        """
+        for thread in self.threads:
+            thread.join()
+        self.stopping.set()
+        if self.heartbeat is not None:
+            self.heartbeat.join()
+        with self.lock:
+            return dict(self.stats)
+
+    def run(self, idle_polls: int = None) -> dict:
+        """This method consumes the queue until it stays empty, or until stop is called from another thread.
+
+        Args:
+            idle_polls (int): See start.
+
+        Returns:
+            dict: Counts of 'received', 'handled', 'failed' (handler raised), 'deleted' and
+                'extended' messages, and 'seconds'.
+        """
+        start = time.perf_counter()
+        self.start(idle_polls)
+        stats = self.join()
+        return {'received': 0, 'handled': 0, 'failed': 0, 'deleted': 0, 'extended': 0, **stats, 'seconds': round(time.perf_counter() - start, 3)}
+
+    def _count(self, **counts) -> None:
+        with self.lock:
+            self.stats.update(counts)
+
+    def _receive(self, idle_polls: int) -> None:
+        idle = 0
+        while not self.stopping.is_set():
+            messages = self.sqs_client.receive_message(
+                QueueUrl=self.queue_url, MaxNumberOfMessages=MAX_BATCH, WaitTimeSeconds=self.wait_time,
+                VisibilityTimeout=self.visibility_timeout, AttributeNames=['All'], MessageAttributeNames=['All']
+            ).get('Messages', [])
+            if not messages:
+                idle += 1
+                if idle_polls is not None and idle >= idle_polls:
+                    return
+                continue
+            idle = 0
+
+            deadline = time.monotonic() + self.visibility_timeout
+            with self.lock:
+                self.in_flight.update((message['ReceiptHandle'], deadline) for message in messages)
+            handled = []
+            for message in messages:
+                try:
+                    self.handler(message)
+                    handled.append(message)
+                except Exception:
+                    # Left in the queue; it is received again once its visibility timeout expires.
+                    pass
+            with self.lock:
+                for message in messages:
+                    self.in_flight.pop(message['ReceiptHandle'], None)
+
+            failed = []
+            if handled:
+                failed = call_batch(self.sqs_client.delete_message_batch, [{'ReceiptHandle': message['ReceiptHandle']} for message in handled],
+                                    self.max_attempts, QueueUrl=self.queue_url)
+            self._count(received=len(messages), handled=len(handled), failed=len(messages) - len(handled), deleted=len(handled) - len(failed))
+
+    def _extend(self) -> None:
+        # Messages are extended once less than half of their timeout is left, checked a few times
+        # per half timeout.
+        interval = max(0.5, self.visibility_timeout / 6)
+        while not self.stopping.wait(interval):
+            now = time.monotonic()
+            with self.lock:
+                due = [handle for handle, deadline in self.in_flight.items() if deadline - now < self.visibility_timeout / 2]
+                for handle in due:
+                    self.in_flight[handle] = now + self.visibility_timeout
+            for i in range(0, len(due), MAX_BATCH):
+                entries = [{'ReceiptHandle': handle, 'VisibilityTimeout': self.visibility_timeout} for handle in due[i:i + MAX_BATCH]]
+                failed = call_batch(self.sqs_client.change_message_visibility_batch, entries, self.max_attempts, QueueUrl=self.queue_url)
+                self._count(extended=len(entries) - len(failed))
@@ -0,0 +1,47 @@
+def paginate(client, operation: str, result_key: str, **kwargs):
+    """This generator streams the records of a describe/list call page by page.
+
+    Pages are only requested as the caller iterates, so a lookup that stops at its first match
+    doesn't read the rest of the account, and memory stays at one page whatever the account size.
+    Operations that boto3 can't paginate are called once.
+
+    Args:
+        client : Boto3 client to call.
+        operation (str): Name of the client method, e.g. 'describe_subnets'.
+        result_key (str): Key of the records in each page, e.g. 'Subnets'.
+        kwargs : Parameters passed to the call, e.g. Filters.
+
+    Yields:
+        dict: One record at a time.
+    """
+    if not client.can_paginate(operation):
+        yield from getattr(client, operation)(**kwargs).get(result_key, [])
+        return
+
+    for page in client.get_paginator(operation).paginate(**kwargs):
+        yield from page.get(result_key, [])
+
+
+async def paginate_async(client, operation: str, result_key: str, **kwargs):
+    """This async generator streams the records of a describe/list call of an aiobotocore client.
+
+    It behaves like paginate, but pages are awaited, so other calls run on the event loop while
+    a page is in flight.
+
+    Args:
+        client : Aiobotocore client to call.
+        operation (str): Name of the client method, e.g. 'describe_subnets'.
+        result_key (str): Key of the records in each page, e.g. 'Subnets'.
+        kwargs : Parameters passed to the call, e.g. Filters.
+
+    Yields:
+        dict: One record at a time.
+    """
+    if not client.can_paginate(operation):
+        for record in (await getattr(client, operation)(**kwargs)).get(result_key, []):
+            yield record
+        return
+
+    async for page in client.get_paginator(operation).paginate(**kwargs):
+        for record in page.get(result_key, []):
+            yield record
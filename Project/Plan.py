@@ -0,0 +1,410 @@
+from ASG import asg_spec, capacity_changes, launch_changes, launch_template, lifecycle_hooks, policy_names, same_configuration, scaling_policies, warm_pool_settings
+from EC2 import content_hash, content_matches, launch_template_data
+from ELB import elb_spec, listener_changes, target_group_changes
+from IAM import default_document, document_hash, policy_document
+from VPC import GATEWAY_ENDPOINTS, endpoint_changes, rule_permissions, security_group_rule_changes, security_group_spec
+
+
+class Plan:
+    def __init__(self, stack) -> None:
+        """Class that represents what provisioning a stack would change, without changing anything.
+
+        Every resource is looked up with the same check_* method provisioning uses, served from
+        the stack's inventory, and then compared with the spec. Each resource gets one of three
+        actions: 'create' if it doesn't exist, 'exists' if it matches, 'drifted' if it exists but
+        differs from the spec.
+
+        Args:
+            stack (Stack): The stack to plan. It must have an inventory.
+        """
+        if stack.inventory is None:
+            raise ValueError("Planning needs a stack with an inventory")
+        self.stack = stack
+        self.inventory = stack.inventory
+        self.rows = []
+
+    def add(self, resource: str, name: str, action: str, resource_id: str = None, detail: str = None) -> None:
+        """This method adds one resource to the plan.
+
+        Args:
+            resource (str): Kind of resource, e.g. 'subnet'.
+            name (str): Name of the resource.
+            action (str): 'create', 'exists' or 'drifted'.
+            resource_id (str): Id or ARN of the existing resource.
+            detail (str): Why the resource drifted.
+        """
+        self.rows.append({
+            'stack': self.stack.name, 'resource': resource, 'name': name,
+            'action': action, 'id': resource_id, 'detail': detail,
+        })
+
+    def changes(self) -> list:
+        """This method lists the resources provisioning would create or that drifted.
+
+        Returns:
+            list: The rows whose action isn't 'exists'.
+        """
+        return [row for row in self.rows if row['action'] != 'exists']
+
+    def compute(self) -> list:
+        """This method evaluates every resource of the stack.
+
+        Returns:
+            list: One row per resource, see add.
+        """
+        self.rows = []
+        stack = self.stack
+        spec = stack.spec
+        vpc = stack.vpc
+
+        vpc_exists = self._plan_vpc()
+        if vpc_exists:
+            igw_exists = self._plan_internet_gateway()
+            self._plan_route_table('public_route_table', 'PublicRT', 'GatewayId', vpc.igw_id if igw_exists else None)
+            pub_ids = self._plan_subnets('public_subnet', 'PublicSubnet', spec['public_subnets'])
+            rt_ids = []
+            for route in stack.private_routes():
+                nat_exists = self._plan_nat_gateway(route['suffix'], pub_ids.get(route['public']))
+                rt_exists = self._plan_route_table('private_route_table', 'PrivateRT' + route['suffix'], 'NatGatewayId', vpc.nat_gw_id if nat_exists else None)
+                rt_ids.append(vpc.private_rt_id if rt_exists else None)
+            pvt_subnets = self._plan_subnets('private_subnet', 'PrivateSubnet', spec['private_subnets'])
+            pvt_ids = list(pvt_subnets.values())
+            alb_sg = self._plan_security_group('alb_security_group', stack.name + 'AlbSG', 'alb')
+            asg_sg = self._plan_security_group('asg_security_group', stack.name + 'AsgSG', 'asg')
+            endpoint_sg = self._plan_endpoints(rt_ids, [pvt_subnets.get(i) for i in stack.endpoint_subnets()])
+            group_ids = {'alb': alb_sg, 'asg': asg_sg, 'endpoint': endpoint_sg}
+            self._plan_security_group_rules({kind: group_ids[kind] for kind in stack.security_groups()})
+        else:
+            for resource, suffix in [('internet_gateway', 'IG'), ('public_route_table', 'PublicRT')]:
+                self.add(resource, stack.name + suffix, 'create')
+            for i, _ in enumerate(spec['public_subnets'], 1):
+                self.add('public_subnet', f'{stack.name}PublicSubnet{i}', 'create')
+            for route in stack.private_routes():
+                self.add('nat_gateway', stack.name + 'NG' + route['suffix'], 'create')
+                self.add('private_route_table', stack.name + 'PrivateRT' + route['suffix'], 'create')
+            for i, _ in enumerate(spec['private_subnets'], 1):
+                self.add('private_subnet', f'{stack.name}PrivateSubnet{i}', 'create')
+            self.add('alb_security_group', stack.name + 'AlbSG', 'create')
+            self.add('asg_security_group', stack.name + 'AsgSG', 'create')
+            if any(endpoint['service'] not in GATEWAY_ENDPOINTS for endpoint in stack.vpc_endpoints()):
+                self.add('endpoint_security_group', stack.name + 'EndpointSG', 'create')
+            for endpoint in stack.vpc_endpoints():
+                self.add('vpc_endpoint', stack.name + endpoint['suffix'], 'create')
+            self._plan_security_group_rules({kind: None for kind in stack.security_groups()})
+            pub_ids, pvt_ids, alb_sg, asg_sg = [], [], None, None
+
+        self._plan_queue()
+        tg_arn = self._plan_load_balancer(vpc.myvpc_id if vpc_exists else None)
+        self._plan_iam()
+        self._plan_key_pair()
+        lt_id, lt_version = self._plan_launch_template(asg_sg)
+        asg_exists = self._plan_asg(lt_id, lt_version, pvt_ids, tg_arn)
+        self._plan_lifecycle(asg_exists)
+        if stack.scales():
+            self._plan_scaling(asg_exists, tg_arn)
+        return self.rows
+
+    def _plan_vpc(self) -> bool:
+        stack = self.stack
+        name = stack.name + 'VPC'
+        cidr = stack.spec['cidr']
+        if not stack.vpc.check_virtual_private_cloud(stack.named_tags('VPC'), cidr):
+            self.add('vpc', name, 'exists', stack.vpc.myvpc_id)
+            return True
+        for vpc in self.inventory.find('vpcs', tags=stack.named_tags('VPC')[:2]):
+            self.add('vpc', name, 'drifted', vpc['VpcId'], f"cidr is {vpc['CidrBlock']}, not {cidr}")
+            return False
+        self.add('vpc', name, 'create')
+        return False
+
+    def _plan_internet_gateway(self) -> bool:
+        stack = self.stack
+        name = stack.name + 'IG'
+        if stack.vpc.check_internet_gateway(stack.named_tags('IG')):
+            self.add('internet_gateway', name, 'create')
+            return False
+        if stack.vpc.check_igw_attached_to_vpc():
+            self.add('internet_gateway', name, 'drifted', stack.vpc.igw_id, 'not attached to the vpc')
+        else:
+            self.add('internet_gateway', name, 'exists', stack.vpc.igw_id)
+        return True
+
+    def _plan_route_table(self, resource: str, suffix: str, target_key: str, target_id: str) -> bool:
+        stack = self.stack
+        check = stack.vpc.check_public_route_table if resource == 'public_route_table' else stack.vpc.check_private_route_table
+        if check(stack.named_tags(suffix)):
+            self.add(resource, stack.name + suffix, 'create')
+            return False
+        rt_id = stack.vpc.public_rt_id if resource == 'public_route_table' else stack.vpc.private_rt_id
+        routes = self.inventory.get_by_id('route_tables', rt_id).get('Routes', [])
+        if target_id is not None and not any(
+                route.get('DestinationCidrBlock') == '0.0.0.0/0' and route.get(target_key) == target_id for route in routes):
+            self.add(resource, stack.name + suffix, 'drifted', rt_id, f'no default route to {target_id}')
+        else:
+            self.add(resource, stack.name + suffix, 'exists', rt_id)
+        return True
+
+    def _plan_subnets(self, resource: str, suffix: str, subnets: list) -> dict:
+        stack = self.stack
+        check = stack.vpc.check_public_subnet if resource == 'public_subnet' else stack.vpc.check_private_subnet
+        ids = {}
+        for i, subnet in enumerate(subnets, 1):
+            name = f'{stack.name}{suffix}{i}'
+            if check(stack.named_tags(f'{suffix}{i}')):
+                self.add(resource, name, 'create')
+                continue
+            subnet_id = stack.vpc.pub_subnet_id if resource == 'public_subnet' else stack.vpc.pvt_subnet_id
+            ids[i] = subnet_id
+            live = self.inventory.get_by_id('subnets', subnet_id)
+            if live['CidrBlock'] != subnet['cidr'] or live['AvailabilityZone'] != subnet['az']:
+                self.add(resource, name, 'drifted', subnet_id, f"{live['CidrBlock']} in {live['AvailabilityZone']}")
+            else:
+                self.add(resource, name, 'exists', subnet_id)
+        return ids
+
+    def _plan_nat_gateway(self, suffix: str, subnet_id: str) -> bool:
+        stack = self.stack
+        name = stack.name + 'NG' + suffix
+        if stack.vpc.check_nat_gateway(stack.tags, name):
+            self.add('nat_gateway', name, 'create')
+            return False
+        live = self.inventory.get_by_id('nat_gateways', stack.vpc.nat_gw_id)
+        if live['State'] != 'available':
+            self.add('nat_gateway', name, 'drifted', live['NatGatewayId'], f"state is {live['State']}")
+        elif subnet_id is not None and live['SubnetId'] != subnet_id:
+            self.add('nat_gateway', name, 'drifted', live['NatGatewayId'], f"in {live['SubnetId']}, not {subnet_id}")
+        else:
+            self.add('nat_gateway', name, 'exists', live['NatGatewayId'])
+        return True
+
+    def _plan_security_group(self, resource: str, name: str, kind: str) -> str:
+        vpc = self.stack.vpc
+        # kind: (check method, attribute the check sets)
+        check, attribute = {
+            'alb': (vpc.check_alb_security_group, 'group_id'),
+            'asg': (vpc.check_asg_security_group, 'asg_sgid'),
+            'endpoint': (vpc.check_endpoint_security_group, 'endpoint_sgid'),
+        }[kind]
+        if check(name):
+            self.add(resource, name, 'create')
+            return None
+        group_id = getattr(vpc, attribute)
+        live = self.inventory.get_by_id('security_groups', group_id)
+        if live['VpcId'] != vpc.myvpc_id:
+            self.add(resource, name, 'drifted', group_id, f"in {live['VpcId']}, not {vpc.myvpc_id}")
+        else:
+            self.add(resource, name, 'exists', group_id)
+        return group_id
+
+    def _plan_endpoints(self, rt_ids: list, subnet_ids: list) -> str:
+        stack = self.stack
+        vpc = stack.vpc
+        endpoints = stack.vpc_endpoints()
+        sg_id = None
+        if any(endpoint['service'] not in GATEWAY_ENDPOINTS for endpoint in endpoints):
+            sg_id = self._plan_security_group('endpoint_security_group', stack.name + 'EndpointSG', 'endpoint')
+        for endpoint in endpoints:
+            name = stack.name + endpoint['suffix']
+            if vpc.check_vpc_endpoint(endpoint['service'], stack.named_tags(endpoint['suffix'])):
+                self.add('vpc_endpoint', name, 'create')
+                continue
+            live = self.inventory.get_by_id('vpc_endpoints', vpc.endpoint_id)
+            gateway = endpoint['service'] in GATEWAY_ENDPOINTS
+            missing = None in (rt_ids if gateway else subnet_ids + [sg_id])
+            changes = {} if missing else endpoint_changes(live, rt_ids, subnet_ids, sg_id)
+            if live['State'].lower() != 'available':
+                self.add('vpc_endpoint', name, 'drifted', vpc.endpoint_id, f"state is {live['State']}")
+            elif missing:
+                self.add('vpc_endpoint', name, 'drifted', vpc.endpoint_id, f"new {'route tables' if gateway else 'subnets'} will be added")
+            elif changes:
+                self.add('vpc_endpoint', name, 'drifted', vpc.endpoint_id, ', '.join(f'{key} {value}' for key, value in changes.items()))
+            else:
+                self.add('vpc_endpoint', name, 'exists', vpc.endpoint_id)
+        for endpoint in vpc.stale_vpc_endpoints(stack.name + 'Endpoint', [endpoint['service'] for endpoint in endpoints]):
+            name = next(tag['Value'] for tag in endpoint['Tags'] if tag['Key'] == 'Name')
+            self.add('vpc_endpoint', name, 'drifted', endpoint['VpcEndpointId'], 'delete: not in the spec')
+        return sg_id
+
+    def _plan_security_group_rules(self, group_ids: dict) -> None:
+        stack = self.stack
+        names = {kind: stack.name + kind.title() + 'SG' for kind in group_ids}
+        rules = security_group_spec(stack.spec.get('security_groups'))
+        if None in group_ids.values():
+            # Rules refer to the other groups, so they are only applied once every group exists.
+            for kind in group_ids:
+                self.add('security_group_rules', names[kind], 'create')
+            return
+        live = stack.vpc.read_security_group_rules(list(group_ids.values()))
+        for kind, group_id in group_ids.items():
+            authorize, revoke = security_group_rule_changes(rule_permissions(rules[kind], group_ids), live[group_id])
+            changes = []
+            for permission in authorize:
+                source = permission['IpRanges'][0]['CidrIp'] if 'IpRanges' in permission else permission['UserIdGroupPairs'][0]['GroupId']
+                changes.append(f"authorize {permission['IpProtocol']} {permission['FromPort']}-{permission['ToPort']} from {source}")
+            changes += [f'revoke {rule_id}' for rule_id in revoke]
+            self.add('security_group_rules', names[kind], 'drifted' if changes else 'exists', group_id, ', '.join(changes) or None)
+
+    def _plan_queue(self) -> None:
+        stack = self.stack
+        name = stack.name + 'SQS'
+        if stack.sqs.check_sqs_queue(name):
+            self.add('sqs_queue', name, 'create')
+        else:
+            self.add('sqs_queue', name, 'exists', stack.sqs.queue_url)
+
+    def _plan_load_balancer(self, vpc_id: str) -> str:
+        stack = self.stack
+        name = stack.name + 'ALB'
+        tg_name = stack.name + 'TG'
+        spec = elb_spec(stack.spec.get('elb'), stack.name)
+        if stack.elb.check_elb(name, tg_name):
+            self.add('load_balancer', name, 'create')
+            live = {'target_groups': {}, 'attributes': {}, 'listeners': {}, 'rules': {}}
+        else:
+            self.add('load_balancer', name, 'exists', stack.elb.elb_arn)
+            live = stack.elb.read_elb(spec)
+
+        arns = {tg_name: tg['TargetGroupArn'] for tg_name, tg in live['target_groups'].items()}
+        for change in target_group_changes(spec, live, vpc_id) + listener_changes(name, spec, live, arns):
+            action = change['action'] if change['action'] in ('create', 'exists') else 'drifted'
+            detail = change['detail'] if action != 'drifted' or change['action'] == 'replace' else f"{change['action']}: {change['detail']}"
+            self.add(change['resource'], change['name'], action, change['id'], detail)
+        return arns.get(tg_name)
+
+    def _plan_iam(self) -> None:
+        stack = self.stack
+        iam = stack.iam
+        ip_name = stack.name + 'IP'
+        role_name = stack.name + 'Role'
+        policy_name = stack.name + 'Policy'
+
+        if iam.check_instance_profile(ip_name):
+            self.add('instance_profile', ip_name, 'create')
+        else:
+            profile = self.inventory.find('instance_profiles', name=ip_name)[0]
+            if role_name not in [role['RoleName'] for role in profile['Roles']]:
+                self.add('instance_profile', ip_name, 'drifted', iam.ip_id, f'{role_name} is not in the profile')
+            else:
+                self.add('instance_profile', ip_name, 'exists', iam.ip_id)
+
+        roles = self.inventory.find('roles', name=role_name)
+        if roles:
+            self.add('role', role_name, 'exists', roles[0]['Arn'])
+        else:
+            self.add('role', role_name, 'create')
+
+        policies = self.inventory.find('policies', name=policy_name)
+        if not policies:
+            self.add('policy', policy_name, 'create')
+            return
+        details = []
+        if document_hash(default_document(policies[0])) != document_hash(policy_document(stack.spec.get('iam'))):
+            details.append('document changed')
+        if not roles or iam.check_iam_policy(policy_name, role_name):
+            details.append(f'not attached to {role_name}')
+        self.add('policy', policy_name, 'drifted' if details else 'exists', policies[0]['Arn'], '; '.join(details) or None)
+
+    def _plan_key_pair(self) -> None:
+        stack = self.stack
+        name = stack.name + 'Key'
+        if stack.ec2.check_key_pair(name):
+            self.add('key_pair', name, 'create')
+        else:
+            self.add('key_pair', name, 'exists', stack.ec2.key_pair_id)
+
+    def _plan_launch_template(self, asg_sgid: str) -> tuple:
+        stack = self.stack
+        name = stack.name + 'LT'
+        template = stack.ec2.find_launch_template(name)
+        if template is None:
+            self.add('launch_template', name, 'create')
+            return None, None
+        lt_id = template['LaunchTemplateId']
+        version = template['LatestVersionNumber']
+        if asg_sgid is None:
+            # The security group will be created, so the template will get a new version.
+            self.add('launch_template', name, 'drifted', lt_id, f'version {version + 1} will launch into the new {stack.name}AsgSG')
+            return lt_id, None
+        data = launch_template_data(stack.name + 'IP', [asg_sgid], stack.name + 'Key', **stack.launch_template_options())
+        if not content_matches(template, content_hash(data)):
+            self.add('launch_template', name, 'drifted', lt_id, f'content changed; version {version + 1} will be created')
+            return lt_id, None
+        self.add('launch_template', name, 'exists', lt_id, f'version {version}')
+        return lt_id, str(version)
+
+    def _plan_asg(self, lt_id: str, lt_version: str, subnet_ids: list, tg_arn: str) -> bool:
+        stack = self.stack
+        name = stack.name + 'ASG'
+        if stack.asg.check_asg(name):
+            self.add('auto_scaling_group', name, 'create')
+            return False
+        live = self.inventory.find('auto_scaling_groups', name=name)[0]
+        live_lt, live_version = launch_template(live)
+        live_subnets = set(filter(None, live['VPCZoneIdentifier'].split(',')))
+        spec = asg_spec(stack.spec.get('asg'))
+        changes = capacity_changes(live, spec)
+        if lt_id is not None and live_lt != lt_id:
+            self.add('auto_scaling_group', name, 'drifted', live['AutoScalingGroupARN'], f'launches {live_lt}, not {lt_id}; its instances will be refreshed')
+        elif lt_id is not None and live_version != lt_version:
+            version = f'version {lt_version}' if lt_version else 'the new version'
+            self.add('auto_scaling_group', name, 'drifted', live['AutoScalingGroupARN'], f'launches version {live_version}, not {version}; its instances will be refreshed')
+        elif lt_id is not None and launch_changes(live, lt_id, spec, lt_version):
+            mode = 'a mixed instances policy' if 'MixedInstancesPolicy' in live else 'its launch template alone'
+            self.add('auto_scaling_group', name, 'drifted', live['AutoScalingGroupARN'], f'launches through {mode}; its instances will be refreshed')
+        elif subnet_ids and live_subnets != set(subnet_ids):
+            self.add('auto_scaling_group', name, 'drifted', live['AutoScalingGroupARN'], f"in {','.join(sorted(live_subnets))}")
+        elif tg_arn is not None and tg_arn not in live['TargetGroupARNs']:
+            self.add('auto_scaling_group', name, 'drifted', live['AutoScalingGroupARN'], f'not registered with {stack.name}TG')
+        elif changes:
+            self.add('auto_scaling_group', name, 'drifted', live['AutoScalingGroupARN'],
+                     ', '.join(f'{key} is {live.get(key)}, not {value}' for key, value in changes.items()))
+        else:
+            self.add('auto_scaling_group', name, 'exists', live['AutoScalingGroupARN'])
+        return True
+
+    def _plan_lifecycle(self, asg_exists: bool) -> None:
+        stack = self.stack
+        name = stack.name + 'ASG'
+        spec = asg_spec(stack.spec.get('asg'))
+        warm_pool = warm_pool_settings(spec)
+        if warm_pool is not None:
+            # describe_auto_scaling_groups returns the warm pool with the group, so it comes from the inventory.
+            live = self.inventory.find('auto_scaling_groups', name=name)[0].get('WarmPoolConfiguration') if asg_exists else None
+            if live is None:
+                self.add('warm_pool', name, 'create')
+            elif not same_configuration(warm_pool, live):
+                self.add('warm_pool', name, 'drifted', None, f"{live.get('PoolState')} pool of at least {live.get('MinSize')}")
+            else:
+                self.add('warm_pool', name, 'exists')
+        hooks = lifecycle_hooks(name, spec)
+        if hooks:
+            live = {}
+            if asg_exists:
+                live = {hook['LifecycleHookName']: hook for hook in stack.asg.as_client.describe_lifecycle_hooks(AutoScalingGroupName=name)['LifecycleHooks']}
+            for hook_name, settings in hooks.items():
+                if hook_name not in live:
+                    self.add('lifecycle_hook', hook_name, 'create')
+                elif not same_configuration(settings, live[hook_name]):
+                    self.add('lifecycle_hook', hook_name, 'drifted', None, f"{live[hook_name]['LifecycleTransition']}, {live[hook_name].get('HeartbeatTimeout')}s")
+                else:
+                    self.add('lifecycle_hook', hook_name, 'exists')
+
+    def _plan_scaling(self, asg_exists: bool, tg_arn: str) -> None:
+        stack = self.stack
+        name = stack.name + 'ASG'
+        spec = asg_spec(stack.spec.get('asg'))
+        lb_arn = getattr(stack.elb, 'elb_arn', None)
+        if not asg_exists or lb_arn is None or tg_arn is None:
+            for policy_name in policy_names(name, spec):
+                self.add('scaling_policy', policy_name, 'create')
+            return
+        wanted = scaling_policies(name, spec, stack.name + 'SQS', lb_arn, tg_arn)
+        live = {policy['PolicyName']: policy for policy in self.inventory.get('scaling_policies') if policy['AutoScalingGroupName'] == name}
+        for policy_name, configuration in wanted.items():
+            policy = live.get(policy_name)
+            if policy is None:
+                self.add('scaling_policy', policy_name, 'create')
+            elif not same_configuration(configuration, policy.get('TargetTrackingConfiguration')):
+                self.add('scaling_policy', policy_name, 'drifted', policy['PolicyARN'], 'target tracking configuration differs')
+            else:
+                self.add('scaling_policy', policy_name, 'exists', policy['PolicyARN'])
@@ -0,0 +1,198 @@
+import asyncio
+import random
+import threading
+import time
+from botocore.config import Config
+
+
+class TokenBucket:
+    def __init__(self, rate: float, min_rate: float = 0.5) -> None:
+        """Class that represents a token bucket whose refill rate adapts to throttling.
+
+        The rate is halved on every throttle and grows back by a twentieth of the maximum rate on
+        every success, so callers settle just under the rate the API sustains.
+
+        Args:
+            rate (float): Maximum calls per second, which is also the burst size.
+            min_rate (float): The rate never drops below this.
+        """
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """This method takes one token, sleeping until it is available.
+
+        Tokens are reserved before sleeping, so concurrent callers are served in arrival order.
+        """
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """This method takes one token like acquire, but waits without blocking the event loop."""
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _reserve(self) -> float:
+        # Takes a token, possibly one not refilled yet, and returns the seconds until it is.
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+    def throttled(self) -> None:
+        """This method slows the bucket down after a throttle response."""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self) -> None:
+        """This method speeds the bucket back up after a successful call."""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RateLimiter:
+    # Default calls per second per service, keyed by botocore service id as used in event names.
+    RATES = {
+        'ec2': 20,
+        'elastic-load-balancing-v2': 10,
+        'auto-scaling': 10,
+        'iam': 10,
+        # Message calls carry up to ten messages each; standard queues take thousands per second.
+        'sqs': 1000,
+    }
+
+    THROTTLE_CODES = {
+        'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+        'TooManyRequestsException', 'RequestLimitExceeded', 'BandwidthLimitExceeded', 'RequestThrottled',
+        'SlowDown', 'PriorRequestNotComplete', 'EC2ThrottledException',
+    }
+
+    TRANSIENT_CODES = {'RequestTimeout', 'RequestTimeoutException', 'InternalError', 'InternalFailure', 'ServiceUnavailable'}
+
+    TRANSIENT_STATUS = {500, 502, 503, 504}
+
+    # Clients the limiter is attached to should be built with this config, so that the limiter
+    # alone decides whether a call is retried.
+    CLIENT_CONFIG = Config(retries={'mode': 'standard', 'total_max_attempts': 1})
+
+    def __init__(self, rates: dict = None, default_rate: float = 10, max_attempts: int = 8,
+                 retry_budget: int = 500, retry_cost: int = 5, base_delay: float = 0.1, max_delay: float = 20) -> None:
+        """Class that represents a rate limiter and retry budget shared by every client of a run.
+
+        Every HTTP attempt takes a token from the bucket of its service and from the bucket of its
+        API action. Throttle responses slow the action's bucket down, successes speed it back up.
+        Retries draw from one budget shared by all clients, which is refilled by successful calls,
+        so a throttling storm stops retrying instead of cascading.
+
+        Args:
+            rates (dict): Calls per second keyed by service id ('ec2') or service id and action
+                ('ec2.DescribeSubnets'). Merged over RateLimiter.RATES.
+            default_rate (float): Calls per second of services and actions without a rate.
+            max_attempts (int): Maximum attempts of one call, including the first.
+            retry_budget (int): Capacity of the shared retry budget.
+            retry_cost (int): Budget taken by every retry. Every success gives one back.
+            base_delay (float): Base of the exponential backoff in seconds.
+            max_delay (float): Maximum backoff in seconds.
+        """
+        self.rates = dict(self.RATES, **(rates or {}))
+        self.default_rate = default_rate
+        self.max_attempts = max_attempts
+        self.retry_budget = retry_budget
+        self.retry_capacity = retry_budget
+        self.retry_cost = retry_cost
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def attach(self, client):
+        """This method routes every call of a client or resource through the limiter.
+
+        Args:
+            client : Boto3 client or resource.
+
+        Returns:
+            The same client or resource.
+        """
+        events = getattr(client.meta, 'client', client).meta.events
+        events.register('before-send', self._before_send, unique_id='qube-rate-limiter-before-send')
+        events.register_first('needs-retry', self._needs_retry, unique_id='qube-rate-limiter-needs-retry')
+        return client
+
+    def attach_async(self, session) -> None:
+        """This method routes every call of the aiobotocore clients the session builds from now on through the limiter.
+
+        Calls wait for their tokens with asyncio.sleep, so a throttled service doesn't block the
+        event loop. Retries and their backoff are decided as for attach; the clients should be
+        built with CLIENT_CONFIG.
+
+        Args:
+            session : Aiobotocore session.
+        """
+        events = session.get_component('event_emitter')
+        events.register('before-send', self._before_send_async, unique_id='qube-rate-limiter-before-send')
+        events.register_first('needs-retry', self._needs_retry, unique_id='qube-rate-limiter-needs-retry')
+
+    def bucket(self, key: str) -> TokenBucket:
+        """This method returns the bucket of a service or of a service action, creating it on first use.
+
+        Args:
+            key (str): Service id ('ec2') or service id and action ('ec2.DescribeSubnets').
+
+        Returns:
+            TokenBucket: The bucket.
+        """
+        with self.lock:
+            if key not in self.buckets:
+                rate = self.rates.get(key, self.rates.get(key.split('.')[0], self.default_rate))
+                self.buckets[key] = TokenBucket(rate)
+            return self.buckets[key]
+
+    def _before_send(self, event_name: str, **kwargs) -> None:
+        _, service, action = event_name.split('.', 2)
+        self.bucket(service).acquire()
+        self.bucket(f'{service}.{action}').acquire()
+
+    async def _before_send_async(self, event_name: str, **kwargs) -> None:
+        _, service, action = event_name.split('.', 2)
+        await self.bucket(service).acquire_async()
+        await self.bucket(f'{service}.{action}').acquire_async()
+
+    def _needs_retry(self, event_name: str, response=None, attempts: int = 1, caught_exception=None, **kwargs):
+        _, service, action = event_name.split('.', 2)
+        bucket = self.bucket(f'{service}.{action}')
+
+        code = None
+        status = None
+        if response is not None:
+            status = response[0].status_code
+            code = response[1].get('Error', {}).get('Code')
+
+        if caught_exception is None and code is None and status not in self.TRANSIENT_STATUS:
+            bucket.succeeded()
+            with self.lock:
+                self.retry_budget = min(self.retry_capacity, self.retry_budget + 1)
+            return None
+
+        if code in self.THROTTLE_CODES:
+            bucket.throttled()
+        elif caught_exception is None and code not in self.TRANSIENT_CODES and status not in self.TRANSIENT_STATUS:
+            return None
+
+        if attempts >= self.max_attempts:
+            return None
+        with self.lock:
+            if self.retry_budget < self.retry_cost:
+                return None
+            self.retry_budget -= self.retry_cost
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempts))
@@ -0,0 +1,251 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import boto3
+from Clients import ClientFactory
+from Fleet import Fleet
+from Inventory import Inventory
+from RateLimiter import RateLimiter
+from Stack import DEFAULT_SPEC
+from State import State
+from WaitManager import WaitManager
+
+
+def region_zones(ec2_client) -> list:
+    """This function lists the availability zones a region can place subnets in.
+
+    Local and Wavelength zones, and zones that aren't available, are left out.
+
+    Args:
+        ec2_client : Boto3 EC2 client of the region.
+
+    Returns:
+        list: Zone names, sorted, e.g. ['eu-west-1a', 'eu-west-1b', 'eu-west-1c'].
+    """
+    zones = ec2_client.describe_availability_zones(Filters=[
+        {'Name': 'state', 'Values': ['available']},
+        {'Name': 'zone-type', 'Values': ['availability-zone']},
+    ])['AvailabilityZones']
+    return sorted(zone['ZoneName'] for zone in zones)
+
+
+def regional_spec(spec: dict, zones: list) -> dict:
+    """This function places a stack spec in the availability zones of a region.
+
+    A spec with a topology gets the region's zones. Otherwise the zones its subnets name are
+    mapped, in the order they first appear, onto the region's zones, so subnets that shared a
+    zone still share one.
+
+    Args:
+        spec (dict): Stack spec, see Stack.
+        zones (list): Zones of the region, see region_zones.
+
+    Returns:
+        dict: A copy of the spec with the region's zones.
+
+    Raises:
+        ValueError: If the spec's subnets name more zones than the region has.
+    """
+    spec = dict(DEFAULT_SPEC, **spec)
+    if 'topology' in spec:
+        return dict(spec, topology=dict(spec['topology'], zones=zones))
+
+    named = []
+    for subnet in spec['public_subnets'] + spec['private_subnets']:
+        if subnet['az'] not in named:
+            named.append(subnet['az'])
+    if len(named) > len(zones):
+        raise ValueError(f"Stack {spec['name']} uses {len(named)} availability zones but the region has {len(zones)}")
+    placement = dict(zip(named, zones))
+    return dict(
+        spec,
+        public_subnets=[dict(subnet, az=placement[subnet['az']]) for subnet in spec['public_subnets']],
+        private_subnets=[dict(subnet, az=placement[subnet['az']]) for subnet in spec['private_subnets']],
+    )
+
+
+def region_state_path(path: str, region: str) -> str:
+    """This function names the state file of a region, e.g. qube_state.eu-west-1.db.
+
+    Args:
+        path (str): Path of the state file of a single region run.
+        region (str): Region name.
+
+    Returns:
+        str: Path of the region's state file.
+    """
+    root, extension = os.path.splitext(path)
+    return f'{root}.{region}{extension}'
+
+
+class Once:
+    def __init__(self) -> None:
+        """Class that represents calls made once however many threads make them.
+
+        The first thread to make a call runs it; the others wait for it and get its result, or
+        its exception.
+        """
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def call(self, key, function, *args):
+        """This method runs a function unless a call with the same key was already made.
+
+        Args:
+            key : Hashable key of the call.
+            function : Callable to run.
+            args : Arguments of the callable.
+
+        Returns:
+            The result of the first call with this key.
+        """
+        with self.lock:
+            future = self.futures.get(key)
+            first = future is None
+            if first:
+                future = self.futures[key] = Future()
+        if first:
+            try:
+                future.set_result(function(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+        return future.result()
+
+
+class GlobalIam:
+    def __init__(self, iam) -> None:
+        """Class that represents the Iam wrapper shared by a stack's deployments to several regions.
+
+        IAM is global, so the instance profile, role and policy of a stack are the same in every
+        region, and one Iam serves the stack in all of them. Its create_* and delete_* methods are
+        made once per resource name, so concurrent regions don't race to create or delete it;
+        every other attribute is the one of the wrapped Iam.
+
+        Args:
+            iam (Iam): Iam wrapper of the stack in the first region to use it.
+        """
+        object.__setattr__(self, 'iam', iam)
+        object.__setattr__(self, 'once', Once())
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.iam, name)
+        if not name.startswith(('create_', 'delete_')) or not callable(attribute):
+            return attribute
+        # The first argument is the name of the IAM resource.
+        return lambda *args: self.once.call((name, args[0]), attribute, *args)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self.iam, name, value)
+
+
+class Regions:
+    def __init__(self, specs: list, regions: list, max_workers: int = 4, state_path: str = 'qube_state.db', tracer=None) -> None:
+        """Class that represents the same stacks deployed to several regions at the same time.
+
+        Every region has its own session, clients, rate limiter, inventory and state file, and
+        its stacks are placed in the zones the region reports. The regions are deployed
+        concurrently, each as a Fleet, so a rollout takes about as long as its slowest region.
+        IAM resources, which are global, are read into one inventory shared by the regions, and
+        created and deleted once per run, see GlobalIam; the key pair of each region is saved to
+        <name>Key.<region>.pem.
+
+        Args:
+            specs (list): One spec per stack, see Stack.
+            regions (list): Region names, e.g. ['ap-south-1', 'eu-west-1'].
+            max_workers (int): Maximum number of stacks of a region to provision at the same time.
+            state_path (str): Path of the state file, see region_state_path.
+            tracer (Tracer): Optional tracer of every API call.
+        """
+        self.specs = specs
+        self.regions = regions
+        self.max_workers = max_workers
+        self.state_path = state_path
+        # One polling loop serves the waits of every region, grouped by client.
+        self.wait_manager = WaitManager()
+        self.iams = {}
+        self.iam_inventory = None
+        self.lock = threading.Lock()
+        self.clients = {}
+        for region in regions:
+            self.clients[region] = ClientFactory(boto3.session.Session(region_name=region), RateLimiter.CLIENT_CONFIG,
+                                                 max(50, max_workers * 8), RateLimiter())
+            if tracer is not None:
+                tracer.attach(self.clients[region].session)
+
+    def provision(self) -> list:
+        """This method provisions every stack in every region, see Fleet.provision.
+
+        Returns:
+            list: One result per region, see _run; its 'results' are the ones of Fleet.provision.
+        """
+        return self._run(lambda fleet: fleet.provision())
+
+    def plan(self) -> list:
+        """This method reports what provisioning every region would change, see Fleet.plan.
+
+        Returns:
+            list: One result per region, see _run; its 'results' are plan rows.
+        """
+        return self._run(lambda fleet: fleet.plan())
+
+    def destroy(self) -> list:
+        """This method deletes every stack in every region, see Fleet.destroy.
+
+        Returns:
+            list: One result per region, see _run; its 'results' are the ones of Fleet.destroy.
+        """
+        return self._run(lambda fleet: fleet.destroy())
+
+    def _run(self, action) -> list:
+        """This method runs an action on the fleet of every region, all regions at the same time.
+
+        A failing region doesn't stop the others; its error is reported in its result. Every run
+        starts with a fresh IAM inventory and fresh GlobalIam wrappers, so IAM is read again and
+        a second provision creates whatever went missing since the first.
+
+        Args:
+            action : Callable taking a Fleet and returning its result rows.
+
+        Returns:
+            list: One result per region with 'region', 'status' ('ok', or 'failed' if the region
+                or any of its stacks failed), 'seconds', 'latency_ms' (of one describe call),
+                'zones', 'error' and 'results', the rows of the action tagged with their 'region'.
+        """
+        self.iams = {}
+        self.iam_inventory = Inventory(iam_client=self.clients[self.regions[0]]['iam_client'])
+        with ThreadPoolExecutor(max_workers=len(self.regions)) as executor:
+            return list(executor.map(lambda region: self._run_region(region, action), self.regions))
+
+    def _run_region(self, region: str, action) -> dict:
+        start = time.perf_counter()
+        result = {'region': region, 'status': 'ok', 'latency_ms': None, 'zones': None, 'error': None, 'results': []}
+        try:
+            fleet = self._fleet(region, result)
+            result['results'] = [dict(row, region=region) for row in action(fleet)]
+            if any(row.get('status') == 'failed' for row in result['results']):
+                result['status'] = 'failed'
+        except Exception as exc:
+            result['status'] = 'failed'
+            result['error'] = f"{type(exc).__name__}: {exc}"
+        result['seconds'] = round(time.perf_counter() - start, 1)
+        return result
+
+    def _fleet(self, region: str, result: dict) -> Fleet:
+        clients = self.clients[region]
+        # The client is built first, so the latency is the one of the call alone.
+        clients.build('ec2_client')
+        start = time.perf_counter()
+        zones = region_zones(clients['ec2_client'])
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        result['zones'] = ','.join(zone[len(region):] for zone in zones)
+
+        # IAM is global, so every region reads and invalidates the same IAM snapshot.
+        inventory = Inventory(clients['ec2_client'], clients['elbv2_client'], clients['as_client'], shared=self.iam_inventory)
+        state = State(region_state_path(self.state_path, region))
+        fleet = Fleet([regional_spec(spec, zones) for spec in self.specs], clients, inventory, self.max_workers, self.wait_manager, state)
+        for stack in fleet.stacks:
+            with self.lock:
+                stack.iam = self.iams.setdefault(stack.name, GlobalIam(stack.iam))
+            stack.key_path = f'{stack.name}Key.{region}.pem'
+        return fleet
@@ -1,3 +1,6 @@
+from Messages import lookup_queue_url
+
+
 class Sqs:
     def __init__(self, sqs_resource) -> None:
         """Class that represents Amazon SQS service.
@@ -7,15 +10,20 @@ class Sqs:
         """
         self.sqs_resource = sqs_resource
 
-    def create_sqs_queue(self, name: str, tags: dict) -> None:
+    def create_sqs_queue(self, name: str, tags: dict) -> str:
         """This method creates SQS queue.
 
         Args:
             name (str): Name of the queue.
             tags (dict): Tags to add to the queue.
+
+        Returns:
+            str: Return the queue url.
         """
         if self.check_sqs_queue(name):
-            self.sqs_resource.create_queue(QueueName=name, tags=tags)
+            self.queue_url = self.sqs_resource.create_queue(QueueName=name, tags=tags).url
+
+        return self.queue_url
 
     def check_sqs_queue(self, name: str) -> bool:
         """To check whether SQS already exists with the given name.
@@ -26,8 +34,17 @@ class Sqs:
         Returns:
             bool : False if queue exists with the given name, else True.
         """
-        for queue in self.sqs_resource.queues.all():
-            if name == queue.attributes['QueueArn'].split(':')[-1]:
-                return False
-        else:
-            return True
\ No newline at end of file
+        queue_url = lookup_queue_url(self.sqs_resource.meta.client, name)
+        if queue_url is None:
+            return True
+        self.queue_url = queue_url
+        return False
+
+    def delete_sqs_queue(self, name: str) -> None:
+        """This method deletes the queue with the given name, if it exists.
+
+        Args:
+            name (str): Name of the queue.
+        """
+        if not self.check_sqs_queue(name):
+            self.sqs_resource.meta.client.delete_queue(QueueUrl=self.queue_url)
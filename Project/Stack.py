@@ -0,0 +1,509 @@
+from VPC import Vpc, ENDPOINTS, GATEWAY_ENDPOINTS, carve_subnets, rule_permissions, security_group_rule_changes, security_group_spec
+from SQS import Sqs
+from ASG import Asg, asg_spec, policy_names
+import base64
+from EC2 import Ec2, IMAGE_ID, USER_DATA
+from IAM import Iam, default_document, document_hash, policy_document
+from ELB import Elb, elb_spec
+from DAG import Dag
+from Paginator import paginate
+from State import spec_hash
+
+# The stack script.py has always provisioned. Resource names are derived from 'name'.
+DEFAULT_SPEC = {
+    'name': 'Qube',
+    'cidr': '172.20.0.0/16',
+    'public_subnets': [
+        {'cidr': '172.20.1.0/24', 'az': 'ap-south-1a'},
+        {'cidr': '172.20.2.0/24', 'az': 'ap-south-1b'},
+    ],
+    'private_subnets': [
+        {'cidr': '172.20.3.0/24', 'az': 'ap-south-1a'},
+    ],
+    'tags': [{'Key': 'Product', 'Value': 'challenge'}],
+}
+
+
+class Stack:
+    # Steps whose resource isn't an EC2 resource, and so can't be verified with describe_tags.
+    NON_EC2_STEPS = ('sqs', 'elb', 'instance_profile', 'asg', 'scaling', 'policy', 'sg_rules')
+
+    def __init__(self, spec: dict, clients: dict, inventory=None, wait_manager=None, state=None) -> None:
+        """Class that represents one Qube environment: VPC, ALB, ASG and their supporting resources.
+
+        Args:
+            spec (dict): Stack spec with 'name', 'cidr', 'public_subnets', 'private_subnets' and 'tags'.
+                Missing keys are taken from DEFAULT_SPEC. An optional 'asg' key sets the capacity,
+                instance mix and scaling targets of the autoscaling group, see ASG.ASG_SPEC, and an
+                optional 'launch_template' key its 'image_id' and plain text 'user_data'. An optional
+                'elb' key sets the listeners, rules and target groups of the load balancer, see ELB.ELB_SPEC.
+                An optional 'topology' key spreads the stack over several availability zones, with
+                a NAT gateway and a private route table per zone, and allocates its subnets from
+                'cidr' instead of 'public_subnets' and 'private_subnets', see VPC.TOPOLOGY_SPEC.
+                An optional 'endpoints' key lists the services the instances reach through VPC
+                endpoints instead of the NAT gateways, VPC.ENDPOINTS by default. An optional
+                'security_groups' key sets the ingress rules of its security groups, see
+                VPC.SECURITY_GROUPS_SPEC. An optional 'iam' key sets the statements of the policy
+                of the instances' role, see IAM.IAM_SPEC.
+            clients (dict): Boto3 clients and resources keyed 'ec2_resource', 'ec2_client', 'sqs_resource',
+                'as_client', 'elbv2_client' and 'iam_client'. They can be shared between stacks.
+            inventory (Inventory): Optional snapshot to serve existence checks from.
+            wait_manager (WaitManager): Optional poller shared by every step that waits for readiness.
+            state (State): Optional local record of the resources, used to skip no-op runs.
+        """
+        self.spec = dict(DEFAULT_SPEC, **spec)
+        if 'topology' in self.spec:
+            self.spec.update(carve_subnets(self.spec['cidr'], self.spec['topology'], clients['ec2_client'].meta.region_name))
+        self.name = self.spec['name']
+        self.tags = self.spec['tags']
+
+        self.vpc = Vpc(clients['ec2_resource'], clients['ec2_client'], inventory, wait_manager)
+        self.sqs = Sqs(clients['sqs_resource'])
+        self.elb = Elb(clients['elbv2_client'], inventory)
+        self.iam = Iam(clients['iam_client'], inventory, wait_manager)
+        self.ec2 = Ec2(clients['ec2_client'], inventory)
+        self.asg = Asg(clients['as_client'], inventory, wait_manager)
+
+        self.inventory = inventory
+        self.state = state
+        self.dag = None
+        self.resources = None
+        self.drift = []
+        # File the private key of the stack's key pair is saved to, <name>Key.pem by default.
+        self.key_path = None
+
+    def named_tags(self, suffix: str) -> list:
+        """This method builds the tags of a named resource of the stack.
+
+        Args:
+            suffix (str): Resource suffix, e.g. 'VPC' gives the Name tag 'QubeVPC'.
+
+        Returns:
+            list: The Name tag followed by the stack tags.
+        """
+        return [{'Key': 'Name', 'Value': self.name + suffix}] + self.tags
+
+    def launch_template_options(self) -> dict:
+        """This method reads the AMI and user data of the instances from the spec.
+
+        A group with a warm pool can't pick instance types itself, so its instance type is in
+        the launch template, see ASG.ASG_SPEC.
+
+        Returns:
+            dict: 'image_id', base64 encoded 'user_data' and, with a warm pool, 'instance_type',
+                for Ec2.create_launch_template.
+        """
+        options = self.spec.get('launch_template', {})
+        user_data = base64.b64encode(options['user_data'].encode()).decode() if 'user_data' in options else USER_DATA
+        settings = {'image_id': options.get('image_id', IMAGE_ID), 'user_data': user_data}
+        asg = asg_spec(self.spec.get('asg'))
+        if asg['warm_pool'] is not None:
+            settings['instance_type'] = asg['instance_type']
+        return settings
+
+    def scales(self) -> bool:
+        """This method tells if the spec asks for a target tracking policy on the autoscaling group.
+
+        Returns:
+            bool: True if the stack has a 'scaling' step.
+        """
+        return bool(policy_names(self.name + 'ASG', asg_spec(self.spec.get('asg'))))
+
+    def private_routes(self) -> list:
+        """This method pairs the private subnets with the NAT gateway and route table they go through.
+
+        A stack with a 'topology' has a NAT gateway in the public subnet of every zone, and the
+        private subnet of that zone routes through it, so its traffic never crosses zones. Other
+        stacks have one NAT gateway in the first public subnet for every private subnet.
+
+        Returns:
+            list: One dict per NAT gateway with the 'suffix' of its names, its 'nat' and
+                'private_rt' steps, the number of the 'public' subnet it is in and the numbers
+                of the 'private' subnets that route through it.
+        """
+        numbers = list(range(1, len(self.spec['private_subnets']) + 1))
+        if 'topology' not in self.spec:
+            return [{'suffix': '', 'nat': 'nat', 'private_rt': 'private_rt', 'public': 1, 'private': numbers}]
+        return [
+            {'suffix': str(i), 'nat': f'nat_{i}', 'private_rt': f'private_rt_{i}', 'public': i, 'private': [i]}
+            for i in numbers
+        ]
+
+    def vpc_endpoints(self) -> list:
+        """This method lists the VPC endpoints of the stack.
+
+        Returns:
+            list: One dict per endpoint with its 'service', its 'step' and the 'suffix' of its Name tag.
+        """
+        return [
+            {'service': service, 'step': f'endpoint_{service}', 'suffix': 'Endpoint' + service.replace('.', ' ').title().replace(' ', '')}
+            for service in self.spec.get('endpoints', ENDPOINTS)
+        ]
+
+    def endpoint_subnets(self) -> list:
+        """This method picks the private subnets of the interface endpoints, the first one of every zone.
+
+        Returns:
+            list: Numbers of the private subnets, at most one per availability zone.
+        """
+        zones = {}
+        for i, subnet in enumerate(self.spec['private_subnets'], 1):
+            zones.setdefault(subnet['az'], i)
+        return list(zones.values())
+
+    def security_groups(self) -> dict:
+        """This method lists the security groups of the stack.
+
+        Returns:
+            dict: The step of every security group, keyed as in VPC.SECURITY_GROUPS_SPEC. The
+                endpoint group only exists if the stack has interface endpoints.
+        """
+        steps = {'alb': 'alb_sg', 'asg': 'asg_sg'}
+        if any(endpoint['service'] not in GATEWAY_ENDPOINTS for endpoint in self.vpc_endpoints()):
+            steps['endpoint'] = 'endpoint_sg'
+        return steps
+
+    def build(self, max_workers: int = 8) -> Dag:
+        """This method declares every provisioning step of the stack and the steps it depends on.
+
+        Args:
+            max_workers (int): Maximum number of steps to run at the same time.
+
+        Returns:
+            Dag: The graph of provisioning steps.
+        """
+        name = self.name
+        tags = self.tags
+        dag = Dag(max_workers)
+
+        # VPC resources
+        dag.add_node("vpc", lambda: self.vpc.create_virtual_private_cloud(self.named_tags('VPC'), self.spec['cidr']))
+
+        dag.add_node("igw", lambda vpc_id: self.vpc.create_and_attach_internet_gateway(self.named_tags('IG')), ["vpc"])
+
+        dag.add_node("public_rt", lambda igw: self.vpc.create_public_route_table(self.named_tags('PublicRT')), ["igw"])
+
+        public_subnets = []
+        for i, subnet in enumerate(self.spec['public_subnets'], 1):
+            dag.add_node(f"pub_sub_{i}", lambda public_rt, subnet=subnet, i=i: self.vpc.create_public_subnet(subnet['cidr'], subnet['az'], self.named_tags(f'PublicSubnet{i}')), ["public_rt"])
+            public_subnets.append(f"pub_sub_{i}")
+
+        private_subnets = []
+        for route in self.private_routes():
+            suffix = route['suffix']
+            dag.add_node(route['nat'], lambda pub_sub, suffix=suffix: self.vpc.create_nat_gateway(tags, name + 'NG' + suffix, pub_sub), [f"pub_sub_{route['public']}"])
+
+            dag.add_node(route['private_rt'], lambda nat_gw_id, suffix=suffix: self.vpc.create_private_route_table(self.named_tags('PrivateRT' + suffix), nat_gw_id), [route['nat']])
+
+            for i in route['private']:
+                subnet = self.spec['private_subnets'][i - 1]
+                dag.add_node(f"pvt_sub_{i}", lambda private_rt, subnet=subnet, i=i: self.vpc.create_private_subnet(subnet['cidr'], subnet['az'], self.named_tags(f'PrivateSubnet{i}'), private_rt), [route['private_rt']])
+                private_subnets.append(f"pvt_sub_{i}")
+
+        dag.add_node("alb_sg", lambda vpc_id: self.vpc.create_alb_security_group(name + "AlbSG", "Security group for ALB", tags), ["vpc"])
+
+        dag.add_node("asg_sg", lambda vpc_id: self.vpc.create_asg_security_group(name + "AsgSG", "Security group for ASG", tags), ["vpc"])
+
+        security_groups = self.security_groups()
+        if 'endpoint' in security_groups:
+            dag.add_node("endpoint_sg", lambda vpc_id: self.vpc.create_endpoint_security_group(name + "EndpointSG", "Security group for VPC endpoints", tags), ["vpc"])
+
+        # The rules of every group are applied together, once all of them exist, since they refer to each other
+        dag.add_node("sg_rules", lambda *group_ids: self.vpc.reconcile_security_groups(dict(zip(security_groups, group_ids)), self.spec.get('security_groups')), list(security_groups.values()))
+
+        # VPC endpoints, so the queue, KMS and S3 traffic of the instances stays off the NAT gateways
+        endpoints = self.vpc_endpoints()
+
+        private_rts = [route['private_rt'] for route in self.private_routes()]
+        for endpoint in endpoints:
+            if endpoint['service'] in GATEWAY_ENDPOINTS:
+                dag.add_node(endpoint['step'], lambda *rt_ids, endpoint=endpoint: self.vpc.create_vpc_endpoint(endpoint['service'], self.named_tags(endpoint['suffix']), route_table_ids=list(rt_ids)), private_rts)
+            else:
+                dag.add_node(endpoint['step'], lambda sg_id, *subnet_ids, endpoint=endpoint: self.vpc.create_vpc_endpoint(endpoint['service'], self.named_tags(endpoint['suffix']), subnet_ids=list(subnet_ids), sg_id=sg_id), ["endpoint_sg"] + [f"pvt_sub_{i}" for i in self.endpoint_subnets()])
+
+        # SQS resources
+        dag.add_node("sqs", lambda: self.sqs.create_sqs_queue(name + "SQS", {tag['Key']: tag['Value'] for tag in tags}))
+
+        # ELB resources
+        dag.add_node("elb", lambda vpc_id, alb_sgid, *pub_subs: self.elb.create_elb(name + "ALB", list(pub_subs), tags, alb_sgid, vpc_id, name + "TG", elb_spec(self.spec.get('elb'), name)), ["vpc", "alb_sg"] + public_subnets)
+
+        # IAM resources
+        dag.add_node("instance_profile", lambda: self.iam.create_instance_profile(name + "IP", tags, name + "Role"))
+
+        # EC2 resources
+        dag.add_node("key", lambda: self.ec2.create_key(tags, name + "Key", self.key_path))
+
+        dag.add_node("launch_template", lambda ip_id, key, asg_sgid: self.ec2.create_launch_template(name + "LT", name + "IP", tags, [asg_sgid], name + "Key", **self.launch_template_options()), ["instance_profile", "key", "asg_sg"])
+
+        # ASG resources
+        dag.add_node("asg", lambda launch_template_id, tg_arn, *pvt_subs: self.asg.create_asg(name + "ASG", launch_template_id, ",".join(pvt_subs), [tg_arn], tags, self.spec.get('asg'), self.ec2.lt_version), ["launch_template", "elb"] + private_subnets)
+
+        # Scaling policies, only declared when the spec asks for one
+        if self.scales():
+            dag.add_node("scaling", lambda asg_arn, tg_arn, queue_url: self.asg.put_scaling_policies(name + "ASG", name + "SQS", self.elb.elb_arn, tg_arn, self.spec.get('asg')), ["asg", "elb", "sqs"])
+
+        # IAM resources
+        dag.add_node("policy", lambda asg_arn, ip_id: self.iam.create_add_iam_policy_to_role(
+            name + "Policy", tags, asg_arn, name + "Role", policy_document(self.spec.get('iam'))), ["asg", "instance_profile"])
+
+        self.dag = dag
+        return dag
+
+    def provision(self, max_workers: int = 8) -> dict:
+        """This method creates every resource of the stack that doesn't exist yet.
+
+        Args:
+            max_workers (int): Maximum number of steps to run at the same time.
+
+        Returns:
+            dict: Result of every provisioning step, keyed by step name.
+        """
+        self.resources = self.build(max_workers).run()
+        self.prune_endpoints()
+        if self.state is not None:
+            self.state.save(self.name, self.resources, spec_hash(self.spec))
+        return self.resources
+
+    def locate_network(self) -> dict:
+        """This method finds the ids of the existing VPC resources of the stack.
+
+        Returns:
+            dict: Id of every VPC step's resource, or None if it doesn't exist, keyed by step name.
+        """
+        vpc = self.vpc
+        ids = {}
+        ids['igw'] = None if vpc.check_internet_gateway(self.named_tags('IG')) else vpc.igw_id
+        ids['public_rt'] = None if vpc.check_public_route_table(self.named_tags('PublicRT')) else vpc.public_rt_id
+        for route in self.private_routes():
+            ids[route['nat']] = None if vpc.check_nat_gateway(self.tags, self.name + 'NG' + route['suffix']) else vpc.nat_gw_id
+            ids[route['private_rt']] = None if vpc.check_private_route_table(self.named_tags('PrivateRT' + route['suffix'])) else vpc.private_rt_id
+
+        vpc_missing = vpc.check_virtual_private_cloud(self.named_tags('VPC'), self.spec['cidr'])
+        ids['vpc'] = None if vpc_missing else vpc.myvpc_id
+        # Security groups are looked up in the stack's VPC.
+        ids['alb_sg'] = None if vpc_missing or vpc.check_alb_security_group(self.name + 'AlbSG') else vpc.group_id
+        ids['asg_sg'] = None if vpc_missing or vpc.check_asg_security_group(self.name + 'AsgSG') else vpc.asg_sgid
+        ids['endpoint_sg'] = None if vpc_missing or vpc.check_endpoint_security_group(self.name + 'EndpointSG') else vpc.endpoint_sgid
+        for endpoint in self.vpc_endpoints():
+            ids[endpoint['step']] = None if vpc_missing or vpc.check_vpc_endpoint(endpoint['service'], self.named_tags(endpoint['suffix'])) else vpc.endpoint_id
+        for i, _ in enumerate(self.spec['public_subnets'], 1):
+            ids[f'pub_sub_{i}'] = None if vpc_missing or vpc.check_public_subnet(self.named_tags(f'PublicSubnet{i}')) else vpc.pub_subnet_id
+        for i, _ in enumerate(self.spec['private_subnets'], 1):
+            ids[f'pvt_sub_{i}'] = None if vpc_missing or vpc.check_private_subnet(self.named_tags(f'PrivateSubnet{i}')) else vpc.pvt_subnet_id
+        return ids
+
+    def build_teardown(self, network: dict, max_workers: int = 8) -> Dag:
+        """This method declares every deletion step of the stack, in the reverse order of provisioning.
+
+        The provisioning graph is reversed, so a resource is deleted once everything that was
+        built on it is gone, and independent resources are deleted concurrently. VPC resources
+        missing from network are skipped; the other deletions skip what doesn't exist.
+
+        Args:
+            network (dict): Ids of the VPC resources, see locate_network.
+            max_workers (int): Maximum number of deletions to run at the same time.
+
+        Returns:
+            Dag: The graph of deletion steps.
+        """
+        name = self.name
+        deletions = {
+            'vpc': self.vpc.delete_virtual_private_cloud,
+            'igw': self.vpc.delete_internet_gateway,
+            'public_rt': self.vpc.delete_route_table,
+            'alb_sg': self.vpc.delete_security_group,
+            'asg_sg': self.vpc.delete_security_group,
+            'endpoint_sg': self.vpc.delete_security_group,
+            'sqs': lambda: self.sqs.delete_sqs_queue(name + "SQS"),
+            'elb': lambda: self.elb.delete_elb(name + "ALB", name + "TG", elb_spec(self.spec.get('elb'), name)),
+            'instance_profile': lambda: self.iam.delete_instance_profile(name + "IP", name + "Role"),
+            'key': lambda: self.ec2.delete_key(name + "Key", self.key_path),
+            'launch_template': lambda: self.ec2.delete_launch_template(name + "LT"),
+            'asg': lambda: self.asg.delete_asg(name + "ASG"),
+            'policy': lambda: self.iam.delete_iam_policy(name + "Policy"),
+            # Scaling policies are deleted with the autoscaling group.
+            'scaling': lambda: None,
+        }
+        for route in self.private_routes():
+            deletions[route['nat']] = self.vpc.delete_nat_gateway
+            deletions[route['private_rt']] = self.vpc.delete_route_table
+        for endpoint in self.vpc_endpoints():
+            deletions[endpoint['step']] = self.vpc.delete_vpc_endpoint
+        # A group can't be deleted while another group lets it in, so every rule is revoked first.
+        groups = {kind: network[step] for kind, step in self.security_groups().items() if network.get(step)}
+        deletions['sg_rules'] = lambda: self.vpc.reconcile_security_groups(groups, {kind: [] for kind in groups}) if groups else None
+
+        forward = self.build()
+        dependents = {step: [] for step in forward.nodes}
+        for step, (_, inputs) in forward.nodes.items():
+            for dep in inputs:
+                dependents[dep].append(step)
+
+        dag = Dag(max_workers)
+        for step in forward.nodes:
+            if step in network:
+                delete = deletions.get(step, self.vpc.delete_subnet)
+                func = lambda *_, delete=delete, resource_id=network[step]: delete(resource_id) if resource_id else None
+            else:
+                func = lambda *_, delete=deletions[step]: delete()
+            dag.add_node(step, func, dependents[step])
+
+        self.dag = dag
+        return dag
+
+    def prune_endpoints(self) -> list:
+        """This method deletes the VPC endpoints of the stack whose service was dropped from the spec.
+
+        Returns:
+            list: Ids of the deleted endpoints.
+        """
+        services = [endpoint['service'] for endpoint in self.vpc_endpoints()]
+        stale = [endpoint['VpcEndpointId'] for endpoint in self.vpc.stale_vpc_endpoints(self.name + 'Endpoint', services)]
+        for endpoint_id in stale:
+            self.vpc.delete_vpc_endpoint(endpoint_id)
+        return stale
+
+    def destroy(self, max_workers: int = 8) -> dict:
+        """This method deletes every resource of the stack, see build_teardown.
+
+        Resources that don't exist are skipped, so a partial teardown can be run again.
+
+        Args:
+            max_workers (int): Maximum number of deletions to run at the same time.
+
+        Returns:
+            dict: Result of every deletion step, keyed by step name.
+        """
+        network = self.locate_network()
+        if network['vpc'] is not None:
+            self.prune_endpoints()
+        results = self.build_teardown(network, max_workers).run()
+        if self.state is not None:
+            self.state.delete(self.name)
+        self.resources = None
+        return results
+
+    def verify(self) -> bool:
+        """This method checks that the recorded stack is complete, matches the spec and still exists.
+
+        Existence is checked with one call per service instead of the per-step check paths: one
+        describe_tags for every EC2 resource, one describe_security_group_rules for the rules of
+        every security group, then the target group, the autoscaling group, the instance profile
+        with its role policies, and the queue. What doesn't match is listed in self.drift.
+
+        Returns:
+            bool: True if nothing needs to be provisioned, else False.
+        """
+        self.drift = []
+        if self.state is None:
+            self.drift.append('no state')
+            return False
+
+        recorded = self.state.load(self.name)
+        if not recorded:
+            self.drift.append('nothing recorded')
+            return False
+        digest = spec_hash(self.spec)
+        steps = list(self.build().nodes)
+        for step in steps:
+            if step not in recorded or recorded[step][0] is None:
+                self.drift.append(f'{step} not recorded')
+            elif recorded[step][1] != digest:
+                self.drift.append(f'{step} spec changed')
+        if self.drift:
+            return False
+        ids = {step: recorded[step][0] for step in steps}
+
+        ec2_ids = [ids[step] for step in steps if step not in self.NON_EC2_STEPS]
+        found = set()
+        for i in range(0, len(ec2_ids), 200):
+            for tag in paginate(self.ec2.ec2_client, 'describe_tags', 'Tags', Filters=[{'Name': 'resource-id', 'Values': ec2_ids[i:i + 200]}]):
+                found.add(tag['ResourceId'])
+        for step in steps:
+            if step not in self.NON_EC2_STEPS and ids[step] not in found:
+                self.drift.append(f'{step} {ids[step]} is gone')
+
+        groups = {kind: ids[step] for kind, step in self.security_groups().items()}
+        if all(group_id in found for group_id in groups.values()):
+            rules = security_group_spec(self.spec.get('security_groups'))
+            live = self.vpc.read_security_group_rules(list(groups.values()))
+            for kind, group_id in groups.items():
+                authorize, revoke = security_group_rule_changes(rule_permissions(rules[kind], groups), live[group_id])
+                if authorize or revoke:
+                    self.drift.append(f'sg_rules of {group_id} changed')
+
+        elbv2_client = self.elb.elbv2_client
+        try:
+            tg = elbv2_client.describe_target_groups(TargetGroupArns=[ids['elb']])['TargetGroups'][0]
+            if not tg['LoadBalancerArns']:
+                self.drift.append(f"elb {ids['elb']} has no load balancer")
+        except elbv2_client.exceptions.TargetGroupNotFoundException:
+            self.drift.append(f"elb {ids['elb']} is gone")
+
+        asgs = self.asg.as_client.describe_auto_scaling_groups(AutoScalingGroupNames=[self.name + 'ASG'])['AutoScalingGroups']
+        if not asgs or asgs[0]['AutoScalingGroupARN'] != ids['asg']:
+            self.drift.append(f"asg {ids['asg']} is gone")
+        elif 'scaling' in ids:
+            policies = {policy['PolicyName'] for policy in paginate(self.asg.as_client, 'describe_policies', 'ScalingPolicies', AutoScalingGroupName=self.name + 'ASG')}
+            for policy_name in policy_names(self.name + 'ASG', asg_spec(self.spec.get('asg'))):
+                if policy_name not in policies:
+                    self.drift.append(f"scaling policy {policy_name} is gone")
+
+        if self.inventory is not None:
+            self._verify_iam(ids)
+        else:
+            self._verify_iam_calls(ids)
+
+        sqs_client = self.sqs.sqs_resource.meta.client
+        try:
+            if sqs_client.get_queue_url(QueueName=self.name + 'SQS')['QueueUrl'] != ids['sqs']:
+                self.drift.append(f"sqs {ids['sqs']} was replaced")
+        except sqs_client.exceptions.QueueDoesNotExist:
+            self.drift.append(f"sqs {ids['sqs']} is gone")
+
+        if self.drift:
+            return False
+        self.resources = ids
+        return True
+
+    def _verify_iam(self, ids: dict) -> None:
+        """This method checks the recorded instance profile and policy against the inventory.
+
+        Roles and policies of the whole account come from one get_account_authorization_details
+        pass shared by every stack, so a fleet's IAM is verified with a few calls.
+
+        Args:
+            ids (dict): Recorded resource ids, see verify.
+        """
+        roles = self.inventory.find('roles', name=self.name + 'Role')
+        profiles = [ip for role in roles for ip in role['InstanceProfileList'] if ip['InstanceProfileName'] == self.name + 'IP']
+        if not profiles:
+            self.drift.append(f"instance_profile {ids['instance_profile']} is gone")
+            return
+        if profiles[0]['InstanceProfileId'] != ids['instance_profile']:
+            self.drift.append(f"instance_profile {ids['instance_profile']} was replaced")
+        if ids['policy'] not in [policy['PolicyArn'] for policy in roles[0]['AttachedManagedPolicies']]:
+            self.drift.append(f"policy {ids['policy']} is detached")
+        for policy in self.inventory.find('policies', name=self.name + 'Policy'):
+            if document_hash(default_document(policy)) != document_hash(policy_document(self.spec.get('iam'))):
+                self.drift.append(f"policy {ids['policy']} document changed")
+
+    def _verify_iam_calls(self, ids: dict) -> None:
+        """This method checks the recorded instance profile and policy with direct calls, see _verify_iam.
+
+        Args:
+            ids (dict): Recorded resource ids, see verify.
+        """
+        iam_client = self.iam.iam_client
+        try:
+            ip = iam_client.get_instance_profile(InstanceProfileName=self.name + 'IP')['InstanceProfile']
+            if ip['InstanceProfileId'] != ids['instance_profile']:
+                self.drift.append(f"instance_profile {ids['instance_profile']} was replaced")
+            policies = [
+                policy['PolicyArn'] for role in ip['Roles']
+                for policy in paginate(iam_client, 'list_attached_role_policies', 'AttachedPolicies', RoleName=role['RoleName'])
+            ]
+            if ids['policy'] not in policies:
+                self.drift.append(f"policy {ids['policy']} is detached")
+        except iam_client.exceptions.NoSuchEntityException:
+            self.drift.append(f"instance_profile {ids['instance_profile']} is gone")
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def spec_hash(spec) -> str:
+    """This function hashes a spec, so a change to any of its values can be detected.
+
+    Args:
+        spec : JSON serializable spec.
+
+    Returns:
+        str: Hex digest of the spec.
+    """
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class State:
+    def __init__(self, path: str = 'qube_state.db') -> None:
+        """Class that represents the local record of every resource the project created.
+
+        Each stack step is stored with the id or ARN of its resource and the hash of the spec it
+        was created from, in a SQLite file that survives between runs.
+
+        Args:
+            path (str): Path of the SQLite file. It is created if it doesn't exist.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS resources ('
+                'stack TEXT NOT NULL, step TEXT NOT NULL, resource_id TEXT, spec_hash TEXT NOT NULL, '
+                'updated REAL NOT NULL, PRIMARY KEY (stack, step))'
+            )
+
+    def load(self, stack: str) -> dict:
+        """This method reads what was recorded for a stack.
+
+        Args:
+            stack (str): Name of the stack.
+
+        Returns:
+            dict: (resource id, spec hash) of every recorded step, keyed by step name.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT step, resource_id, spec_hash FROM resources WHERE stack = ?', (stack,)
+            ).fetchall()
+        return {step: (resource_id, digest) for step, resource_id, digest in rows}
+
+    def save(self, stack: str, resources: dict, digest: str) -> None:
+        """This method replaces what is recorded for a stack.
+
+        Args:
+            stack (str): Name of the stack.
+            resources (dict): Resource id of every step, keyed by step name.
+            digest (str): Hash of the spec the resources were created from.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM resources WHERE stack = ?', (stack,))
+            self.connection.executemany(
+                'INSERT INTO resources (stack, step, resource_id, spec_hash, updated) VALUES (?, ?, ?, ?, ?)',
+                [(stack, step, resource_id, digest, now) for step, resource_id in resources.items()]
+            )
+
+    def delete(self, stack: str) -> None:
+        """This method forgets everything recorded for a stack.
+
+        Args:
+            stack (str): Name of the stack.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM resources WHERE stack = ?', (stack,))
+
+    def stacks(self) -> list:
+        """This method lists the stacks that have a record.
+
+        Returns:
+            list: Stack names.
+        """
+        with self.lock:
+            return [row[0] for row in self.connection.execute('SELECT DISTINCT stack FROM resources ORDER BY stack')]
@@ -0,0 +1,208 @@
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+from RateLimiter import RateLimiter
+
+# Modules whose frames are plumbing, not the code that decided to make a call.
+PLUMBING = {'Tracer.py', 'RateLimiter.py', 'Paginator.py', 'Clients.py'}
+
+
+class Tracer:
+    def __init__(self, service_name: str = 'qube') -> None:
+        """Class that represents a trace of every API call made during a run.
+
+        Each call becomes a span with its latency, attempts, throttles and request and response
+        sizes, tagged with the project method that issued it (e.g. Vpc.create_public_subnet) and
+        with the current phase. Phases are spans too, and every call span is a child of its phase.
+
+        Args:
+            service_name (str): Name of the traced service in the exported spans.
+        """
+        self.service_name = service_name
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self.lock = threading.Lock()
+        self.current_phase = None
+        self.root = os.path.dirname(os.path.abspath(__file__))
+
+    def attach(self, session) -> None:
+        """This method traces every call of the clients the session builds from now on.
+
+        Args:
+            session : boto3, botocore or aiobotocore session.
+        """
+        events = getattr(session, 'events', None) or session.get_component('event_emitter')
+        events.register('before-call', self._before_call, unique_id='qube-tracer-before-call')
+        events.register('needs-retry', self._needs_retry, unique_id='qube-tracer-needs-retry')
+        events.register('after-call', self._after_call, unique_id='qube-tracer-after-call')
+        events.register('after-call-error', self._after_call_error, unique_id='qube-tracer-after-call-error')
+
+    @contextmanager
+    def phase(self, name: str):
+        """This context manager groups the calls made inside it under a phase span.
+
+        Args:
+            name (str): Name of the phase, e.g. 'provision'.
+        """
+        span = self._span(name, 'phase', None)
+        previous, self.current_phase = self.current_phase, span
+        try:
+            yield span
+        finally:
+            self.current_phase = previous
+            span['end'] = time.time_ns()
+            with self.lock:
+                self.spans.append(span)
+
+    def _span(self, name: str, kind: str, parent) -> dict:
+        return {
+            'name': name, 'kind': kind, 'span_id': secrets.token_hex(8),
+            'parent_id': parent['span_id'] if parent else None,
+            'start': time.time_ns(), 'end': None, 'attributes': {}, 'error': None,
+        }
+
+    def _caller(self) -> str:
+        # The first project frame that isn't a private helper names the call, e.g. a call made
+        # by Vpc._find_subnet on behalf of Vpc.create_public_subnet is tagged with the latter.
+        frame = sys._getframe(2)
+        first = None
+        while frame is not None:
+            path = frame.f_code.co_filename
+            if os.path.dirname(os.path.abspath(path)) == self.root and os.path.basename(path) not in PLUMBING:
+                owner = frame.f_locals.get('self')
+                name = frame.f_code.co_name
+                if owner is not None:
+                    name = f'{type(owner).__name__}.{name}'
+                if first is None:
+                    first = name
+                if not frame.f_code.co_name.startswith(('_', '<')):
+                    return name
+            frame = frame.f_back
+        return first or 'unknown'
+
+    def _before_call(self, model, params, context, **kwargs) -> None:
+        span = self._span(f'{model.service_model.service_name}.{model.name}', 'call', self.current_phase)
+        span['attributes'] = {
+            'aws.service': model.service_model.service_name,
+            'aws.operation': model.name,
+            'qube.caller': self._caller(),
+            'qube.phase': self.current_phase['name'] if self.current_phase else None,
+            'qube.attempts': 0,
+            'qube.throttles': 0,
+            'qube.request_bytes': 0,
+            'qube.response_bytes': 0,
+        }
+        context['qube_trace_span'] = span
+
+    def _needs_retry(self, request_dict, attempts, response=None, **kwargs) -> None:
+        span = request_dict.get('context', {}).get('qube_trace_span')
+        if span is None:
+            return
+        attributes = span['attributes']
+        attributes['qube.attempts'] = attempts
+        body = request_dict.get('body') or b''
+        attributes['qube.request_bytes'] += len(urlencode(body, doseq=True)) if isinstance(body, dict) else len(body)
+        if response is not None and response[1].get('Error', {}).get('Code') in RateLimiter.THROTTLE_CODES:
+            attributes['qube.throttles'] += 1
+
+    def _after_call(self, http_response, parsed, context, **kwargs) -> None:
+        span = context.get('qube_trace_span')
+        if span is None:
+            return
+        # The body was already read to parse it, so its size is known even without a content-length.
+        length = http_response.headers.get('content-length')
+        if length is None:
+            length = len(getattr(http_response, '_content', None) or b'')
+        span['attributes']['qube.response_bytes'] = int(length)
+        span['attributes']['http.status_code'] = http_response.status_code
+        if http_response.status_code >= 300:
+            span['error'] = parsed.get('Error', {}).get('Code', str(http_response.status_code))
+        self._finish(span)
+
+    def _after_call_error(self, exception, context, **kwargs) -> None:
+        span = context.get('qube_trace_span')
+        if span is None:
+            return
+        span['error'] = f'{type(exception).__name__}: {exception}'
+        self._finish(span)
+
+    def _finish(self, span: dict) -> None:
+        span['end'] = time.time_ns()
+        with self.lock:
+            self.spans.append(span)
+
+    def calls(self) -> list:
+        """This method lists the finished call spans.
+
+        Returns:
+            list: The call spans, in the order they finished.
+        """
+        with self.lock:
+            return [span for span in self.spans if span['kind'] == 'call']
+
+    def summary(self) -> list:
+        """This method aggregates the calls per issuing method and operation, slowest total first.
+
+        Returns:
+            list: Rows with 'caller', 'operation', 'calls', 'seconds', 'max_ms', 'retries',
+                'throttles', 'errors', 'bytes_out' and 'bytes_in'.
+        """
+        rows = {}
+        for span in self.calls():
+            attributes = span['attributes']
+            key = (attributes['qube.caller'], span['name'])
+            row = rows.setdefault(key, {
+                'caller': key[0], 'operation': key[1], 'calls': 0, 'seconds': 0.0, 'max_ms': 0.0,
+                'retries': 0, 'throttles': 0, 'errors': 0, 'bytes_out': 0, 'bytes_in': 0,
+            })
+            seconds = (span['end'] - span['start']) / 1e9
+            row['calls'] += 1
+            row['seconds'] += seconds
+            row['max_ms'] = max(row['max_ms'], round(seconds * 1000, 1))
+            row['retries'] += max(0, attributes['qube.attempts'] - 1)
+            row['throttles'] += attributes['qube.throttles']
+            row['errors'] += span['error'] is not None
+            row['bytes_out'] += attributes['qube.request_bytes']
+            row['bytes_in'] += attributes['qube.response_bytes']
+        for row in rows.values():
+            row['seconds'] = round(row['seconds'], 3)
+        return sorted(rows.values(), key=lambda row: row['seconds'], reverse=True)
+
+    def export(self, path: str) -> None:
+        """This method writes the spans as OTLP JSON, which OpenTelemetry collectors can ingest.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+        with self.lock:
+            spans = list(self.spans)
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                'traceId': self.trace_id,
+                'spanId': span['span_id'],
+                'name': span['name'],
+                'kind': 3 if span['kind'] == 'call' else 1,
+                'startTimeUnixNano': str(span['start']),
+                'endTimeUnixNano': str(span['end']),
+                'attributes': [
+                    {'key': key, 'value': {'intValue': str(value)} if isinstance(value, int) else {'stringValue': str(value)}}
+                    for key, value in span['attributes'].items() if value is not None
+                ],
+                'status': {'code': 2, 'message': span['error']} if span['error'] else {'code': 1},
+            }
+            if span['parent_id']:
+                otlp_span['parentSpanId'] = span['parent_id']
+            otlp_spans.append(otlp_span)
+
+        document = {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'qube.tracer'}, 'spans': otlp_spans}],
+        }]}
+        with open(path, 'w') as trace_file:
+            json.dump(document, trace_file, indent=1)
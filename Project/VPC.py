@@ -1,13 +1,252 @@
+import ipaddress
+import string
+import time
+from botocore.exceptions import ClientError
+from Paginator import paginate
+
+# Most resource ids a single create_tags call accepts.
+TAG_BATCH = 1000
+
+# Inventory resource types whose tags tag_resources can change.
+TAGGED_KINDS = ('vpcs', 'internet_gateways', 'route_tables', 'subnets', 'nat_gateways', 'security_groups', 'vpc_endpoints')
+
+# Services every stack reaches through VPC endpoints instead of its NAT gateways, unless the
+# spec has an 'endpoints' key.
+ENDPOINTS = ['s3', 'sqs', 'kms', 'ec2messages']
+
+# Services whose endpoint is a gateway, i.e. a route in the private route tables. Every other
+# service gets an interface endpoint, a network interface in one private subnet per zone.
+GATEWAY_ENDPOINTS = ('s3', 'dynamodb')
+
+# States of an endpoint that is gone, or going.
+ENDPOINT_GONE = ('deleting', 'deleted', 'failed', 'rejected', 'expired')
+
+# Ingress rules of the stack's security groups, keyed by group: 'alb' for the load balancer, 'asg'
+# for the instances and 'endpoint' for the interface endpoints. A spec's 'security_groups' key
+# replaces the rules of the groups it names; the rules of each group are a list of dicts with the
+# keys of SECURITY_GROUP_RULE.
+SECURITY_GROUPS_SPEC = {
+    'alb': [{'port': 80, 'cidrs': ['0.0.0.0/0']}],
+    'asg': [{'port': 80, 'groups': ['alb']}],
+    'endpoint': [{'port': 443, 'groups': ['asg']}],
+}
+
+SECURITY_GROUP_RULE = {
+    # IP protocol, e.g. 'tcp', 'udp' or 'icmp', or '-1' for every protocol and port.
+    'protocol': 'tcp',
+    # First port of the range, and its last one, the first port by default.
+    'port': None,
+    'to_port': None,
+    # IPv4 CIDR blocks allowed in.
+    'cidrs': [],
+    # Security groups of the stack allowed in, by their key in SECURITY_GROUPS_SPEC.
+    'groups': [],
+}
+
+# Most ids a single describe filter accepts.
+FILTER_BATCH = 200
+
+# Layout of a stack whose spec has a 'topology' key. Every zone gets a public subnet with a NAT
+# gateway, and a private subnet whose route table goes through the NAT gateway of its own zone.
+TOPOLOGY_SPEC = {
+    # Number of availability zones. The load balancer needs at least two.
+    'azs': 2,
+    # Zones to spread over, in order. Defaults to the zones a, b, c, ... of the region.
+    'zones': None,
+    # Prefix length of every subnet.
+    'prefix': 24,
+}
+
+
+def topology_spec(spec: dict = None) -> dict:
+    """This function fills in the settings of a multi-AZ topology missing from a spec.
+
+    Args:
+        spec (dict): The 'topology' key of a stack spec, see TOPOLOGY_SPEC.
+
+    Returns:
+        dict: Every key of TOPOLOGY_SPEC.
+    """
+    return dict(TOPOLOGY_SPEC, **(spec or {}))
+
+
+def carve_subnets(cidr: str, spec: dict, region: str) -> dict:
+    """This function allocates the subnets of a multi-AZ topology from the CIDR of the VPC.
+
+    Public subnets are carved from the first half of the VPC and private subnets from the
+    second, one per zone in the order of the zones, so they never overlap and adding a zone
+    leaves the subnets of the other zones where they are.
+
+    Args:
+        cidr (str): CIDR block of the VPC.
+        spec (dict): Settings of the topology, see TOPOLOGY_SPEC.
+        region (str): Region of the VPC, whose zones are used when the spec names none.
+
+    Raises:
+        ValueError: If the spec asks for fewer than two zones, more zones than it names, or
+            more subnets than the VPC can hold.
+
+    Returns:
+        dict: 'public_subnets' and 'private_subnets', lists of {'cidr', 'az'} as in a stack spec.
+    """
+    spec = topology_spec(spec)
+    azs = spec['azs']
+    zones = spec['zones'] or [region + letter for letter in string.ascii_lowercase]
+    if azs < 2:
+        raise ValueError("A topology needs at least two availability zones for the load balancer")
+    if azs > len(zones):
+        raise ValueError(f"A topology of {azs} availability zones names only {len(zones)} zones")
+
+    network = ipaddress.ip_network(cidr)
+    if spec['prefix'] <= network.prefixlen or 2 ** (spec['prefix'] - network.prefixlen - 1) < azs:
+        raise ValueError(f"{cidr} can't hold {azs} public and {azs} private /{spec['prefix']} subnets")
+    public, private = network.subnets(prefixlen_diff=1)
+    return {
+        'public_subnets': [{'cidr': str(subnet), 'az': az} for subnet, az in zip(public.subnets(new_prefix=spec['prefix']), zones[:azs])],
+        'private_subnets': [{'cidr': str(subnet), 'az': az} for subnet, az in zip(private.subnets(new_prefix=spec['prefix']), zones[:azs])],
+    }
+
+
+def endpoint_service_name(service: str, region: str) -> str:
+    """This function builds the name of the endpoint service of an AWS service.
+
+    Args:
+        service (str): Short name of the service, e.g. 'sqs'.
+        region (str): Region of the VPC.
+
+    Returns:
+        str: The service name, e.g. com.amazonaws.ap-south-1.sqs.
+    """
+    return f'com.amazonaws.{region}.{service}'
+
+
+def endpoint_changes(live: dict, route_table_ids: list = None, subnet_ids: list = None, sg_id: str = None) -> dict:
+    """This function compares an existing VPC endpoint with the route tables or subnets it should have.
+
+    Args:
+        live (dict): The endpoint, as described by describe_vpc_endpoints.
+        route_table_ids (list): Route tables of a gateway endpoint.
+        subnet_ids (list): Subnets of an interface endpoint.
+        sg_id (str): Security group of an interface endpoint.
+
+    Returns:
+        dict: Parameters of modify_vpc_endpoint that bring the endpoint in line, empty if it is.
+    """
+    changes = {}
+    wanted = {
+        'RouteTableIds': route_table_ids if live['VpcEndpointType'] == 'Gateway' else None,
+        'SubnetIds': subnet_ids if live['VpcEndpointType'] == 'Interface' else None,
+        'SecurityGroupIds': [sg_id] if live['VpcEndpointType'] == 'Interface' and sg_id else None,
+    }
+    for key, ids in wanted.items():
+        if ids is None:
+            continue
+        if key == 'SecurityGroupIds':
+            current = {group['GroupId'] for group in live.get('Groups', [])}
+        else:
+            current = set(live.get(key, []))
+        add, remove = sorted(set(ids) - current), sorted(current - set(ids))
+        if add:
+            changes['Add' + key] = add
+        if remove:
+            changes['Remove' + key] = remove
+    if live['VpcEndpointType'] == 'Interface' and not live.get('PrivateDnsEnabled'):
+        changes['PrivateDnsEnabled'] = True
+    return changes
+
+
+def security_group_spec(spec: dict = None) -> dict:
+    """This function fills in the security group rules missing from a spec.
+
+    Args:
+        spec (dict): The 'security_groups' key of a stack spec, see SECURITY_GROUPS_SPEC.
+
+    Returns:
+        dict: The rules of every group, each with every key of SECURITY_GROUP_RULE.
+
+    Raises:
+        ValueError: If the spec names a group the stack doesn't have.
+    """
+    spec = dict(SECURITY_GROUPS_SPEC, **(spec or {}))
+    unknown = set(spec) - set(SECURITY_GROUPS_SPEC)
+    if unknown:
+        raise ValueError(f"Unknown security groups {sorted(unknown)}, expected some of {list(SECURITY_GROUPS_SPEC)}")
+    return {kind: [dict(SECURITY_GROUP_RULE, **rule) for rule in rules] for kind, rules in spec.items()}
+
+
+def rule_permissions(rules: list, group_ids: dict) -> set:
+    """This function flattens the rules of a group into one permission per protocol, port range and source.
+
+    Args:
+        rules (list): Rules of the group, see security_group_spec.
+        group_ids (dict): Id of every security group of the stack, keyed as in SECURITY_GROUPS_SPEC.
+
+    Returns:
+        set: (protocol, from port, to port, CIDR block or group id) tuples.
+
+    Raises:
+        ValueError: If a rule lets in a group the stack doesn't have.
+    """
+    permissions = set()
+    for rule in rules:
+        protocol = str(rule['protocol']).lower()
+        if protocol in ('-1', 'all'):
+            protocol, from_port, to_port = '-1', -1, -1
+        else:
+            from_port = rule['port']
+            to_port = from_port if rule['to_port'] is None else rule['to_port']
+        for cidr in rule['cidrs']:
+            permissions.add((protocol, from_port, to_port, cidr))
+        for kind in rule['groups']:
+            if kind not in group_ids:
+                raise ValueError(f"Security group rule lets in {kind}, which the stack doesn't have")
+            permissions.add((protocol, from_port, to_port, group_ids[kind]))
+    return permissions
+
+
+def security_group_rule_changes(permissions: set, live: list) -> tuple:
+    """This function diffs the ingress permissions a group should have against its live rules.
+
+    Args:
+        permissions (set): Permissions the group should have, see rule_permissions.
+        live (list): Rules of the group, as described by describe_security_group_rules.
+
+    Returns:
+        tuple: The IpPermissions to authorize, and the ids of the rules to revoke.
+    """
+    current = {}
+    for rule in live:
+        if rule['IsEgress']:
+            continue
+        source = rule.get('CidrIpv4') or rule.get('ReferencedGroupInfo', {}).get('GroupId') or rule.get('CidrIpv6') or rule.get('PrefixListId')
+        current[(rule['IpProtocol'], rule.get('FromPort', -1), rule.get('ToPort', -1), source)] = rule['SecurityGroupRuleId']
+
+    authorize = []
+    for protocol, from_port, to_port, source in sorted(permissions - current.keys()):
+        permission = {'IpProtocol': protocol, 'FromPort': from_port, 'ToPort': to_port}
+        if source.startswith('sg-'):
+            permission['UserIdGroupPairs'] = [{'GroupId': source}]
+        else:
+            permission['IpRanges'] = [{'CidrIp': source}]
+        authorize.append(permission)
+    revoke = sorted(rule_id for key, rule_id in current.items() if key not in permissions)
+    return authorize, revoke
+
+
 class Vpc:
-    def __init__(self, ec2_resource, ec2_client):
+    def __init__(self, ec2_resource, ec2_client, inventory=None, wait_manager=None):
         """ Class that represents Amazon VPC service
 
         Args:
             ec2_resource : EC2 resource to create, manage and configure AWS EC2 service at high level
             ec2_client : EC2 client to create, manage and configure AWS EC2 service at low level
+            inventory (Inventory): Optional snapshot to serve existence checks from.
+            wait_manager (WaitManager): Optional shared poller to wait for the VPC and NAT gateway with.
         """
         self.ec2_resource = ec2_resource 
         self.ec2_client = ec2_client
+        self.inventory = inventory
+        self.wait_manager = wait_manager
 
     def create_virtual_private_cloud(self, tags: list, cidr: str) -> str:
         """This method creates virtual private cloud with given tags and cidr range.
@@ -20,10 +259,13 @@ class Vpc:
             str: Returns the VPC id.
         """
         if self.check_virtual_private_cloud(tags, cidr):
-            self.myvpc = self.ec2_resource.create_vpc(CidrBlock=cidr)
-            self.myvpc.create_tags(Tags=tags)
-            self.myvpc.wait_until_available()
+            self.myvpc = self.ec2_resource.create_vpc(CidrBlock=cidr, TagSpecifications=[{'ResourceType': 'vpc', 'Tags': tags},])
+            if self.wait_manager is not None:
+                self.wait_manager.wait('vpc', self.ec2_client, self.myvpc.id)
+            else:
+                self.myvpc.wait_until_available()
             self.myvpc_id = self.myvpc.id
+            self._invalidate('vpcs')
             return self.myvpc_id
         else:
             return self.myvpc_id
@@ -38,26 +280,39 @@ class Vpc:
         Returns:
             bool: False if it exists. True if it doesn't. 
         """
-        for vpc in self.ec2_client.describe_vpcs()['Vpcs']:
+        if self.inventory is not None:
+            vpcs = self.inventory.find('vpcs', tags=tags[:2])
+        else:
+            vpcs = paginate(
+                self.ec2_client, 'describe_vpcs', 'Vpcs',
+                Filters=[{'Name': 'cidr', 'Values': [cidr]}] + self._tag_filters(tags[:2])
+            )
+        for vpc in vpcs:
             if cidr == vpc['CidrBlock'] and tags[0] in vpc['Tags'] and tags[1] in vpc['Tags']:
                 self.myvpc_id = vpc['VpcId']
                 return False
         else:
             return True
 
-    def create_and_attach_internet_gateway(self, tags: list) -> None:
+    def create_and_attach_internet_gateway(self, tags: list) -> str:
         """This method creates and attaches an internet gateway with the vpc created.
 
         Args:
             tags (list): tags to add to an internet gateway.
+
+        Returns:
+            str: Return the internet gateway id.
         """
         if self.check_internet_gateway(tags):
-            self.igw = self.ec2_resource.create_internet_gateway()
-            self.igw.create_tags(Tags=tags)
+            self.igw = self.ec2_resource.create_internet_gateway(TagSpecifications=[{'ResourceType': 'internet-gateway', 'Tags': tags},])
             self.igw_id = self.igw.id
+            self._invalidate('internet_gateways')
 
         if self.check_igw_attached_to_vpc():
             self.ec2_client.attach_internet_gateway(InternetGatewayId=self.igw_id, VpcId=self.myvpc_id)
+            self._invalidate('internet_gateways')
+
+        return self.igw_id
 
     def check_internet_gateway(self, tags: list) -> bool:
         """This method checks if an internet gateway exists with the given tags.
@@ -65,7 +320,11 @@ class Vpc:
         Args:
             tags (list): tags to find if the internet gateway exists with the same tags.
         """
-        for igw in self.ec2_client.describe_internet_gateways()['InternetGateways']:
+        if self.inventory is not None:
+            igws = self.inventory.find('internet_gateways', tags=tags[:2])
+        else:
+            igws = paginate(self.ec2_client, 'describe_internet_gateways', 'InternetGateways', Filters=self._tag_filters(tags[:2]))
+        for igw in igws:
             if tags[0] in igw['Tags'] and tags[1] in igw['Tags']:
                 self.igw_id = igw['InternetGatewayId']
                 return False
@@ -78,7 +337,11 @@ class Vpc:
         Returns:
             bool: False if internet gateway is attached to vpc, else True.
         """
-        for igw in self.ec2_client.describe_internet_gateways()['InternetGateways']:
+        if self.inventory is not None:
+            igws = [self.inventory.get_by_id('internet_gateways', self.igw_id) or {'InternetGatewayId': None}]
+        else:
+            igws = paginate(self.ec2_client, 'describe_internet_gateways', 'InternetGateways', InternetGatewayIds=[self.igw_id])
+        for igw in igws:
             if self.igw_id == igw['InternetGatewayId']:
                 if igw['Attachments'] == []:
                     return True
@@ -87,20 +350,25 @@ class Vpc:
         else:
             return False
                 
-    def create_public_route_table(self, tags: list) -> None:
+    def create_public_route_table(self, tags: list) -> str:
         """This method creates public route table.
 
         Args:
             tags (list): Tags to add to the public route table
+
+        Returns:
+            str: Return the public route table id.
         """
         if self.check_public_route_table(tags):
-            self.public_rt = self.ec2_resource.create_route_table(VpcId=self.myvpc_id)
-            self.public_rt.create_tags(Tags=tags)
+            self.public_rt = self.ec2_resource.create_route_table(VpcId=self.myvpc_id, TagSpecifications=[{'ResourceType': 'route-table', 'Tags': tags},])
             self.public_rt_id = self.public_rt.id
             self.public_rt.create_route(
                 DestinationCidrBlock='0.0.0.0/0',
                 GatewayId=self.igw_id
             )
+            self._invalidate('route_tables')
+
+        return self.public_rt_id
 
     def check_public_route_table(self, tags: list) -> bool:
         """This method checks whether public route table is created or not.
@@ -111,12 +379,11 @@ class Vpc:
         Returns:
             bool: False if public route table exists, else True.
         """
-        for prt in self.ec2_client.describe_route_tables()['RouteTables']:
-            if tags[0] in prt['Tags'] and tags[1] in prt['Tags']:
-                self.public_rt_id = prt['RouteTableId']
-                return False
-        else:
+        rt_id = self._find_route_table(tags)
+        if rt_id is None:
             return True
+        self.public_rt_id = rt_id
+        return False
         
     def create_public_subnet(self, cidr: str, availability_zone: str, tags: list) -> str:
         """This method creates public subnet.
@@ -130,13 +397,16 @@ class Vpc:
             str: Return the public subnet id.
         """
 
-        if self.check_public_subnet(tags):
-            self.public_subnet = self.ec2_resource.create_subnet(CidrBlock=cidr, VpcId=self.myvpc_id,AvailabilityZone=availability_zone)
-            self.public_subnet.create_tags(Tags=tags)
-            self.ec2_client.associate_route_table(RouteTableId=self.public_rt_id, SubnetId=self.public_subnet.id)
-            self.pub_subnet_id = self.public_subnet.id
+        subnet_id = self._find_subnet(tags)
+        if subnet_id is None:
+            public_subnet = self.ec2_resource.create_subnet(CidrBlock=cidr, VpcId=self.myvpc_id,AvailabilityZone=availability_zone,
+                                                            TagSpecifications=[{'ResourceType': 'subnet', 'Tags': tags},])
+            self.ec2_client.associate_route_table(RouteTableId=self.public_rt_id, SubnetId=public_subnet.id)
+            subnet_id = public_subnet.id
+            self._invalidate('subnets', 'route_tables')
 
-        return self.pub_subnet_id
+        self.pub_subnet_id = subnet_id
+        return subnet_id
 
     def check_public_subnet(self, tags: list) -> bool:
         """This method checks if public subnet exists.
@@ -149,66 +419,103 @@ class Vpc:
         Returns:
             bool: False if public subnet exists, else True.
         """
-        for pub_subnet in self.ec2_client.describe_subnets()['Subnets']:
-            if pub_subnet['VpcId'] == self.myvpc_id:
-                if tags[0] in pub_subnet['Tags'] and tags[1] in pub_subnet['Tags']:
-                    self.pub_subnet_id = pub_subnet['SubnetId']
-                    return False
-        else:
+        subnet_id = self._find_subnet(tags)
+        if subnet_id is None:
             return True
+        self.pub_subnet_id = subnet_id
+        return False
         
-    def create_nat_gateway(self, tags: list) -> None:
+    def create_nat_gateway(self, tags: list, name: str, subnet_id: str) -> str:
         """This method creates an NAT gateway.
 
+        The id is returned instead of being read back from the instance, so that the NAT gateways
+        of several zones can be created concurrently.
+
         Args:
             tags (list): tags to add to the nat gateway.
+            name (str): Name tag of the nat gateway.
+            subnet_id (str): Public subnet of the stack to create the nat gateway in.
+
+        Returns:
+            str: Return the nat gateway id.
         """
-        if self.check_nat_gateway(tags):
+        nat_gw_id = self._find_nat_gateway(tags, name)
+        if nat_gw_id is None:
             elastic_ip = self.ec2_client.allocate_address(Domain='vpc', TagSpecifications=[{'ResourceType': 'elastic-ip', 'Tags': tags},])
-            for pub_subnet in self.ec2_client.describe_subnets()['Subnets']:
-                if pub_subnet['VpcId'] == self.myvpc_id:
-                    if {'Key': 'Name', 'Value': 'QubePublicSubnet1'} in pub_subnet['Tags'] and {'Key': 'Product', 'Value': 'challenge'} in pub_subnet['Tags']:
-                        self.pub_sub1_id = pub_subnet['SubnetId']
-                        break
-            tags = tags + [{'Key': 'Name', 'Value': 'QubeNG'}]
-            self.nat_gw = self.ec2_client.create_nat_gateway(SubnetId=self.pub_sub1_id, AllocationId=elastic_ip['AllocationId'], TagSpecifications=[{'ResourceType': 'natgateway', 'Tags': tags},])
-            self.ec2_client.get_waiter('nat_gateway_available').wait(
-                NatGatewayIds=[self.nat_gw['NatGateway']['NatGatewayId']])
-            self.nat_gw_id = self.nat_gw['NatGateway']['NatGatewayId']
-
-    def check_nat_gateway(self, tags: list) -> bool:
+            self.pub_sub1_id = subnet_id
+            tags = [{'Key': 'Name', 'Value': name}] + tags
+            nat_gw = self.ec2_client.create_nat_gateway(SubnetId=subnet_id, AllocationId=elastic_ip['AllocationId'], TagSpecifications=[{'ResourceType': 'natgateway', 'Tags': tags},])
+            nat_gw_id = nat_gw['NatGateway']['NatGatewayId']
+            if self.wait_manager is not None:
+                self.wait_manager.wait('nat_gateway', self.ec2_client, nat_gw_id)
+            else:
+                self.ec2_client.get_waiter('nat_gateway_available').wait(NatGatewayIds=[nat_gw_id])
+            self._invalidate('nat_gateways')
+
+        self.nat_gw_id = nat_gw_id
+        return nat_gw_id
+
+    def check_nat_gateway(self, tags: list, name: str = 'QubeNG') -> bool:
         """This method checks if NAT gateway is already created.
 
         Args:
             tags (list): Tags to find if the NAT already created.
+            name (str): Name tag of the nat gateway.
 
         Returns:
             bool: False if NAT exists, else True.
         """
-        tags_to_find = []
-        tags_to_find = tags.copy()
-        tags_to_find = tags_to_find + [{'Key': 'Name', 'Value': 'QubeNG'}]
-        for ng in self.ec2_client.describe_nat_gateways()['NatGateways']:
-            if tags_to_find[0] in ng['Tags'] and tags_to_find[1] in ng['Tags']:
-                self.nat_gw_id = ng['NatGatewayId']
-                return False
-        else:
+        nat_gw_id = self._find_nat_gateway(tags, name)
+        if nat_gw_id is None:
             return True
+        self.nat_gw_id = nat_gw_id
+        return False
+
+    def _find_nat_gateway(self, tags: list, name: str) -> str:
+        """This method finds the live NAT gateway with the given name and tags.
+
+        Args:
+            tags (list): Tags of the NAT gateway.
+            name (str): Name tag of the NAT gateway.
+
+        Returns:
+            str: The NAT gateway id, or None if there is no such NAT gateway.
+        """
+        tags_to_find = [{'Key': 'Name', 'Value': name}] + tags
+        if self.inventory is not None:
+            nat_gateways = self.inventory.find('nat_gateways', tags=tags_to_find[:2])
+        else:
+            nat_gateways = paginate(self.ec2_client, 'describe_nat_gateways', 'NatGateways', Filter=self._tag_filters(tags_to_find[:2]))
+        for ng in nat_gateways:
+            # A deleted NAT gateway stays visible for a while after a teardown.
+            if ng['State'] in ('deleting', 'deleted', 'failed'):
+                continue
+            if tags_to_find[0] in ng['Tags'] and tags_to_find[1] in ng['Tags']:
+                return ng['NatGatewayId']
+        return None
         
-    def create_private_route_table(self, tags: list) -> None:
+    def create_private_route_table(self, tags: list, nat_gw_id: str = None) -> str:
         """This method creates a private route table.
 
         Args:
             tags (list): Tags to add to the private route table.
+            nat_gw_id (str): NAT gateway of the default route. Defaults to the last one created or found.
+
+        Returns:
+            str: Return the private route table id.
         """
-        if self.check_private_route_table(tags):
-            self.private_rt = self.ec2_resource.create_route_table(VpcId=self.myvpc_id)
-            self.private_rt.create_tags(Tags=tags)
-            self.private_rt_id = self.private_rt.id
-            self.private_rt.create_route(
+        rt_id = self._find_route_table(tags)
+        if rt_id is None:
+            private_rt = self.ec2_resource.create_route_table(VpcId=self.myvpc_id, TagSpecifications=[{'ResourceType': 'route-table', 'Tags': tags},])
+            private_rt.create_route(
                 DestinationCidrBlock='0.0.0.0/0',
-                NatGatewayId=self.nat_gw_id
+                NatGatewayId=nat_gw_id or self.nat_gw_id
             )
+            rt_id = private_rt.id
+            self._invalidate('route_tables')
+
+        self.private_rt_id = rt_id
+        return rt_id
 
     def check_private_route_table(self, tags: list) -> bool:
         """This method checks whether private route table is created or not.
@@ -219,32 +526,53 @@ class Vpc:
         Returns:
             bool: False if private route table exists, else True.
         """
-        for prt in self.ec2_client.describe_route_tables()['RouteTables']:
-            if tags[0] in prt['Tags'] and tags[1] in prt['Tags']:
-                self.private_rt_id = prt['RouteTableId']
-                return False
-        else:
+        rt_id = self._find_route_table(tags)
+        if rt_id is None:
             return True
+        self.private_rt_id = rt_id
+        return False
+
+    def _find_route_table(self, tags: list) -> str:
+        """This method finds the route table with the given tags.
+
+        Args:
+            tags (list): Tags of the route table.
+
+        Returns:
+            str: The route table id, or None if no route table has the given tags.
+        """
+        if self.inventory is not None:
+            route_tables = self.inventory.find('route_tables', tags=tags[:2])
+        else:
+            route_tables = paginate(self.ec2_client, 'describe_route_tables', 'RouteTables', Filters=self._tag_filters(tags[:2]))
+        for rt in route_tables:
+            if tags[0] in rt['Tags'] and tags[1] in rt['Tags']:
+                return rt['RouteTableId']
+        return None
         
-    def create_private_subnet(self, cidr: str, availability_zone: str, tags: list) -> str:
+    def create_private_subnet(self, cidr: str, availability_zone: str, tags: list, rt_id: str = None) -> str:
         """This method creates private subnet.
 
         Args:
             cidr (str): The CIDR block of subnet.
             availability_zone (str): Subnet will be created in that AZ.
             tags (list): Tags to add to the subnet.
+            rt_id (str): Private route table to associate the subnet with. Defaults to the last one created or found.
 
         Returns:
             str: Return the private subnet id.
         """
 
-        if self.check_private_subnet(tags):
-            self.private_subnet = self.ec2_resource.create_subnet(CidrBlock=cidr, VpcId=self.myvpc_id,AvailabilityZone=availability_zone)
-            self.private_subnet.create_tags(Tags=tags)
-            self.ec2_client.associate_route_table(RouteTableId=self.private_rt_id, SubnetId=self.private_subnet.id)
-            self.pvt_subnet_id = self.private_subnet.id
-        
-        return self.pvt_subnet_id
+        subnet_id = self._find_subnet(tags)
+        if subnet_id is None:
+            private_subnet = self.ec2_resource.create_subnet(CidrBlock=cidr, VpcId=self.myvpc_id,AvailabilityZone=availability_zone,
+                                                             TagSpecifications=[{'ResourceType': 'subnet', 'Tags': tags},])
+            self.ec2_client.associate_route_table(RouteTableId=rt_id or self.private_rt_id, SubnetId=private_subnet.id)
+            subnet_id = private_subnet.id
+            self._invalidate('subnets', 'route_tables')
+
+        self.pvt_subnet_id = subnet_id
+        return subnet_id
 
     def check_private_subnet(self, tags: list) -> bool:
         """This method checks if private subnet exists.
@@ -257,17 +585,42 @@ class Vpc:
         Returns:
             bool: False if private subnet exists, else True.
         """
-        for private_subnet in self.ec2_client.describe_subnets()['Subnets']:
-            if private_subnet['VpcId'] == self.myvpc_id:
-                if tags[0] in private_subnet['Tags'] and tags[1] in private_subnet['Tags']:
-                    self.pvt_subnet_id = private_subnet['SubnetId']
-                    return False
-        else:
+        subnet_id = self._find_subnet(tags)
+        if subnet_id is None:
             return True
+        self.pvt_subnet_id = subnet_id
+        return False
+
+    def _find_subnet(self, tags: list) -> str:
+        """This method finds the subnet of the vpc with the given tags.
+
+        The subnet id is returned instead of being stored on the instance, so that several subnets
+        can be created concurrently.
+
+        Args:
+            tags (list): Tags of the subnet.
+
+        Returns:
+            str: The subnet id, or None if no subnet has the given tags.
+        """
+        if self.inventory is not None:
+            subnets = self.inventory.find('subnets', tags=tags[:2])
+        else:
+            subnets = paginate(
+                self.ec2_client, 'describe_subnets', 'Subnets',
+                Filters=[{'Name': 'vpc-id', 'Values': [self.myvpc_id]}] + self._tag_filters(tags[:2])
+            )
+        for subnet in subnets:
+            if subnet['VpcId'] == self.myvpc_id:
+                if tags[0] in subnet['Tags'] and tags[1] in subnet['Tags']:
+                    return subnet['SubnetId']
+        return None
 
     def create_alb_security_group(self, name: str, desc: str, tags: list) -> str:
         """This method creates security group for application load balancer.
 
+        Its rules are applied by reconcile_security_groups.
+
         Args:
             name (str): Name of the security group.
             desc (str): Description for the security group.
@@ -277,31 +630,9 @@ class Vpc:
             str: The security group id.
         """
         if self.check_alb_security_group(name):
-            sg = self.ec2_client.create_security_group(
-                GroupName=name,
-                Description=desc,
-                VpcId=self.myvpc_id,
-                TagSpecifications=[{'ResourceType': 'security-group', 'Tags': tags},]
-            )
+            self.group_id = self._create_security_group(name, desc, tags)
+        return self.group_id
 
-            self.group_id = sg['GroupId']
-
-            self.ec2_client.authorize_security_group_ingress(
-                GroupId=self.group_id,
-                IpPermissions=[
-                    {
-                        'IpProtocol': 'tcp',
-                        'FromPort': 80,
-                        'ToPort': 80,
-                        'IpRanges': [{'CidrIp': '0.0.0.0/0'}]
-                    }
-                ]
-            )
-            return self.group_id
-        else:
-            return self.group_id
-
-    
     def check_alb_security_group(self, name: str) -> bool:
         """This method checks if security group is there for alb or not.
 
@@ -311,16 +642,17 @@ class Vpc:
         Returns:
             bool: False if alb security group exists, else True.
         """
-        for sg in self.ec2_client.describe_security_groups()['SecurityGroups']:
-            if sg['GroupName'] == name:
-                self.group_id = sg['GroupId']
-                return False
-        else:
+        group_id = self._find_security_group(name)
+        if group_id is None:
             return True
-        
+        self.group_id = group_id
+        return False
+
     def create_asg_security_group(self, name: str, desc: str, tags: list) -> str:
         """This method creates security group for autoscaling group.
 
+        Its rules are applied by reconcile_security_groups.
+
         Args:
             name (str): Name of the security group.
             desc (str): Description for the security group.
@@ -330,34 +662,9 @@ class Vpc:
             str: The security group id.
         """
         if self.check_asg_security_group(name):
-            sg = self.ec2_client.create_security_group(
-                GroupName=name,
-                Description=desc,
-                VpcId=self.myvpc_id,
-                TagSpecifications=[{'ResourceType': 'security-group', 'Tags': tags},]
-            )
+            self.asg_sgid = self._create_security_group(name, desc, tags)
+        return self.asg_sgid
 
-            self.asg_sgid = sg['GroupId']
-
-            self.ec2_client.authorize_security_group_ingress(
-                GroupId=self.asg_sgid,
-                IpPermissions=[
-                    {
-                        'IpProtocol': 'tcp',
-                        'FromPort': 80,
-                        'ToPort': 80, 
-                        'UserIdGroupPairs': [
-                            {
-                                'GroupId': self.group_id
-                            }
-                        ]
-                    }
-                ]
-            )
-            return self.asg_sgid
-        else:
-            return self.asg_sgid
-    
     def check_asg_security_group(self, name: str) -> bool:
         """This method checks if security group is there for asg or not.
 
@@ -367,9 +674,356 @@ class Vpc:
         Returns:
             bool: False if asg security group exists, else True.
         """
-        for sg in self.ec2_client.describe_security_groups()['SecurityGroups']:
-            if sg['GroupName'] == name:
-                self.asg_sgid = sg['GroupId']
-                return False
+        group_id = self._find_security_group(name)
+        if group_id is None:
+            return True
+        self.asg_sgid = group_id
+        return False
+
+    def create_endpoint_security_group(self, name: str, desc: str, tags: list) -> str:
+        """This method creates the security group of the interface endpoints.
+
+        Its rules are applied by reconcile_security_groups.
+
+        Args:
+            name (str): Name of the security group.
+            desc (str): Description for the security group.
+            tags (list): Tags to add to the security group.
+
+        Returns:
+            str: The security group id.
+        """
+        if self.check_endpoint_security_group(name):
+            self.endpoint_sgid = self._create_security_group(name, desc, tags)
+        return self.endpoint_sgid
+
+    def check_endpoint_security_group(self, name: str) -> bool:
+        """This method checks if the security group of the interface endpoints exists.
+
+        Args:
+            name (str): Name of the security group to check.
+
+        Returns:
+            bool: False if the endpoint security group exists, else True.
+        """
+        group_id = self._find_security_group(name)
+        if group_id is None:
+            return True
+        self.endpoint_sgid = group_id
+        return False
+
+    def read_security_group_rules(self, group_ids: list) -> dict:
+        """This method reads the rules of security groups, with one describe call per FILTER_BATCH groups.
+
+        Args:
+            group_ids (list): Ids of the security groups.
+
+        Returns:
+            dict: The rules of every group, as described by describe_security_group_rules, keyed by group id.
+        """
+        rules = {group_id: [] for group_id in group_ids}
+        for i in range(0, len(group_ids), FILTER_BATCH):
+            for rule in paginate(self.ec2_client, 'describe_security_group_rules', 'SecurityGroupRules',
+                                 Filters=[{'Name': 'group-id', 'Values': group_ids[i:i + FILTER_BATCH]}]):
+                rules[rule['GroupId']].append(rule)
+        return rules
+
+    def reconcile_security_groups(self, group_ids: dict, spec: dict = None) -> int:
+        """This method brings the ingress rules of the stack's security groups in line with a spec.
+
+        The rules of every group are read together, then each group gets at most one authorize
+        call for its missing rules and one revoke call for the rules the spec doesn't have, so
+        changing the rules never recreates a group. Egress rules are left alone.
+
+        Args:
+            group_ids (dict): Id of every security group of the stack, keyed as in SECURITY_GROUPS_SPEC.
+            spec (dict): The 'security_groups' key of the stack spec, see SECURITY_GROUPS_SPEC.
+
+        Returns:
+            int: Number of ingress permissions the groups have.
+        """
+        spec = security_group_spec(spec)
+        live = self.read_security_group_rules(list(group_ids.values()))
+        count = 0
+        for kind, group_id in group_ids.items():
+            permissions = rule_permissions(spec[kind], group_ids)
+            authorize, revoke = security_group_rule_changes(permissions, live[group_id])
+            if authorize:
+                self.ec2_client.authorize_security_group_ingress(GroupId=group_id, IpPermissions=authorize)
+            if revoke:
+                self.ec2_client.revoke_security_group_ingress(GroupId=group_id, SecurityGroupRuleIds=revoke)
+            count += len(permissions)
+        return count
+
+    def create_vpc_endpoint(self, service: str, tags: list, route_table_ids: list = None, subnet_ids: list = None, sg_id: str = None) -> str:
+        """This method creates a VPC endpoint, or brings the existing one to the given route tables or subnets.
+
+        Services in GATEWAY_ENDPOINTS get a gateway endpoint, a route in each route table.
+        Other services get an interface endpoint with a network interface in each subnet and
+        private DNS, so the usual hostname of the service resolves to the endpoint inside the
+        VPC and clients need no change. The id is returned instead of being read back from the
+        instance, so that several endpoints can be created concurrently.
+
+        Args:
+            service (str): Short name of the service, e.g. 's3' or 'sqs'.
+            tags (list): Tags to add to the endpoint.
+            route_table_ids (list): Route tables of a gateway endpoint.
+            subnet_ids (list): Subnets of an interface endpoint, at most one per availability zone.
+            sg_id (str): Security group of an interface endpoint.
+
+        Returns:
+            str: The endpoint id.
+        """
+        service_name = endpoint_service_name(service, self.ec2_client.meta.region_name)
+        endpoint = self._find_vpc_endpoint(service_name, tags)
+        if endpoint is None:
+            if service in GATEWAY_ENDPOINTS:
+                params = {'VpcEndpointType': 'Gateway', 'RouteTableIds': route_table_ids}
+            else:
+                # Private DNS names only resolve in a VPC with DNS hostnames.
+                self.ec2_client.modify_vpc_attribute(VpcId=self.myvpc_id, EnableDnsHostnames={'Value': True})
+                params = {'VpcEndpointType': 'Interface', 'SubnetIds': subnet_ids, 'SecurityGroupIds': [sg_id], 'PrivateDnsEnabled': True}
+            endpoint = self.ec2_client.create_vpc_endpoint(
+                VpcId=self.myvpc_id, ServiceName=service_name,
+                TagSpecifications=[{'ResourceType': 'vpc-endpoint', 'Tags': tags},], **params
+            )['VpcEndpoint']
+            self._invalidate('vpc_endpoints')
         else:
-            return True
\ No newline at end of file
+            changes = endpoint_changes(endpoint, route_table_ids, subnet_ids, sg_id)
+            if changes:
+                self.ec2_client.modify_vpc_endpoint(VpcEndpointId=endpoint['VpcEndpointId'], **changes)
+                self._invalidate('vpc_endpoints')
+
+        self.endpoint_id = endpoint['VpcEndpointId']
+        return endpoint['VpcEndpointId']
+
+    def check_vpc_endpoint(self, service: str, tags: list) -> bool:
+        """This method checks if the vpc has an endpoint of a service.
+
+        Args:
+            service (str): Short name of the service, e.g. 'sqs'.
+            tags (list): Tags of the endpoint.
+
+        Returns:
+            bool: False if the endpoint exists, else True.
+        """
+        endpoint = self._find_vpc_endpoint(endpoint_service_name(service, self.ec2_client.meta.region_name), tags)
+        if endpoint is None:
+            return True
+        self.endpoint_id = endpoint['VpcEndpointId']
+        return False
+
+    def _find_vpc_endpoint(self, service_name: str, tags: list) -> dict:
+        """This method finds the live endpoint of a service in the vpc.
+
+        Args:
+            service_name (str): Endpoint service name, see endpoint_service_name.
+            tags (list): Tags of the endpoint.
+
+        Returns:
+            dict: The endpoint, or None if the vpc has no endpoint of this service.
+        """
+        if self.inventory is not None:
+            endpoints = self.inventory.find('vpc_endpoints', tags=tags[:2])
+        else:
+            endpoints = paginate(
+                self.ec2_client, 'describe_vpc_endpoints', 'VpcEndpoints',
+                Filters=[{'Name': 'vpc-id', 'Values': [self.myvpc_id]}, {'Name': 'service-name', 'Values': [service_name]}]
+            )
+        for endpoint in endpoints:
+            if endpoint['VpcId'] == self.myvpc_id and endpoint['ServiceName'] == service_name and endpoint['State'].lower() not in ENDPOINT_GONE:
+                return endpoint
+        return None
+
+    def stale_vpc_endpoints(self, prefix: str, services: list) -> list:
+        """This method finds the endpoints of the vpc that were created for a service no longer wanted.
+
+        Args:
+            prefix (str): Start of the Name tag of the endpoints to consider, e.g. 'QubeEndpoint'.
+            services (list): Short names of the services whose endpoints are kept.
+
+        Returns:
+            list: The stale endpoints, as described by describe_vpc_endpoints.
+        """
+        region = self.ec2_client.meta.region_name
+        wanted = {endpoint_service_name(service, region) for service in services}
+        if self.inventory is not None:
+            endpoints = self.inventory.find('vpc_endpoints')
+        else:
+            endpoints = paginate(self.ec2_client, 'describe_vpc_endpoints', 'VpcEndpoints', Filters=[{'Name': 'vpc-id', 'Values': [self.myvpc_id]}])
+        return [
+            endpoint for endpoint in endpoints
+            if endpoint['VpcId'] == self.myvpc_id and endpoint['ServiceName'] not in wanted
+            and endpoint['State'].lower() not in ENDPOINT_GONE
+            and any(tag['Key'] == 'Name' and tag['Value'].startswith(prefix) for tag in endpoint.get('Tags', []))
+        ]
+
+    def delete_vpc_endpoint(self, endpoint_id: str) -> None:
+        """This method deletes a VPC endpoint.
+
+        The network interfaces of an interface endpoint are released asynchronously; deleting
+        its subnets and security group retries until they are gone.
+
+        Args:
+            endpoint_id (str): Id of the endpoint.
+        """
+        failed = self.ec2_client.delete_vpc_endpoints(VpcEndpointIds=[endpoint_id]).get('Unsuccessful', [])
+        # The call succeeds even when the endpoint can't be deleted.
+        if failed:
+            raise RuntimeError(f"vpc_endpoint {endpoint_id}: {failed[0]['Error']['Message']}")
+        self._invalidate('vpc_endpoints')
+
+    def delete_virtual_private_cloud(self, vpc_id: str) -> None:
+        """This method deletes the vpc. Everything created in it must be deleted first.
+
+        Args:
+            vpc_id (str): Id of the vpc.
+        """
+        self._retry_in_use(self.ec2_client.delete_vpc, VpcId=vpc_id)
+        self._invalidate('vpcs')
+
+    def delete_internet_gateway(self, igw_id: str) -> None:
+        """This method detaches the internet gateway from its vpc and deletes it.
+
+        Args:
+            igw_id (str): Id of the internet gateway.
+        """
+        for igw in paginate(self.ec2_client, 'describe_internet_gateways', 'InternetGateways', InternetGatewayIds=[igw_id]):
+            for attachment in igw['Attachments']:
+                self._retry_in_use(self.ec2_client.detach_internet_gateway, InternetGatewayId=igw_id, VpcId=attachment['VpcId'])
+        self.ec2_client.delete_internet_gateway(InternetGatewayId=igw_id)
+        self._invalidate('internet_gateways')
+
+    def delete_route_table(self, rt_id: str) -> None:
+        """This method disassociates a route table from its subnets and deletes it.
+
+        Args:
+            rt_id (str): Id of the route table.
+        """
+        for rt in paginate(self.ec2_client, 'describe_route_tables', 'RouteTables', RouteTableIds=[rt_id]):
+            for association in rt['Associations']:
+                if not association['Main']:
+                    self.ec2_client.disassociate_route_table(AssociationId=association['RouteTableAssociationId'])
+        self._retry_in_use(self.ec2_client.delete_route_table, RouteTableId=rt_id)
+        self._invalidate('route_tables')
+
+    def delete_subnet(self, subnet_id: str) -> None:
+        """This method deletes a subnet, once the network interfaces left in it are released.
+
+        Args:
+            subnet_id (str): Id of the subnet.
+        """
+        self._retry_in_use(self.ec2_client.delete_subnet, SubnetId=subnet_id)
+        self._invalidate('subnets', 'route_tables')
+
+    def delete_nat_gateway(self, nat_gw_id: str) -> None:
+        """This method deletes the NAT gateway, waits for it to be gone and releases its elastic IP.
+
+        Args:
+            nat_gw_id (str): Id of the NAT gateway.
+        """
+        allocation_ids = [
+            address['AllocationId']
+            for ng in paginate(self.ec2_client, 'describe_nat_gateways', 'NatGateways', NatGatewayIds=[nat_gw_id])
+            for address in ng['NatGatewayAddresses'] if 'AllocationId' in address
+        ]
+        self.ec2_client.delete_nat_gateway(NatGatewayId=nat_gw_id)
+        if self.wait_manager is not None:
+            self.wait_manager.wait('nat_gateway_deleted', self.ec2_client, nat_gw_id)
+        else:
+            while any(ng['State'] not in ('deleted', 'failed') for ng in paginate(
+                    self.ec2_client, 'describe_nat_gateways', 'NatGateways', NatGatewayIds=[nat_gw_id])):
+                time.sleep(5)
+        for allocation_id in allocation_ids:
+            self._retry_in_use(self.ec2_client.release_address, AllocationId=allocation_id)
+        self._invalidate('nat_gateways')
+
+    def delete_security_group(self, group_id: str) -> None:
+        """This method deletes a security group, once no network interface or group references it.
+
+        Args:
+            group_id (str): Id of the security group.
+        """
+        self._retry_in_use(self.ec2_client.delete_security_group, GroupId=group_id)
+        self._invalidate('security_groups')
+
+    def tag_resources(self, resource_ids: list, tags: list) -> None:
+        """This method adds or overwrites tags on many EC2 resources at once.
+
+        Any mix of resource types can be tagged together, so retagging a whole fleet takes one
+        create_tags call per TAG_BATCH resources instead of one per resource.
+
+        Args:
+            resource_ids (list): Ids of the resources, e.g. VPC, subnet and route table ids.
+            tags (list): Tags to add to every resource.
+        """
+        for start in range(0, len(resource_ids), TAG_BATCH):
+            self.ec2_client.create_tags(Resources=resource_ids[start:start + TAG_BATCH], Tags=tags)
+        self._invalidate(*TAGGED_KINDS)
+
+    def _retry_in_use(self, operation, timeout: float = 600, **kwargs) -> None:
+        """This method calls a delete operation until what still uses the resource is gone.
+
+        Network interfaces of a deleted load balancer or instance, and public IPs of a deleted NAT
+        gateway, are released some time after the deletion itself, so the first attempts can fail.
+
+        Args:
+            operation : Client method to call.
+            timeout (float): Seconds after which the last error is raised.
+            kwargs : Parameters of the operation.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                operation(**kwargs)
+                return
+            except ClientError as exc:
+                code = exc.response['Error']['Code']
+                if code not in ('DependencyViolation', 'InvalidIPAddress.InUse') or time.monotonic() > deadline:
+                    raise
+            time.sleep(5)
+
+    def _create_security_group(self, name: str, desc: str, tags: list) -> str:
+        sg = self.ec2_client.create_security_group(
+            GroupName=name,
+            Description=desc,
+            VpcId=self.myvpc_id,
+            TagSpecifications=[{'ResourceType': 'security-group', 'Tags': tags},]
+        )
+        self._invalidate('security_groups')
+        return sg['GroupId']
+
+    def _find_security_group(self, name: str) -> str:
+        # Group names are only unique within a VPC, so only the stack's VPC is searched.
+        vpc_id = getattr(self, 'myvpc_id', None)
+        if vpc_id is None:
+            return None
+        if self.inventory is not None:
+            security_groups = self.inventory.find('security_groups', name=name)
+        else:
+            security_groups = paginate(self.ec2_client, 'describe_security_groups', 'SecurityGroups',
+                                       Filters=[{'Name': 'group-name', 'Values': [name]}, {'Name': 'vpc-id', 'Values': [vpc_id]}])
+        for sg in security_groups:
+            if sg['GroupName'] == name and sg['VpcId'] == vpc_id:
+                return sg['GroupId']
+        return None
+
+    def _invalidate(self, *kinds: str) -> None:
+        """This method drops the given resource types from the inventory after a create or delete.
+
+        Args:
+            kinds (str): Resource types to drop.
+        """
+        if self.inventory is not None:
+            self.inventory.invalidate(*kinds)
+
+    def _tag_filters(self, tags: list) -> list:
+        """This method turns tags into describe filters, so only matching resources are returned.
+
+        Args:
+            tags (list): Tags the resources must have.
+
+        Returns:
+            list: One 'tag:<key>' filter per tag.
+        """
+        return [{'Name': 'tag:' + tag['Key'], 'Values': [tag['Value']]} for tag in tags]
@@ -0,0 +1,159 @@
+import threading
+import time
+from concurrent.futures import Future
+from Paginator import paginate
+
+
+class WaitManager:
+    def __init__(self, delay: float = 5, timeout: float = 600) -> None:
+        """Class that represents one polling loop for every resource waiting to become ready.
+
+        Callers register the resource they wait for and block only their own thread. One
+        background thread polls every pending resource on each tick, with a single describe call
+        per resource kind and client for all the ids pending on it, and releases each waiter as
+        soon as its resource is ready.
+
+        Args:
+            delay (float): Seconds between two polls.
+            timeout (float): Seconds after which a resource that isn't ready fails its waiters.
+        """
+        self.delay = delay
+        self.timeout = timeout
+        self.checks = {
+            'vpc': self._check_vpcs,
+            'nat_gateway': self._check_nat_gateways,
+            'instance_profile': self._check_instance_profiles,
+            'nat_gateway_deleted': self._check_nat_gateways_deleted,
+            'auto_scaling_group_deleted': self._check_auto_scaling_groups_deleted,
+        }
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, kind: str, client, resource_id: str) -> Future:
+        """This method registers a resource to wait for.
+
+        Args:
+            kind (str): Kind of resource, one of 'vpc', 'nat_gateway', 'instance_profile', or
+                'nat_gateway_deleted' and 'auto_scaling_group_deleted' to wait for a deletion.
+            client : Client to poll the resource with.
+            resource_id (str): Id of the resource (name for instance profiles and autoscaling groups).
+
+        Returns:
+            Future: Resolved with the resource id once it is ready, or failed if it can't become ready.
+        """
+        if kind not in self.checks:
+            raise ValueError(f"Can't wait for {kind}")
+        future = Future()
+        deadline = time.monotonic() + self.timeout
+        with self.lock:
+            self.pending.setdefault((kind, client), {}).setdefault(resource_id, []).append((future, deadline))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='wait-manager', daemon=True)
+                self.thread.start()
+        return future
+
+    def wait(self, kind: str, client, resource_id: str) -> str:
+        """This method blocks the calling thread until a resource is ready.
+
+        Args:
+            kind (str): Kind of resource, see submit.
+            client : Client to poll the resource with.
+            resource_id (str): Id of the resource, see submit.
+
+        Returns:
+            str: The resource id.
+        """
+        return self.submit(kind, client, resource_id).result()
+
+    def _run(self) -> None:
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.thread = None
+                    return
+                batches = {key: list(waiters) for key, waiters in self.pending.items()}
+
+            for (kind, client), ids in batches.items():
+                states = self._poll(kind, client, ids)
+                now = time.monotonic()
+                with self.lock:
+                    waiters = self.pending[(kind, client)]
+                    for resource_id in ids:
+                        state, message = states.get(resource_id, ('pending', None))
+                        if state == 'pending':
+                            expired = [waiter for waiter in waiters[resource_id] if waiter[1] <= now]
+                            for future, _ in expired:
+                                future.set_exception(TimeoutError(f"{kind} {resource_id} isn't ready after {self.timeout}s"))
+                            waiters[resource_id] = [waiter for waiter in waiters[resource_id] if waiter[1] > now]
+                        else:
+                            for future, _ in waiters[resource_id]:
+                                if state == 'ready':
+                                    future.set_result(resource_id)
+                                else:
+                                    future.set_exception(RuntimeError(f"{kind} {resource_id} failed: {message}"))
+                            waiters[resource_id] = []
+                        if not waiters[resource_id]:
+                            del waiters[resource_id]
+                    if not waiters:
+                        del self.pending[(kind, client)]
+
+            time.sleep(self.delay)
+
+    def _poll(self, kind: str, client, ids: list) -> dict:
+        # A describe of several ids fails as a whole if one of them isn't visible yet, so on
+        # error each id is checked on its own.
+        try:
+            return self.checks[kind](client, ids)
+        except Exception:
+            if len(ids) == 1:
+                return {}
+        states = {}
+        for resource_id in ids:
+            try:
+                states.update(self.checks[kind](client, [resource_id]))
+            except Exception:
+                pass
+        return states
+
+    def _check_vpcs(self, client, ids: list) -> dict:
+        return {
+            vpc['VpcId']: ('ready' if vpc['State'] == 'available' else 'pending', None)
+            for vpc in paginate(client, 'describe_vpcs', 'Vpcs', VpcIds=ids)
+        }
+
+    def _check_nat_gateways(self, client, ids: list) -> dict:
+        states = {}
+        for ng in paginate(client, 'describe_nat_gateways', 'NatGateways', NatGatewayIds=ids):
+            if ng['State'] == 'available':
+                states[ng['NatGatewayId']] = ('ready', None)
+            elif ng['State'] in ('failed', 'deleting', 'deleted'):
+                states[ng['NatGatewayId']] = ('failed', ng.get('FailureMessage', ng['State']))
+            else:
+                states[ng['NatGatewayId']] = ('pending', None)
+        return states
+
+    def _check_instance_profiles(self, client, ids: list) -> dict:
+        # IAM can't describe several instance profiles by name in one call.
+        states = {}
+        for name in ids:
+            try:
+                client.get_instance_profile(InstanceProfileName=name)
+                states[name] = ('ready', None)
+            except client.exceptions.NoSuchEntityException:
+                states[name] = ('pending', None)
+        return states
+
+    def _check_nat_gateways_deleted(self, client, ids: list) -> dict:
+        # A filter, unlike NatGatewayIds, doesn't fail on ids that are already gone.
+        states = dict.fromkeys(ids, ('ready', None))
+        for ng in paginate(client, 'describe_nat_gateways', 'NatGateways', Filter=[{'Name': 'nat-gateway-id', 'Values': ids}]):
+            if ng['State'] not in ('deleted', 'failed'):
+                states[ng['NatGatewayId']] = ('pending', None)
+        return states
+
+    def _check_auto_scaling_groups_deleted(self, client, ids: list) -> dict:
+        states = dict.fromkeys(ids, ('ready', None))
+        for asg in paginate(client, 'describe_auto_scaling_groups', 'AutoScalingGroups', AutoScalingGroupNames=ids):
+            states[asg['AutoScalingGroupName']] = ('pending', None)
+        return states
@@ -1,62 +1,248 @@
-import boto3
-from VPC import Vpc
-from SQS import Sqs
-from ASG import Asg
-from EC2 import Ec2
-from IAM import Iam
-from ELB import Elb
-
-ec2_resource = boto3.resource("ec2")
-ec2_client = boto3.client("ec2")
-sqs_resource = boto3.resource("sqs")
-as_client = boto3.client("autoscaling")
-elbv2_client = boto3.client("elbv2")
-iam_client = boto3.client("iam")
-
-# VPC resources
-qube_vpc = Vpc(ec2_resource, ec2_client)
-
-vpc_id = qube_vpc.create_virtual_private_cloud([{'Key': 'Name', 'Value': 'QubeVPC'}, {'Key': 'Product', 'Value': 'challenge'}], "172.20.0.0/16")
-
-qube_vpc.create_and_attach_internet_gateway([{'Key': 'Name', 'Value': 'QubeIG'}, {'Key': 'Product', 'Value': 'challenge'}])
-
-qube_vpc.create_public_route_table([{'Key': 'Name', 'Value': 'QubePublicRT'}, {'Key': 'Product', 'Value': 'challenge'}])
-
-pub_sub_1 = qube_vpc.create_public_subnet("172.20.1.0/24", "ap-south-1a", [{'Key': 'Name', 'Value': 'QubePublicSubnet1'}, {'Key': 'Product', 'Value': 'challenge'}])
-
-pub_sub_2 = qube_vpc.create_public_subnet("172.20.2.0/24", "ap-south-1b", [{'Key': 'Name', 'Value': 'QubePublicSubnet2'}, {'Key': 'Product', 'Value': 'challenge'}])
-
-qube_vpc.create_nat_gateway([{'Key': 'Product', 'Value': 'challenge'}])
-
-qube_vpc.create_private_route_table([{'Key': 'Name', 'Value': 'QubePrivateRT'}, {'Key': 'Product', 'Value': 'challenge'}])
-
-pvt_sub_1 = qube_vpc.create_private_subnet("172.20.3.0/24", "ap-south-1a", [{'Key': 'Name', 'Value': 'QubePrivateSubnet1'}, {'Key': 'Product', 'Value': 'challenge'}])
-
-alb_sgid = qube_vpc.create_alb_security_group("QubeAlbSG", "Security group for ALB", [{'Key': 'Product', 'Value': 'challenge'}])
-
-asg_sgid = qube_vpc.create_asg_security_group("QubeAsgSG", "Security group for ASG", [{'Key': 'Product', 'Value': 'challenge'}])
-
-# SQS resources
-qube_sqs = Sqs(sqs_resource)
-qube_sqs.create_sqs_queue("QubeSQS", {'Key': 'Product', 'Value': 'challenge'})
-
-# ELB resources
-qube_elb = Elb(elbv2_client)
-pub_sub_list = [pub_sub_1, pub_sub_2]
-tg_arn = qube_elb.create_elb("QubeALB", pub_sub_list, [{'Key': 'Product', 'Value': 'challenge'}], alb_sgid, vpc_id)
-
-# IAM resources
-qube_iam = Iam(iam_client)
-ip_id = qube_iam.create_instance_profile("QubeIP", [{'Key': 'Product', 'Value': 'challenge'}])
-
-# EC2 resources
-qube_ec2 = Ec2(ec2_client)
-qube_ec2.create_key([{'Key': 'Product', 'Value': 'challenge'}])
-launch_template_id = qube_ec2.create_launch_template("QubeLT", "QubeIP", [{'Key': 'Product', 'Value': 'challenge'}], [asg_sgid])
-
-# ASG resources
-qube_asg = Asg(as_client)
-asg_arn = qube_asg.create_asg("QubeASG", launch_template_id, pvt_sub_1, [tg_arn], [{'Key': 'Product', 'Value': 'challenge'}])
-
-# IAM resources
-qube_iam.create_add_iam_policy_to_role("QubePolicy", [{'Key': 'Product', 'Value': 'challenge'}], asg_arn)
\ No newline at end of file
+import argparse
+import asyncio
+from contextlib import nullcontext
+from Clients import ClientFactory
+from Inventory import Inventory
+from RateLimiter import RateLimiter
+from State import State
+from WaitManager import WaitManager
+from Stack import Stack, DEFAULT_SPEC
+from Plan import Plan
+from AsyncStack import AsyncStack, open_clients, run_stacks
+from Fleet import Fleet, load_specs, format_table
+from Regions import Regions
+from Tracer import Tracer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Provision the Qube stack, or a fleet of Qube stacks.")
+    parser.add_argument("--fleet", metavar="FILE", help="JSON or YAML file with a list of stack specs to provision")
+    parser.add_argument("--workers", type=int, default=4, help="number of fleet stacks provisioned at the same time")
+    parser.add_argument("--plan", action="store_true", help="only report what would be created or has drifted; exits 2 if anything would change")
+    parser.add_argument("--destroy", action="store_true", help="delete every resource of the stack, or of every fleet stack")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="drive every stack from one event loop with aiobotocore clients")
+    parser.add_argument("--state", metavar="FILE", default="qube_state.db", help="SQLite file recording the created resources")
+    parser.add_argument("--retag", metavar="KEY=VALUE", action="append", help="add or overwrite a tag on the VPC resources of the stack, or of every fleet stack; can be repeated")
+    parser.add_argument("--refresh", action="store_true", help="replace the instances of the autoscaling group of the stack, or of every fleet stack, with an instance refresh")
+    parser.add_argument("--regions", metavar="REGION,...", help="deploy the stack, or every fleet stack, to these regions at the same time, e.g. ap-south-1,eu-west-1")
+    parser.add_argument("--trace", metavar="FILE", help="record every API call, print the slowest calls per method and write the spans as OTLP JSON")
+    args = parser.parse_args()
+    if args.use_async and args.plan:
+        parser.error("--plan isn't available with --async")
+    if args.use_async and (args.retag or args.refresh):
+        parser.error("--retag and --refresh aren't available with --async")
+    if args.regions and (args.use_async or args.retag or args.refresh):
+        parser.error("--regions isn't available with --async, --retag or --refresh")
+    if args.retag and not all('=' in tag for tag in args.retag):
+        parser.error("--retag expects KEY=VALUE")
+
+    tracer = Tracer() if args.trace else None
+    try:
+        run(args, tracer)
+    finally:
+        if tracer is not None:
+            report_trace(tracer, args.trace)
+
+
+def run(args: argparse.Namespace, tracer: Tracer = None) -> None:
+    """This function runs the command the arguments ask for.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments, see main.
+        tracer (Tracer): Optional tracer of every API call.
+    """
+    def phase(name):
+        return tracer.phase(name) if tracer is not None else nullcontext()
+
+    if args.regions:
+        run_regions(args, phase, tracer)
+        return
+
+    if args.use_async:
+        specs = load_specs(args.fleet) if args.fleet else [DEFAULT_SPEC]
+        with phase('destroy' if args.destroy else 'provision'):
+            results = asyncio.run(run_async(specs, State(args.state), args.destroy, tracer))
+        print(format_table(results, ['name', 'status', 'seconds', 'vpc_id', 'asg_arn', 'error']))
+        if any(result['status'] == 'failed' for result in results):
+            raise SystemExit(1)
+        return
+
+    # Every call of every client shares one rate limiter and retry budget. Clients come from one
+    # session and are only built when first called; each pools enough connections for every
+    # concurrent step of every stack.
+    clients = ClientFactory(config=RateLimiter.CLIENT_CONFIG, max_pool_connections=max(50, args.workers * 8), limiter=RateLimiter())
+    if tracer is not None:
+        # Clients are built lazily from the session, so every one of them inherits the hooks.
+        tracer.attach(clients.session)
+
+    # Every step waiting for a resource to become ready is served by one polling loop.
+    wait_manager = WaitManager()
+
+    # Recorded resources let an unchanged stack be verified with a handful of reads.
+    state = State(args.state)
+
+    if args.fleet:
+        # One concurrent bulk read per resource type serves every stack's existence checks.
+        inventory = Inventory(clients['ec2_client'], clients['elbv2_client'], clients['as_client'], clients['iam_client'])
+
+        fleet = Fleet(load_specs(args.fleet), clients, inventory, args.workers, wait_manager, state)
+        if args.retag:
+            retag(fleet, args.retag, phase)
+            return
+        if args.refresh:
+            refresh(fleet, phase)
+        if args.plan:
+            with phase('plan'):
+                rows = fleet.plan()
+            report_plan(rows)
+        if args.destroy:
+            with phase('destroy'):
+                results = fleet.destroy()
+            print(format_table(results, ['name', 'status', 'seconds', 'error']))
+            if any(result['status'] == 'failed' for result in results):
+                raise SystemExit(1)
+            return
+        with phase('provision'):
+            results = fleet.provision()
+        print(format_table(results, ['name', 'status', 'seconds', 'vpc_id', 'asg_arn', 'error']))
+        if any(result['status'] == 'failed' for result in results):
+            raise SystemExit(1)
+    else:
+        # One concurrent bulk read per resource type serves every existence check.
+        inventory = Inventory(clients['ec2_client'], clients['elbv2_client'], clients['as_client'], clients['iam_client'],
+                              ec2_filters=[{'Name': 'tag:Product', 'Values': ['challenge']}])
+
+        stack = Stack(DEFAULT_SPEC, clients, inventory, wait_manager, state)
+        if args.retag:
+            retag(Fleet([DEFAULT_SPEC], clients, inventory, 1, wait_manager, state), args.retag, phase)
+            return
+        if args.refresh:
+            refresh(Fleet([DEFAULT_SPEC], clients, inventory, 1, wait_manager, state), phase)
+        if args.plan:
+            with phase('inventory'):
+                inventory.refresh()
+            with phase('plan'):
+                rows = Plan(stack).compute()
+            report_plan(rows)
+        if args.destroy:
+            with phase('inventory'):
+                inventory.refresh()
+            with phase('destroy'):
+                stack.destroy()
+            print("Destroyed. Critical path:", " -> ".join(stack.dag.critical_path()))
+            return
+        with phase('verify'):
+            verified = stack.verify()
+        if verified:
+            print("No changes: every recorded resource of the stack exists")
+        else:
+            print("Provisioning:", "; ".join(stack.drift))
+            with phase('inventory'):
+                inventory.refresh()
+            with phase('provision'):
+                stack.provision()
+            print("Critical path:", " -> ".join(stack.dag.critical_path()))
+
+
+def run_regions(args: argparse.Namespace, phase, tracer: Tracer = None) -> None:
+    """This function provisions, plans or destroys the stacks in every region of --regions, and exits on failure.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments, see main.
+        phase : Context manager factory naming the phase of the run.
+        tracer (Tracer): Optional tracer of every API call.
+    """
+    specs = load_specs(args.fleet) if args.fleet else [DEFAULT_SPEC]
+    regions = Regions(specs, [region.strip() for region in args.regions.split(',')], args.workers, args.state, tracer)
+    if args.plan:
+        with phase('plan'):
+            summary = regions.plan()
+        columns = ['region', 'stack', 'resource', 'name', 'action', 'id', 'detail']
+    elif args.destroy:
+        with phase('destroy'):
+            summary = regions.destroy()
+        columns = ['region', 'name', 'status', 'seconds', 'error']
+    else:
+        with phase('provision'):
+            summary = regions.provision()
+        columns = ['region', 'name', 'status', 'seconds', 'vpc_id', 'asg_arn', 'error']
+
+    rows = [row for region in summary for row in region['results']]
+    print(format_table(rows, columns))
+    print(format_table(summary, ['region', 'status', 'seconds', 'latency_ms', 'zones', 'error']))
+    if any(region['status'] == 'failed' for region in summary):
+        raise SystemExit(1)
+    if args.plan:
+        raise SystemExit(2 if any(row['action'] != 'exists' for row in rows) else 0)
+
+
+async def run_async(specs: list, state: State, destroy: bool, tracer: Tracer = None) -> list:
+    """This function provisions, or destroys, every stack from one event loop.
+
+    Args:
+        specs (list): Stack specs.
+        state (State): Local record of the resources.
+        destroy (bool): Delete the stacks instead of provisioning them.
+        tracer (Tracer): Optional tracer of every API call.
+
+    Returns:
+        list: One result per stack, see run_stacks.
+    """
+    async with open_clients(tracer=tracer) as clients:
+        return await run_stacks([AsyncStack(spec, clients, state) for spec in specs], destroy)
+
+
+def retag(fleet: Fleet, pairs: list, phase) -> None:
+    """This function tags the VPC resources of every stack of the fleet.
+
+    Args:
+        fleet (Fleet): Stacks to retag.
+        pairs (list): Tags as KEY=VALUE strings.
+        phase : Context manager factory naming the phase of the run.
+    """
+    tags = [dict(zip(('Key', 'Value'), pair.split('=', 1))) for pair in pairs]
+    with phase('retag'):
+        count = fleet.retag(tags)
+    print(f"Tagged {count} resources of {len(fleet.stacks)} stacks")
+
+
+def refresh(fleet: Fleet, phase) -> None:
+    """This function starts an instance refresh of every stack of the fleet and exits.
+
+    Args:
+        fleet (Fleet): Stacks to refresh.
+        phase : Context manager factory naming the phase of the run.
+    """
+    with phase('refresh'):
+        results = fleet.refresh()
+    print(format_table(results, ['name', 'status', 'refresh_id', 'error']))
+    raise SystemExit(1 if any(result['status'] == 'failed' for result in results) else 0)
+
+
+def report_plan(rows: list) -> None:
+    """This function prints a plan and exits, with status 2 if anything would be created or has drifted.
+
+    Args:
+        rows (list): Plan rows, see Plan.
+    """
+    print(format_table(rows, ['stack', 'resource', 'name', 'action', 'id', 'detail']))
+    raise SystemExit(2 if any(row['action'] != 'exists' for row in rows) else 0)
+
+
+def report_trace(tracer: Tracer, path: str, limit: int = 20) -> None:
+    """This function prints the methods and operations that took the most time and writes the trace.
+
+    Args:
+        tracer (Tracer): Tracer of the run.
+        path (str): Path of the OTLP JSON file.
+        limit (int): Number of summary rows to print.
+    """
+    rows = tracer.summary()
+    print(f"{len(tracer.calls())} API calls, slowest first:")
+    print(format_table(rows[:limit], ['caller', 'operation', 'calls', 'seconds', 'max_ms', 'retries', 'throttles', 'errors', 'bytes_out', 'bytes_in']))
+    tracer.export(path)
+    print("Trace written to", path)
+
+
+if __name__ == "__main__":
+    main()
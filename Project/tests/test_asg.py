@@ -0,0 +1,128 @@
+import pytest
+from ASG import (BACKLOG_POLICY, REQUESTS_POLICY, asg_spec, capacity_changes, group_settings, launch_changes, launch_settings, lifecycle_hooks,
+                 refresh_preferences, same_configuration, scaling_policies, warm_pool_settings)
+
+LB_ARN = 'arn:aws:elasticloadbalancing:us-east-1:123456789012:loadbalancer/app/QubeELB/50dc6c495c0c9188'
+TG_ARN = 'arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/QubeTG/6d0ecf831eec9f09'
+
+
+def test_without_on_demand_percentage_every_instance_is_on_demand():
+    policy = launch_settings('lt-1', asg_spec())['MixedInstancesPolicy']
+    assert 'InstancesDistribution' not in policy
+    assert policy['LaunchTemplate']['LaunchTemplateSpecification'] == {'LaunchTemplateId': 'lt-1', 'Version': '$Latest'}
+
+
+def test_an_on_demand_percentage_of_zero_is_all_spot():
+    policy = launch_settings('lt-1', asg_spec({'on_demand_percentage': 0}), '3')['MixedInstancesPolicy']
+    assert policy['InstancesDistribution'] == {
+        'OnDemandBaseCapacity': 0,
+        'OnDemandPercentageAboveBaseCapacity': 0,
+        'SpotAllocationStrategy': 'price-capacity-optimized',
+    }
+    assert policy['LaunchTemplate']['LaunchTemplateSpecification']['Version'] == '3'
+
+
+def test_desired_capacity_is_left_out_when_not_set():
+    assert 'DesiredCapacity' not in group_settings('lt-1', asg_spec({'min_size': 1, 'max_size': 4}))
+    assert group_settings('lt-1', asg_spec({'min_size': 1, 'max_size': 4, 'desired_capacity': 2}))['DesiredCapacity'] == 2
+
+
+@pytest.mark.parametrize('spec, live, changes', [
+    ({'min_size': 1, 'max_size': 4}, {'MinSize': 1, 'MaxSize': 4, 'DesiredCapacity': 3}, {}),
+    ({'min_size': 1, 'max_size': 4, 'desired_capacity': 3}, {'MinSize': 1, 'MaxSize': 4, 'DesiredCapacity': 3}, {}),
+    ({'min_size': 2, 'max_size': 4}, {'MinSize': 1, 'MaxSize': 4, 'DesiredCapacity': 3}, {'MinSize': 2}),
+    ({'min_size': 1, 'max_size': 4, 'desired_capacity': 2}, {'MinSize': 1, 'MaxSize': 4, 'DesiredCapacity': 3}, {'DesiredCapacity': 2}),
+])
+def test_capacity_changes(spec, live, changes):
+    assert capacity_changes(live, asg_spec(spec)) == changes
+
+
+def test_no_scaling_policies_by_default():
+    assert scaling_policies('QubeASG', asg_spec(), 'QubeSQS', LB_ARN, TG_ARN) == {}
+
+
+def test_requests_per_target_label_is_built_from_the_lb_and_tg_arns():
+    policies = scaling_policies('QubeASG', asg_spec({'requests_per_target': 1000}), 'QubeSQS', LB_ARN, TG_ARN)
+    assert policies == {'QubeASG' + REQUESTS_POLICY: {
+        'PredefinedMetricSpecification': {
+            'PredefinedMetricType': 'ALBRequestCountPerTarget',
+            'ResourceLabel': 'app/QubeELB/50dc6c495c0c9188/targetgroup/QubeTG/6d0ecf831eec9f09',
+        },
+        'TargetValue': 1000.0,
+    }}
+
+
+def test_backlog_per_instance_divides_the_queue_backlog_by_in_service_instances():
+    policies = scaling_policies('QubeASG', asg_spec({'backlog_per_instance': 20}), 'QubeSQS', LB_ARN, TG_ARN)
+    configuration = policies['QubeASG' + BACKLOG_POLICY]
+    metrics = {metric['Id']: metric for metric in configuration['CustomizedMetricSpecification']['Metrics']}
+
+    assert configuration['TargetValue'] == 20.0
+    assert metrics['backlog']['MetricStat']['Metric']['Dimensions'] == [{'Name': 'QueueName', 'Value': 'QubeSQS'}]
+    assert metrics['instances']['MetricStat']['Metric']['Dimensions'] == [{'Name': 'AutoScalingGroupName', 'Value': 'QubeASG'}]
+    # Only the expression is the metric tracked, and it refers to the two others by id.
+    assert [metric['Id'] for metric in metrics.values() if metric['ReturnData']] == ['backlog_per_instance']
+    assert metrics['backlog_per_instance']['Expression'] == 'backlog / instances'
+
+
+@pytest.mark.parametrize('spec, mixed', [
+    ({'warm_pool': {}, 'on_demand_percentage': 0}, 'on_demand_percentage'),
+    ({'warm_pool': {}, 'instance_requirements': [{'VCpuCount': {'Min': 4}, 'MemoryMiB': {'Min': 8192}}]}, 'instance_requirements'),
+])
+def test_a_warm_pool_rejects_a_mixed_instances_policy(spec, mixed):
+    with pytest.raises(ValueError, match=mixed):
+        asg_spec(spec)
+
+
+def test_a_group_with_a_warm_pool_launches_its_template_as_is():
+    spec = asg_spec(asg_spec({'warm_pool': {}}))
+    assert launch_settings('lt-1', spec) == {'LaunchTemplate': {'LaunchTemplateId': 'lt-1', 'Version': '$Latest'}}
+    # A group that still launches through a mixed instances policy is switched.
+    live = {'MixedInstancesPolicy': launch_settings('lt-1', asg_spec())['MixedInstancesPolicy']}
+    assert launch_changes(live, 'lt-1', spec) == {'LaunchTemplate': {'LaunchTemplateId': 'lt-1', 'Version': '$Latest'}}
+    assert launch_changes({'LaunchTemplate': {'LaunchTemplateId': 'lt-1', 'Version': '$Latest'}}, 'lt-1', spec) == {}
+
+
+def test_warm_pool_settings():
+    assert warm_pool_settings(asg_spec()) is None
+    assert warm_pool_settings(asg_spec({'warm_pool': {}})) == {
+        'MinSize': 0, 'PoolState': 'Stopped', 'InstanceReusePolicy': {'ReuseOnScaleIn': True},
+    }
+    assert warm_pool_settings(asg_spec({'warm_pool': {'min_size': 2, 'max_prepared_capacity': 4, 'pool_state': 'Hibernated'}})) == {
+        'MinSize': 2, 'PoolState': 'Hibernated', 'InstanceReusePolicy': {'ReuseOnScaleIn': True}, 'MaxGroupPreparedCapacity': 4,
+    }
+
+
+def test_lifecycle_hooks_are_keyed_by_prefixed_name():
+    spec = asg_spec({'lifecycle_hooks': [
+        {'name': 'Drain', 'transition': 'autoscaling:EC2_INSTANCE_TERMINATING', 'heartbeat_timeout': 300, 'default_result': 'CONTINUE'},
+        {'name': 'Warm', 'transition': 'autoscaling:EC2_INSTANCE_LAUNCHING', 'notification_target_arn': 'arn:sqs', 'role_arn': 'arn:role'},
+    ]})
+    assert lifecycle_hooks('QubeASG', spec) == {
+        'QubeASGDrain': {'LifecycleHookName': 'QubeASGDrain', 'LifecycleTransition': 'autoscaling:EC2_INSTANCE_TERMINATING',
+                         'HeartbeatTimeout': 300, 'DefaultResult': 'CONTINUE'},
+        'QubeASGWarm': {'LifecycleHookName': 'QubeASGWarm', 'LifecycleTransition': 'autoscaling:EC2_INSTANCE_LAUNCHING',
+                        'HeartbeatTimeout': 3600, 'DefaultResult': 'ABANDON', 'NotificationTargetARN': 'arn:sqs', 'RoleARN': 'arn:role'},
+    }
+
+
+def test_refresh_preferences():
+    assert refresh_preferences(asg_spec()) == {'MinHealthyPercentage': 90, 'InstanceWarmup': 300, 'SkipMatching': False}
+    # The refresh always ends with a checkpoint at 100 percent.
+    preferences = refresh_preferences(asg_spec({'instance_refresh': {'checkpoints': [50, 20, 50], 'checkpoint_delay': 600}, 'instance_warmup': 60}))
+    assert preferences['CheckpointPercentages'] == [20, 50, 100]
+    assert preferences['CheckpointDelay'] == 600
+    assert preferences['InstanceWarmup'] == 60
+
+
+@pytest.mark.parametrize('wanted, live, same', [
+    ({'MinSize': 0, 'PoolState': 'Stopped'}, {'MinSize': 0, 'PoolState': 'Stopped', 'Status': 'Active'}, True),
+    ({'MinSize': 1, 'PoolState': 'Stopped'}, {'MinSize': 0, 'PoolState': 'Stopped'}, False),
+    ({'MaxGroupPreparedCapacity': 4}, {'MinSize': 0}, False),
+    ({'InstanceReusePolicy': {'ReuseOnScaleIn': True}}, {'InstanceReusePolicy': {'ReuseOnScaleIn': True}}, True),
+    ({'Metrics': [{'Id': 'a'}, {'Id': 'b'}]}, {'Metrics': [{'Id': 'a', 'ReturnData': True}, {'Id': 'b'}]}, True),
+    ({'Metrics': [{'Id': 'a'}, {'Id': 'b'}]}, {'Metrics': [{'Id': 'a'}]}, False),
+    ({'TargetValue': 20.0}, {'TargetValue': 20.0, 'DisableScaleIn': False}, True),
+])
+def test_same_configuration_ignores_keys_filled_in_by_the_api(wanted, live, same):
+    assert same_configuration(wanted, live) is same
@@ -0,0 +1,59 @@
+import pytest
+from Benchmark import compare
+
+CONFIG = {'stacks': 1, 'subnets': 0, 'security_groups': 0, 'latency': 0}
+
+
+def results(phase_calls: int = 40, phase_seconds: float = 10.0, check_calls: int = 1, check_seconds: float = 0.2, config: dict = None) -> dict:
+    # Results in the shape Benchmark.run writes them, with one phase and one check.
+    return {
+        'config': config or CONFIG,
+        'phases': {'provision': {'seconds': phase_seconds, 'calls': {'total': phase_calls, 'services': {'ec2': phase_calls}}}},
+        'checks': {'Vpc.check_vpc': {'seconds': check_seconds, 'calls': check_calls}},
+    }
+
+
+def test_an_identical_run_has_no_regressions():
+    assert compare(results(), results()) == []
+
+
+def test_a_config_mismatch_is_reported():
+    regressions = compare(results(config=dict(CONFIG, stacks=4)), results())
+    assert regressions == [f'config differs from the baseline: {CONFIG}']
+
+
+@pytest.mark.parametrize('run, regression', [
+    (results(phase_calls=41), 'provision: 41 calls, baseline 40'),
+    (results(check_calls=2), 'Vpc.check_vpc: 2 calls, baseline 1'),
+])
+def test_more_calls_is_a_regression(run, regression):
+    assert compare(run, results()) == [regression]
+
+
+def test_fewer_calls_is_not_a_regression():
+    assert compare(results(phase_calls=30, check_calls=0), results()) == []
+
+
+@pytest.mark.parametrize('run, regressions', [
+    # Within the tolerance of 25%.
+    (results(phase_seconds=12.5), []),
+    (results(phase_seconds=12.6), ['provision: 12.6s, baseline 10.0s']),
+    # More than 25% slower, but by less than 0.05s, which is noise.
+    (results(check_seconds=0.24), []),
+    (results(check_seconds=0.3), ['Vpc.check_vpc: 0.3s, baseline 0.2s']),
+])
+def test_time_regressions_need_the_tolerance_and_a_noticeable_increase(run, regressions):
+    assert compare(run, results()) == regressions
+
+
+def test_the_tolerance_can_be_changed():
+    assert compare(results(phase_seconds=12.5), results(), tolerance=0.1) == ['provision: 12.5s, baseline 10.0s']
+
+
+def test_phases_and_checks_missing_from_the_baseline_are_skipped():
+    run = results()
+    run['phases']['teardown'] = {'seconds': 5.0, 'calls': {'total': 20, 'services': {}}}
+    run['checks']['Asg.check_asg'] = {'seconds': 0.1, 'calls': 1}
+    baseline = results()
+    del baseline['checks']
+    assert compare(run, baseline) == []
@@ -0,0 +1,112 @@
+import asyncio
+import time
+import pytest
+from DAG import Dag
+
+STEP = 0.2
+
+
+def sleeper(value, seconds=STEP):
+    def step(*inputs):
+        time.sleep(seconds)
+        return value
+    return step
+
+
+def async_sleeper(value, seconds=STEP):
+    async def step(*inputs):
+        await asyncio.sleep(seconds)
+        return value
+    return step
+
+
+def diamond(make) -> Dag:
+    # vpc -> (subnet, sg) -> asg, and an independent queue: 4 steps on a 3-step critical path.
+    dag = Dag(max_workers=8)
+    dag.add_node('vpc', make('vpc'))
+    dag.add_node('subnet', make('subnet'), ['vpc'])
+    dag.add_node('sg', make('sg'), ['vpc'])
+    dag.add_node('asg', make('asg'), ['subnet', 'sg'])
+    dag.add_node('queue', make('queue'))
+    return dag
+
+
+def assert_dependency_order(dag: Dag) -> None:
+    for name, (_, inputs) in dag.nodes.items():
+        for dep in inputs:
+            assert dag.timings[name][0] >= dag.timings[dep][1], f'{name} started before {dep} finished'
+
+
+def test_run_takes_the_critical_path_not_the_sum():
+    dag = diamond(sleeper)
+    start = time.perf_counter()
+    results = dag.run()
+    elapsed = time.perf_counter() - start
+
+    assert results == {name: name for name in dag.nodes}
+    # Three steps in a row; run one after the other, the five would take 5 * STEP.
+    assert 3 * STEP <= elapsed < 4 * STEP
+    assert_dependency_order(dag)
+    assert dag.critical_path()[0] == 'vpc' and dag.critical_path()[-1] == 'asg'
+
+
+def test_run_passes_results_of_inputs_in_order():
+    dag = Dag()
+    dag.add_node('a', lambda: 1)
+    dag.add_node('b', lambda: 2)
+    dag.add_node('sum', lambda a, b: (a, b), ['a', 'b'])
+    assert dag.run()['sum'] == (1, 2)
+
+
+def test_failing_node_stops_its_dependents_and_raises():
+    ran = []
+
+    def fail(vpc):
+        time.sleep(STEP / 2)
+        raise RuntimeError('subnet failed')
+
+    dag = Dag()
+    dag.add_node('vpc', sleeper('vpc', STEP / 4))
+    dag.add_node('subnet', fail, ['vpc'])
+    dag.add_node('asg', lambda subnet: ran.append('asg'), ['subnet'])
+    dag.add_node('queue', sleeper('queue'))
+
+    with pytest.raises(RuntimeError, match='subnet failed'):
+        dag.run()
+    assert ran == []
+    assert 'asg' not in dag.timings
+    # A step already running when the other failed is allowed to finish.
+    assert dag.results['queue'] == 'queue'
+
+
+def test_run_async_takes_the_critical_path_not_the_sum():
+    dag = diamond(async_sleeper)
+    start = time.perf_counter()
+    results = asyncio.run(dag.run_async())
+    elapsed = time.perf_counter() - start
+
+    assert results == {name: name for name in dag.nodes}
+    assert 3 * STEP <= elapsed < 4 * STEP
+    assert_dependency_order(dag)
+
+
+def test_run_async_failing_node_stops_its_dependents_and_raises():
+    async def fail(vpc):
+        raise RuntimeError('subnet failed')
+
+    dag = Dag()
+    dag.add_node('vpc', async_sleeper('vpc', STEP / 4))
+    dag.add_node('subnet', fail, ['vpc'])
+    dag.add_node('asg', async_sleeper('asg'), ['subnet'])
+
+    with pytest.raises(RuntimeError, match='subnet failed'):
+        asyncio.run(dag.run_async())
+    assert 'asg' not in dag.timings
+
+
+def test_cycle_is_rejected_before_running():
+    dag = Dag()
+    dag.add_node('a', lambda b: b, ['b'])
+    dag.add_node('b', lambda a: a, ['a'])
+    with pytest.raises(ValueError, match='Cycle'):
+        dag.run()
@@ -0,0 +1,92 @@
+import pytest
+from EC2 import CONTENT_TAG, IMAGE_ID, Ec2, content_hash, content_matches, launch_template_data, recorded_content
+
+moto = pytest.importorskip('moto')
+boto3 = pytest.importorskip('boto3')
+
+TAGS = [{'Key': 'Name', 'Value': 'QubeLT'}]
+
+
+@pytest.fixture
+def ec2_client(monkeypatch):
+    for key, value in {'AWS_DEFAULT_REGION': 'ap-south-1', 'AWS_ACCESS_KEY_ID': 'x', 'AWS_SECRET_ACCESS_KEY': 'x'}.items():
+        monkeypatch.setenv(key, value)
+    with moto.mock_ec2():
+        yield boto3.client('ec2')
+
+
+def count_calls(client, operation: str) -> list:
+    calls = []
+    client.meta.events.register(f'provide-client-params.ec2.{operation}', lambda params, **kwargs: calls.append(params))
+    return calls
+
+
+def template(latest: int, record: str = None) -> dict:
+    # A launch template as describe_launch_templates returns it.
+    tags = TAGS + ([{'Key': CONTENT_TAG, 'Value': record}] if record else [])
+    return {'LaunchTemplateId': 'lt-1', 'LaunchTemplateName': 'QubeLT', 'LatestVersionNumber': latest, 'Tags': tags}
+
+
+def test_content_hash_ignores_key_order_only():
+    data = launch_template_data('QubeIP', ['sg-1', 'sg-2'], 'QubeKey')
+    assert content_hash(dict(reversed(list(data.items())))) == content_hash(data)
+    assert content_hash(launch_template_data('QubeIP', ['sg-1', 'sg-2'], 'QubeKey', image_id='ami-2')) != content_hash(data)
+    assert content_hash(launch_template_data('QubeIP', ['sg-2', 'sg-1'], 'QubeKey')) != content_hash(data)
+    assert content_hash(launch_template_data('QubeIP', ['sg-1', 'sg-2'], 'QubeKey', instance_type='t3.medium')) != content_hash(data)
+
+
+def test_recorded_content():
+    assert recorded_content(template(3, '3:abc')) == (3, 'abc')
+    assert recorded_content(template(1)) == (None, None)
+
+
+@pytest.mark.parametrize('live, same', [
+    (template(2, '2:abc'), True),
+    # A version was added since the record was written, by hand or by another tool.
+    (template(3, '2:abc'), False),
+    (template(2, '2:def'), False),
+    (template(1), False),
+])
+def test_content_matches_only_trusts_a_record_of_the_latest_version(live, same):
+    assert content_matches(live, 'abc') is same
+
+
+def create(ec2_client, **kwargs) -> Ec2:
+    ec2 = Ec2(ec2_client)
+    ec2.create_launch_template('QubeLT', 'QubeIP', TAGS, kwargs.pop('sg', ['sg-1']), **kwargs)
+    return ec2
+
+
+def test_an_unchanged_template_gets_no_new_version(ec2_client):
+    create(ec2_client)
+    versions = count_calls(ec2_client, 'CreateLaunchTemplateVersion')
+
+    ec2 = create(ec2_client)
+
+    assert versions == []
+    assert ec2.lt_version == '1'
+
+
+@pytest.mark.parametrize('change', [{'image_id': 'ami-0123456789abcdef0'}, {'sg': ['sg-1', 'sg-2']}])
+def test_a_changed_ami_or_security_group_list_adds_one_version(ec2_client, change):
+    create(ec2_client, image_id=IMAGE_ID)
+    versions = count_calls(ec2_client, 'CreateLaunchTemplateVersion')
+    tags = count_calls(ec2_client, 'CreateTags')
+
+    ec2 = create(ec2_client, **change)
+
+    assert len(versions) == 1
+    assert ec2.lt_version == '2'
+    digest = content_hash(versions[0]['LaunchTemplateData'])
+    assert tags[0]['Tags'] == [{'Key': CONTENT_TAG, 'Value': f'2:{digest}'}]
+
+
+def test_a_version_added_outside_the_project_is_not_trusted(ec2_client):
+    lt_id = create(ec2_client).lt_id
+    ec2_client.create_launch_template_version(LaunchTemplateId=lt_id, LaunchTemplateData={'ImageId': 'ami-0123456789abcdef0'})
+    versions = count_calls(ec2_client, 'CreateLaunchTemplateVersion')
+
+    ec2 = create(ec2_client)
+
+    assert len(versions) == 1
+    assert ec2.lt_version == '3'
@@ -0,0 +1,126 @@
+import pytest
+from ELB import (DEFAULT_ATTRIBUTES, elb_spec, forward_action, health_check_settings, listener_changes, listener_settings,
+                 rule_conditions, same_actions, same_conditions, target_group_changes)
+
+ARNS = {'QubeTG': 'arn:tg/QubeTG', 'QubeTGGreen': 'arn:tg/QubeTGGreen'}
+SPEC = {
+    'target_groups': {'TG': {}, 'TGGreen': {}},
+    'listeners': [{'port': 80, 'forward': {'TG': 1}, 'rules': [
+        {'priority': 5, 'paths': ['/api/'], 'forward': {'TG': 90, 'TGGreen': 10}},
+        {'priority': 10, 'hosts': ['static.example.com'], 'forward': {'TGGreen': 1}},
+    ]}],
+}
+
+
+def live_state(spec: dict) -> dict:
+    # The state read_elb returns for a load balancer built from spec.
+    live = {'target_groups': {}, 'attributes': {}, 'listeners': {}, 'rules': {}}
+    for name, settings in spec['target_groups'].items():
+        live['target_groups'][name] = dict(TargetGroupName=name, TargetGroupArn=ARNS[name], Port=settings['port'],
+                                           Protocol=settings['protocol'], VpcId='vpc-1', **health_check_settings(settings))
+        live['attributes'][name] = dict(DEFAULT_ATTRIBUTES)
+    for listener in spec['listeners']:
+        port = listener['port']
+        live['listeners'][port] = dict(listener_settings(listener, ARNS), ListenerArn=f'arn:listener/{port}')
+        live['rules'][port] = {
+            rule['priority']: {'RuleArn': f"arn:rule/{port}/{rule['priority']}", 'Priority': str(rule['priority']), 'IsDefault': False,
+                               'Conditions': rule_conditions(rule), 'Actions': [forward_action(rule['forward'], ARNS)]}
+            for rule in listener['rules']
+        }
+    return live
+
+
+def actions(changes: list) -> list:
+    return [(change['name'], change['action']) for change in changes if change['action'] != 'exists']
+
+
+def test_an_unchanged_spec_makes_no_changes():
+    spec = elb_spec(SPEC)
+    live = live_state(spec)
+    assert actions(target_group_changes(spec, live, 'vpc-1')) == []
+    assert actions(listener_changes('Qube', spec, live, ARNS)) == []
+
+
+def test_a_weight_shift_modifies_one_rule():
+    live = live_state(elb_spec(SPEC))
+    spec = elb_spec(dict(SPEC, listeners=[dict(SPEC['listeners'][0], rules=[
+        dict(SPEC['listeners'][0]['rules'][0], forward={'TG': 50, 'TGGreen': 50}),
+        SPEC['listeners'][0]['rules'][1],
+    ])]))
+
+    changes = listener_changes('Qube', spec, live, ARNS)
+
+    assert actions(changes) == [('Qube:80:5', 'modify')]
+    [change] = [change for change in changes if change['action'] == 'modify']
+    assert list(change['params']) == ['Actions']
+    assert change['id'] == 'arn:rule/80/5'
+
+
+def test_rules_missing_from_the_spec_are_deleted_last():
+    live = live_state(elb_spec(SPEC))
+    spec = elb_spec(dict(SPEC, listeners=[dict(SPEC['listeners'][0], rules=[
+        {'priority': 1, 'paths': ['/new/'], 'forward': {'TG': 1}},
+        dict(SPEC['listeners'][0]['rules'][1], hosts=['cdn.example.com']),
+    ])]))
+
+    changes = listener_changes('Qube', spec, live, ARNS)
+
+    assert actions(changes) == [('Qube:80:1', 'create'), ('Qube:80:10', 'modify'), ('Qube:80:5', 'delete')]
+
+
+def test_listeners_missing_from_the_spec_are_deleted_with_their_rules():
+    live = live_state(elb_spec(dict(SPEC, listeners=SPEC['listeners'] + [{'port': 8080, 'rules': [{'priority': 1, 'paths': ['/'], 'forward': {'TG': 1}}]}])))
+    changes = listener_changes('Qube', elb_spec(SPEC), live, ARNS)
+    assert actions(changes) == [('Qube:8080', 'delete')]
+
+
+@pytest.mark.parametrize('settings, detail', [
+    ({'port': 8080}, 'Port 80, not 8080'),
+    ({'protocol': 'HTTPS'}, 'Protocol HTTP, not HTTPS'),
+])
+def test_a_port_or_protocol_change_replaces_the_target_group(settings, detail):
+    live = live_state(elb_spec(SPEC))
+    spec = elb_spec(dict(SPEC, target_groups={'TG': settings, 'TGGreen': {}}))
+
+    changes = target_group_changes(spec, live, 'vpc-1')
+
+    assert actions(changes) == [('QubeTG', 'replace')]
+    assert changes[0]['detail'].startswith(detail)
+
+
+def test_health_check_and_attribute_changes_modify_the_target_group():
+    live = live_state(elb_spec(SPEC))
+    spec = elb_spec(dict(SPEC, target_groups={'TG': {'health_check': {'path': '/health'}, 'slow_start': 30}, 'TGGreen': {}}))
+
+    changes = target_group_changes(spec, live, 'vpc-1')
+
+    assert actions(changes) == [('QubeTG', 'modify')]
+    assert changes[0]['params'] == {'HealthCheckPath': '/health'}
+    assert changes[0]['attributes'] == {'slow_start.duration_seconds': '30'}
+
+
+@pytest.mark.parametrize('wanted, live, same', [
+    ([{'Field': 'path-pattern', 'PathPatternConfig': {'Values': ['/a/', '/b/']}}],
+     [{'Field': 'path-pattern', 'Values': ['/b/', '/a/']}], True),
+    ([{'Field': 'host-header', 'HostHeaderConfig': {'Values': ['example.com']}}],
+     [{'Field': 'host-header', 'Values': ['example.com'], 'HostHeaderConfig': {'Values': ['example.com']}}], True),
+    ([{'Field': 'path-pattern', 'PathPatternConfig': {'Values': ['/a/']}}, {'Field': 'host-header', 'HostHeaderConfig': {'Values': ['example.com']}}],
+     [{'Field': 'host-header', 'Values': ['example.com']}, {'Field': 'path-pattern', 'Values': ['/a/']}], True),
+    ([{'Field': 'path-pattern', 'PathPatternConfig': {'Values': ['/a/']}}],
+     [{'Field': 'path-pattern', 'Values': ['/b/']}], False),
+])
+def test_same_conditions(wanted, live, same):
+    assert same_conditions(wanted, live) is same
+
+
+@pytest.mark.parametrize('wanted, live, same', [
+    ([forward_action({'QubeTG': 1}, ARNS)], [{'Type': 'forward', 'TargetGroupArn': 'arn:tg/QubeTG'}], True),
+    ([forward_action({'QubeTG': 1}, ARNS)],
+     [{'Type': 'forward', 'TargetGroupArn': 'arn:tg/QubeTG', 'ForwardConfig': {'TargetGroups': [{'TargetGroupArn': 'arn:tg/QubeTG', 'Weight': 100}]}}], True),
+    ([forward_action({'QubeTG': 1}, ARNS)], [{'Type': 'forward', 'TargetGroupArn': 'arn:tg/QubeTGGreen'}], False),
+    ([forward_action({'QubeTG': 90, 'QubeTGGreen': 10}, ARNS)], [forward_action({'QubeTGGreen': 10, 'QubeTG': 90}, ARNS)], True),
+    ([forward_action({'QubeTG': 90, 'QubeTGGreen': 10}, ARNS)], [forward_action({'QubeTG': 50, 'QubeTGGreen': 50}, ARNS)], False),
+    ([forward_action({'QubeTG': 1}, ARNS)], [{'Type': 'fixed-response', 'FixedResponseConfig': {'StatusCode': '200'}}], False),
+])
+def test_same_actions(wanted, live, same):
+    assert same_actions(wanted, live) is same
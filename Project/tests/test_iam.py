@@ -0,0 +1,65 @@
+import json
+from urllib.parse import quote
+import pytest
+from IAM import POLICY_VERSIONS, Iam, document_hash, policy_document
+
+moto = pytest.importorskip('moto')
+boto3 = pytest.importorskip('boto3')
+
+
+@pytest.fixture
+def iam_client(monkeypatch):
+    for key, value in {'AWS_DEFAULT_REGION': 'ap-south-1', 'AWS_ACCESS_KEY_ID': 'x', 'AWS_SECRET_ACCESS_KEY': 'x'}.items():
+        monkeypatch.setenv(key, value)
+    with moto.mock_iam():
+        yield boto3.client('iam')
+
+
+def document(sid: str) -> dict:
+    return {'Version': '2012-10-17', 'Statement': [{'Sid': sid, 'Effect': 'Allow', 'Action': 'kms:Decrypt', 'Resource': '*'}]}
+
+
+def versions(iam_client, arn: str) -> dict:
+    return {version['VersionId']: version['IsDefaultVersion'] for version in iam_client.list_policy_versions(PolicyArn=arn)['Versions']}
+
+
+def test_document_hash_ignores_the_encoding_and_formatting():
+    policy = policy_document()
+    assert document_hash(quote(json.dumps(policy))) == document_hash(policy)
+    assert document_hash(quote(json.dumps(policy, indent=4, sort_keys=True))) == document_hash(policy)
+    assert document_hash(policy) != document_hash(document('Other'))
+
+
+def test_update_keeps_at_most_policy_versions(iam_client):
+    arn = iam_client.create_policy(PolicyName='QubePolicy', PolicyDocument=json.dumps(document('v1')))['Policy']['Arn']
+    iam = Iam(iam_client)
+
+    for i in range(2, 6):
+        version_id = iam.update_iam_policy(arn, document(f'v{i}'))
+        live = versions(iam_client, arn)
+        assert len(live) <= POLICY_VERSIONS
+        assert live[version_id] is True
+
+    default = iam_client.get_policy_version(PolicyArn=arn, VersionId=version_id)['PolicyVersion']['Document']
+    assert document_hash(default) == document_hash(document('v5'))
+
+
+def test_update_never_deletes_the_default_version(iam_client):
+    arn = iam_client.create_policy(PolicyName='QubePolicy', PolicyDocument=json.dumps(document('v1')))['Policy']['Arn']
+    iam_client.create_policy_version(PolicyArn=arn, PolicyDocument=json.dumps(document('v2')))
+    # The newer version was never made the default, so it is the one to prune.
+    assert versions(iam_client, arn) == {'v1': True, 'v2': False}
+
+    version_id = Iam(iam_client).update_iam_policy(arn, document('v3'))
+
+    assert versions(iam_client, arn) == {'v1': False, version_id: True}
+
+
+def test_update_prunes_a_policy_already_at_the_iam_limit(iam_client):
+    arn = iam_client.create_policy(PolicyName='QubePolicy', PolicyDocument=json.dumps(document('v1')))['Policy']['Arn']
+    for i in range(2, 6):
+        iam_client.create_policy_version(PolicyArn=arn, PolicyDocument=json.dumps(document(f'v{i}')), SetAsDefault=i == 3)
+
+    version_id = Iam(iam_client).update_iam_policy(arn, document('v6'))
+
+    assert versions(iam_client, arn) == {'v3': False, version_id: True}
@@ -0,0 +1,123 @@
+import threading
+import time
+import pytest
+from Messages import MAX_BATCH, Consumer, Producer, batches, call_batch, lookup_queue_url
+
+moto = pytest.importorskip('moto')
+boto3 = pytest.importorskip('boto3')
+
+
+@pytest.fixture
+def sqs_client(monkeypatch):
+    for key, value in {'AWS_DEFAULT_REGION': 'ap-south-1', 'AWS_ACCESS_KEY_ID': 'x', 'AWS_SECRET_ACCESS_KEY': 'x'}.items():
+        monkeypatch.setenv(key, value)
+    with moto.mock_sqs():
+        yield boto3.client('sqs')
+
+
+def count_calls(client, operation: str) -> list:
+    calls = []
+    client.meta.events.register(f'provide-client-params.sqs.{operation}', lambda params, **kwargs: calls.append(params))
+    return calls
+
+
+def test_batches_hold_at_most_ten_messages():
+    sizes = [len(batch) for batch in batches({'MessageBody': str(i)} for i in range(25))]
+    assert sizes == [MAX_BATCH, MAX_BATCH, 5]
+
+
+def test_batches_stay_under_the_byte_limit():
+    entries = [{'MessageBody': 'x' * 100 * 1024} for _ in range(5)]
+    assert [len(batch) for batch in batches(entries)] == [2, 2, 1]
+    attributes = {'MessageBody': 'x' * 1000, 'MessageAttributes': {'kind': {'DataType': 'String', 'StringValue': 'y' * 1000}}}
+    assert [len(batch) for batch in batches([attributes] * 3, max_bytes=4100)] == [2, 1]
+
+
+def test_call_batch_retries_server_failures_only():
+    calls = []
+
+    def call(Entries, QueueUrl):
+        calls.append([entry['MessageBody'] for entry in Entries])
+        failed = []
+        for entry in Entries:
+            if entry['MessageBody'] == 'bad':
+                failed.append({'Id': entry['Id'], 'SenderFault': True, 'Code': 'InvalidMessageContents', 'Message': 'no'})
+            elif entry['MessageBody'] == 'flaky' and len(calls) == 1:
+                failed.append({'Id': entry['Id'], 'SenderFault': False, 'Code': 'InternalError', 'Message': 'retry'})
+        return {'Failed': failed}
+
+    failed = call_batch(call, [{'MessageBody': body} for body in ('ok', 'flaky', 'bad')], base_delay=0, QueueUrl='url')
+
+    assert calls == [['ok', 'flaky', 'bad'], ['flaky']]
+    assert [(entry['MessageBody'], entry['Code']) for entry in failed] == [('bad', 'InvalidMessageContents')]
+
+
+def test_call_batch_gives_up_after_max_attempts():
+    calls = []
+
+    def call(Entries, QueueUrl):
+        calls.append(len(Entries))
+        return {'Failed': [{'Id': entry['Id'], 'SenderFault': False, 'Code': 'InternalError'} for entry in Entries]}
+
+    failed = call_batch(call, [{'MessageBody': 'flaky'}], max_attempts=3, base_delay=0, QueueUrl='url')
+    assert calls == [1, 1, 1]
+    assert failed[0]['Code'] == 'InternalError'
+
+
+def test_producer_sends_in_batches(sqs_client):
+    queue_url = sqs_client.create_queue(QueueName='QubeSQS')['QueueUrl']
+    sends = count_calls(sqs_client, 'SendMessageBatch')
+
+    result = Producer(sqs_client, lookup_queue_url(sqs_client, 'QubeSQS'), workers=4).send(f'job {i}' for i in range(95))
+
+    assert result['sent'] == 95 and result['failed'] == []
+    assert len(sends) == 10
+    attributes = sqs_client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['ApproximateNumberOfMessages'])['Attributes']
+    assert attributes['ApproximateNumberOfMessages'] == '95'
+
+
+def test_consumer_deletes_handled_messages_in_batches(sqs_client):
+    queue_url = sqs_client.create_queue(QueueName='QubeSQS')['QueueUrl']
+    Producer(sqs_client, queue_url).send(f'job {i}' for i in range(30))
+    deletes = count_calls(sqs_client, 'DeleteMessageBatch')
+    receives = count_calls(sqs_client, 'ReceiveMessage')
+    handled = []
+
+    def handle(message):
+        if message['Body'] == 'job 7':
+            raise ValueError('left in the queue')
+        handled.append(message['Body'])
+
+    stats = Consumer(sqs_client, queue_url, handle, workers=1, wait_time=0, visibility_timeout=30).run(idle_polls=1)
+
+    assert stats['received'] == 30 and stats['handled'] == 29 and stats['failed'] == 1 and stats['deleted'] == 29
+    # One delete call per receive that handled anything, never one per message.
+    assert len(deletes) == len(receives) - 1
+    assert sum(len(params['Entries']) for params in deletes) == 29
+    # The failed message is still in flight, not deleted.
+    attributes = sqs_client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['ApproximateNumberOfMessagesNotVisible'])['Attributes']
+    assert attributes['ApproximateNumberOfMessagesNotVisible'] == '1'
+
+
+def test_consumer_extends_the_visibility_of_slow_messages(sqs_client):
+    queue_url = sqs_client.create_queue(QueueName='QubeSQS')['QueueUrl']
+    sqs_client.send_message(QueueUrl=queue_url, MessageBody='slow')
+    extensions = count_calls(sqs_client, 'ChangeMessageVisibilityBatch')
+    handling = threading.Event()
+    seen_by_others = []
+
+    def handle(message):
+        handling.set()
+        # Past its visibility timeout, the message would be delivered again without the heartbeat.
+        deadline = time.monotonic() + 2.5
+        while time.monotonic() < deadline:
+            seen_by_others.extend(sqs_client.receive_message(QueueUrl=queue_url, WaitTimeSeconds=0).get('Messages', []))
+            time.sleep(0.25)
+
+    stats = Consumer(sqs_client, queue_url, handle, workers=1, wait_time=0, visibility_timeout=1).run(idle_polls=1)
+
+    assert handling.is_set()
+    assert seen_by_others == []
+    assert stats['handled'] == 1 and stats['deleted'] == 1
+    assert stats['extended'] >= 2
+    assert all(entry['VisibilityTimeout'] == 1 for params in extensions for entry in params['Entries'])
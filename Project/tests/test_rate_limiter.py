@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+import pytest
+from RateLimiter import RateLimiter, TokenBucket
+
+EVENT = 'needs-retry.ec2.DescribeVpcs'
+
+
+def response(status: int = 200, code: str = None) -> tuple:
+    # The (http response, parsed response) pair botocore passes to needs-retry.
+    parsed = {'Error': {'Code': code, 'Message': ''}} if code else {}
+    return SimpleNamespace(status_code=status), parsed
+
+
+@pytest.fixture(autouse=True)
+def longest_backoff(monkeypatch):
+    # Backoff is jittered; take its upper bound so delays can be compared.
+    monkeypatch.setattr('random.uniform', lambda low, high: high)
+
+
+def test_a_bucket_serves_its_burst_then_spaces_calls():
+    bucket = TokenBucket(10)
+    assert [bucket._reserve() for _ in range(10)] == [0] * 10
+    assert 0.05 < bucket._reserve() <= 0.1
+
+
+def test_throttles_halve_the_rate_down_to_its_minimum():
+    bucket = TokenBucket(8, min_rate=0.5)
+    rates = []
+    for _ in range(6):
+        bucket.throttled()
+        rates.append(bucket.rate)
+    assert rates == [4, 2, 1, 0.5, 0.5, 0.5]
+
+
+def test_successes_recover_a_twentieth_of_the_rate_up_to_its_maximum():
+    bucket = TokenBucket(10)
+    bucket.throttled()
+    bucket.throttled()
+    for _ in range(3):
+        bucket.succeeded()
+    assert bucket.rate == pytest.approx(4)
+    for _ in range(20):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_buckets_take_the_rate_of_their_action_then_of_their_service():
+    limiter = RateLimiter({'ec2.DescribeSubnets': 2}, default_rate=3)
+    assert limiter.bucket('ec2.DescribeSubnets').max_rate == 2
+    assert limiter.bucket('ec2.DescribeVpcs').max_rate == RateLimiter.RATES['ec2']
+    assert limiter.bucket('s3.ListBuckets').max_rate == 3
+
+
+def test_a_success_is_not_retried_and_refills_the_budget():
+    limiter = RateLimiter(retry_budget=10)
+    limiter.retry_budget = 5
+    assert limiter._needs_retry(EVENT, response=response()) is None
+    assert limiter.retry_budget == 6
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'response': response(400, 'Throttling')},
+    {'response': response(503, 'RequestLimitExceeded')},
+    {'response': response(500, 'InternalError')},
+    {'response': response(503)},
+    {'caught_exception': ConnectionError()},
+])
+def test_throttles_and_transient_errors_are_retried_with_backoff(kwargs):
+    limiter = RateLimiter(base_delay=0.1)
+    assert limiter._needs_retry(EVENT, attempts=3, **kwargs) == pytest.approx(0.8)
+    assert limiter.retry_budget == 500 - limiter.retry_cost
+
+
+def test_only_throttles_slow_the_action_down():
+    limiter = RateLimiter()
+    limiter._needs_retry(EVENT, response=response(500, 'InternalError'))
+    assert limiter.bucket('ec2.DescribeVpcs').rate == RateLimiter.RATES['ec2']
+    limiter._needs_retry(EVENT, response=response(400, 'RequestLimitExceeded'))
+    assert limiter.bucket('ec2.DescribeVpcs').rate == RateLimiter.RATES['ec2'] / 2
+    assert limiter.bucket('ec2.DescribeSubnets').rate == RateLimiter.RATES['ec2']
+
+
+@pytest.mark.parametrize('code', ['InvalidVpcID.NotFound', 'UnauthorizedOperation', 'InvalidParameterValue'])
+def test_other_errors_are_not_retried(code):
+    limiter = RateLimiter()
+    assert limiter._needs_retry(EVENT, response=response(400, code)) is None
+    assert limiter.retry_budget == 500
+
+
+def test_backoff_is_capped():
+    limiter = RateLimiter(max_attempts=20, base_delay=0.1, max_delay=2)
+    assert limiter._needs_retry(EVENT, response=response(400, 'Throttling'), attempts=10) == 2
+
+
+def test_a_call_stops_after_max_attempts():
+    limiter = RateLimiter(max_attempts=3)
+    assert limiter._needs_retry(EVENT, response=response(400, 'Throttling'), attempts=2) is not None
+    assert limiter._needs_retry(EVENT, response=response(400, 'Throttling'), attempts=3) is None
+
+
+def test_an_exhausted_budget_stops_every_retry_until_successes_refill_it():
+    limiter = RateLimiter(retry_budget=10, retry_cost=5)
+    throttle = {'response': response(400, 'Throttling')}
+    # The budget is shared by every service and action.
+    assert limiter._needs_retry(EVENT, **throttle) is not None
+    assert limiter._needs_retry('needs-retry.auto-scaling.DescribePolicies', **throttle) is not None
+    assert limiter._needs_retry(EVENT, **throttle) is None
+    assert limiter._needs_retry('needs-retry.iam.GetRole', response=response(500, 'InternalError')) is None
+
+    for _ in range(5):
+        limiter._needs_retry('needs-retry.iam.GetRole', response=response())
+    assert limiter._needs_retry(EVENT, **throttle) is not None
+    assert limiter.retry_budget == 0
@@ -0,0 +1,161 @@
+import ipaddress
+import pytest
+from VPC import Vpc, carve_subnets, endpoint_changes, rule_permissions, security_group_rule_changes, security_group_spec
+
+GROUP_IDS = {'alb': 'sg-alb', 'asg': 'sg-asg', 'endpoint': 'sg-endpoint'}
+
+
+def live_rule(rule_id: str, protocol: str, from_port: int, to_port: int, source: str, egress: bool = False) -> dict:
+    # A rule as describe_security_group_rules returns it.
+    rule = {'SecurityGroupRuleId': rule_id, 'GroupId': 'sg-asg', 'IsEgress': egress, 'IpProtocol': protocol,
+            'FromPort': from_port, 'ToPort': to_port}
+    if source.startswith('sg-'):
+        rule['ReferencedGroupInfo'] = {'GroupId': source, 'UserId': '123456789012'}
+    else:
+        rule['CidrIpv4'] = source
+    return rule
+
+
+@pytest.mark.parametrize('rules, live', [
+    ([{'port': 80, 'groups': ['alb']}], [live_rule('sgr-1', 'tcp', 80, 80, 'sg-alb')]),
+    ([{'port': 22, 'cidrs': ['10.0.0.0/8']}], [live_rule('sgr-1', 'tcp', 22, 22, '10.0.0.0/8')]),
+    ([{'port': 8000, 'to_port': 8100, 'cidrs': ['0.0.0.0/0'], 'groups': ['alb']}],
+     [live_rule('sgr-1', 'tcp', 8000, 8100, '0.0.0.0/0'), live_rule('sgr-2', 'tcp', 8000, 8100, 'sg-alb')]),
+    ([{'protocol': '-1', 'cidrs': ['10.0.0.0/16']}], [live_rule('sgr-1', '-1', -1, -1, '10.0.0.0/16')]),
+    ([{'protocol': 'all', 'groups': ['asg']}], [live_rule('sgr-1', '-1', -1, -1, 'sg-asg')]),
+])
+def test_unchanged_rules_give_an_empty_diff(rules, live):
+    permissions = rule_permissions(security_group_spec({'asg': rules})['asg'], GROUP_IDS)
+    assert security_group_rule_changes(permissions, live) == ([], [])
+
+
+def test_egress_rules_are_ignored():
+    permissions = rule_permissions(security_group_spec()['asg'], GROUP_IDS)
+    live = [live_rule('sgr-1', 'tcp', 80, 80, 'sg-alb'), live_rule('sgr-egress', '-1', -1, -1, '0.0.0.0/0', egress=True)]
+    assert security_group_rule_changes(permissions, live) == ([], [])
+
+
+def test_missing_rules_are_authorized_and_extra_rules_revoked():
+    permissions = rule_permissions(security_group_spec({'asg': [{'port': 80, 'groups': ['alb']}, {'port': 22, 'cidrs': ['10.0.0.0/8']}]})['asg'], GROUP_IDS)
+    live = [live_rule('sgr-1', 'tcp', 80, 80, 'sg-alb'), live_rule('sgr-manual', 'tcp', 3306, 3306, '0.0.0.0/0')]
+
+    authorize, revoke = security_group_rule_changes(permissions, live)
+
+    assert authorize == [{'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '10.0.0.0/8'}]}]
+    assert revoke == ['sgr-manual']
+
+
+def test_a_new_group_source_is_authorized_as_a_group_pair():
+    permissions = rule_permissions(security_group_spec()['endpoint'], GROUP_IDS)
+    authorize, revoke = security_group_rule_changes(permissions, [])
+    assert authorize == [{'IpProtocol': 'tcp', 'FromPort': 443, 'ToPort': 443, 'UserIdGroupPairs': [{'GroupId': 'sg-asg'}]}]
+    assert revoke == []
+
+
+def test_unknown_groups_are_rejected():
+    with pytest.raises(ValueError, match='Unknown security groups'):
+        security_group_spec({'db': []})
+    with pytest.raises(ValueError, match='lets in endpoint'):
+        rule_permissions(security_group_spec({'asg': [{'port': 80, 'groups': ['endpoint']}]})['asg'], {'alb': 'sg-alb', 'asg': 'sg-asg'})
+
+
+def subnets(topology: dict) -> list:
+    return topology['public_subnets'] + topology['private_subnets']
+
+
+@pytest.mark.parametrize('cidr, spec', [
+    ('10.0.0.0/16', {}),
+    ('10.0.0.0/16', {'azs': 3}),
+    ('10.0.0.0/22', {'azs': 2, 'prefix': 24}),
+    ('10.1.0.0/16', {'azs': 6, 'prefix': 20}),
+    ('172.16.0.0/20', {'azs': 3, 'prefix': 26, 'zones': ['us-west-2b', 'us-west-2c', 'us-west-2d']}),
+])
+def test_subnets_never_overlap(cidr, spec):
+    topology = carve_subnets(cidr, spec, 'us-west-2')
+    networks = [ipaddress.ip_network(subnet['cidr']) for subnet in subnets(topology)]
+
+    assert len(topology['public_subnets']) == len(topology['private_subnets']) == spec.get('azs', 2)
+    assert all(network.subnet_of(ipaddress.ip_network(cidr)) for network in networks)
+    assert not any(a.overlaps(b) for i, a in enumerate(networks) for b in networks[i + 1:])
+
+
+def test_subnets_are_spread_over_the_zones_in_order():
+    topology = carve_subnets('10.0.0.0/16', {'azs': 3}, 'eu-west-1')
+    assert [subnet['az'] for subnet in topology['public_subnets']] == ['eu-west-1a', 'eu-west-1b', 'eu-west-1c']
+    assert [subnet['az'] for subnet in topology['private_subnets']] == ['eu-west-1a', 'eu-west-1b', 'eu-west-1c']
+
+
+def test_adding_a_zone_leaves_the_other_subnets_in_place():
+    two = carve_subnets('10.0.0.0/16', {'azs': 2}, 'us-east-1')
+    three = carve_subnets('10.0.0.0/16', {'azs': 3}, 'us-east-1')
+
+    assert three['public_subnets'][:2] == two['public_subnets']
+    assert three['private_subnets'][:2] == two['private_subnets']
+    assert three['public_subnets'][2] == {'cidr': '10.0.2.0/24', 'az': 'us-east-1c'}
+    assert three['private_subnets'][2] == {'cidr': '10.0.130.0/24', 'az': 'us-east-1c'}
+
+
+@pytest.mark.parametrize('cidr, spec, message', [
+    ('10.0.0.0/16', {'azs': 1}, 'at least two availability zones'),
+    ('10.0.0.0/16', {'azs': 3, 'zones': ['us-east-1a', 'us-east-1b']}, 'names only 2 zones'),
+    ('10.0.0.0/16', {'prefix': 16}, "can't hold 2 public and 2 private /16 subnets"),
+    ('10.0.0.0/23', {'azs': 3, 'prefix': 25}, "can't hold 3 public and 3 private /25 subnets"),
+])
+def test_impossible_topologies_are_rejected(cidr, spec, message):
+    with pytest.raises(ValueError, match=message):
+        carve_subnets(cidr, spec, 'us-east-1')
+
+
+def endpoint(kind: str, route_table_ids: list = (), subnet_ids: list = (), group_ids: list = (), private_dns: bool = True) -> dict:
+    # An endpoint as describe_vpc_endpoints returns it.
+    live = {'VpcEndpointId': 'vpce-1', 'VpcEndpointType': kind, 'RouteTableIds': list(route_table_ids), 'SubnetIds': list(subnet_ids),
+            'Groups': [{'GroupId': group_id, 'GroupName': group_id} for group_id in group_ids]}
+    if kind == 'Interface':
+        live['PrivateDnsEnabled'] = private_dns
+    return live
+
+
+@pytest.mark.parametrize('live, wanted, changes', [
+    (endpoint('Gateway', ['rtb-1', 'rtb-2']), {'route_table_ids': ['rtb-2', 'rtb-1']}, {}),
+    (endpoint('Gateway', ['rtb-1']), {'route_table_ids': ['rtb-1', 'rtb-2']}, {'AddRouteTableIds': ['rtb-2']}),
+    (endpoint('Gateway', ['rtb-1', 'rtb-2']), {'route_table_ids': ['rtb-2']}, {'RemoveRouteTableIds': ['rtb-1']}),
+    (endpoint('Gateway', ['rtb-1']), {'route_table_ids': ['rtb-1'], 'subnet_ids': ['subnet-1'], 'sg_id': 'sg-1'}, {}),
+    (endpoint('Interface', subnet_ids=['subnet-1', 'subnet-2'], group_ids=['sg-1']), {'subnet_ids': ['subnet-1', 'subnet-2'], 'sg_id': 'sg-1'}, {}),
+    (endpoint('Interface', subnet_ids=['subnet-1'], group_ids=['sg-1']), {'subnet_ids': ['subnet-1', 'subnet-2'], 'sg_id': 'sg-1'},
+     {'AddSubnetIds': ['subnet-2']}),
+    (endpoint('Interface', subnet_ids=['subnet-1', 'subnet-2'], group_ids=['sg-1']), {'subnet_ids': ['subnet-2'], 'sg_id': 'sg-1'},
+     {'RemoveSubnetIds': ['subnet-1']}),
+    (endpoint('Interface', subnet_ids=['subnet-1'], group_ids=['sg-old']), {'subnet_ids': ['subnet-1'], 'sg_id': 'sg-1'},
+     {'AddSecurityGroupIds': ['sg-1'], 'RemoveSecurityGroupIds': ['sg-old']}),
+    (endpoint('Interface', subnet_ids=['subnet-1'], group_ids=['sg-1'], private_dns=False), {'subnet_ids': ['subnet-1'], 'sg_id': 'sg-1'},
+     {'PrivateDnsEnabled': True}),
+])
+def test_endpoint_changes(live, wanted, changes):
+    assert endpoint_changes(live, **wanted) == changes
+
+
+@pytest.fixture
+def vpc(monkeypatch):
+    # Only the tests against moto need it.
+    moto = pytest.importorskip('moto')
+    boto3 = pytest.importorskip('boto3')
+    for key, value in {'AWS_DEFAULT_REGION': 'ap-south-1', 'AWS_ACCESS_KEY_ID': 'x', 'AWS_SECRET_ACCESS_KEY': 'x'}.items():
+        monkeypatch.setenv(key, value)
+    with moto.mock_ec2():
+        vpc = Vpc(boto3.resource('ec2'), boto3.client('ec2'))
+        vpc.myvpc_id = vpc.ec2_client.create_vpc(CidrBlock='10.0.0.0/16')['Vpc']['VpcId']
+        yield vpc
+
+
+def test_an_unchanged_endpoint_is_not_modified(vpc):
+    tags = [{'Key': 'Name', 'Value': 'QubeS3Endpoint'}]
+    route_table_ids = [vpc.ec2_client.create_route_table(VpcId=vpc.myvpc_id)['RouteTable']['RouteTableId'] for _ in range(2)]
+    endpoint_id = vpc.create_vpc_endpoint('s3', tags, route_table_ids=route_table_ids[:1])
+    modifications = []
+    vpc.ec2_client.meta.events.register('provide-client-params.ec2.ModifyVpcEndpoint', lambda params, **kwargs: modifications.append(params))
+
+    assert vpc.create_vpc_endpoint('s3', tags, route_table_ids=route_table_ids[:1]) == endpoint_id
+    assert modifications == []
+
+    assert vpc.create_vpc_endpoint('s3', tags, route_table_ids=route_table_ids) == endpoint_id
+    assert modifications == [{'VpcEndpointId': endpoint_id, 'AddRouteTableIds': route_table_ids[1:]}]